@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Asynchroniczna (asyncio) warstwa transportowa nad portem szeregowym.
+
+Klasa AsyncSerialTransport:
+- port otwierany przez pyserial (konfiguracja termios),
+  a potem obsługiwany bezpośrednio przez deskryptor pliku
+  w trybie nieblokującym, zarejestrowany w pętli zdarzeń,
+- te same zasady ramkowania co SerialTransport (LineFramer):
+  terminator '\n', usuwanie '\r', ASCII,
+- await read_line(timeout), await write_line(line),
+- async for line in transport.lines() – strumień telemetrii.
+
+Jedna pętla asyncio może w ten sposób obsługiwać wiele portów
+bez osobnego wątku na każdy port. Wymaga systemu POSIX
+(Linux, macOS) – na Windows port nie ma deskryptora pliku.
+"""
+
+from __future__ import annotations
+import asyncio
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from transport import LineFramer
+from protocol import READY_LINE
+
+try:
+    import serial
+except Exception:
+    serial = None
+
+DEBUG = False
+
+
+@dataclass
+class AsyncSerialTransport:
+    """
+    Komunikacja tekstowa po porcie szeregowym w stylu asyncio.
+
+    Atrybuty:
+        port    : nazwa portu (np. '/dev/ttyACM0'),
+        baud    : prędkość transmisji (domyślnie 9600),
+        timeout : domyślny timeout (sekundy) dla read_line(),
+        ready_timeout : maks. czas czekania w open() na READY (0 = nie czekaj),
+        start_timeout : maks. czas od ACK na START do wyniku MAE=...
+                        (RUN 10 s + HOLD 3 s + zapas),
+        _ser    : obiekt serial.Serial (tylko do konfiguracji i zamknięcia portu),
+        _fd     : deskryptor pliku portu zarejestrowany w pętli zdarzeń.
+    """
+    port: str
+    baud: int = 9600
+    timeout: float = 1.0
+    ready_timeout: float = 2.0
+    start_timeout: float = 17.0
+    ready: bool = field(default=False, init=False)
+    _ser: Optional[object] = None
+    _fd: Optional[int] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, repr=False)
+    _framer: LineFramer = field(default_factory=LineFramer, repr=False)
+    _lines: deque = field(default_factory=deque, repr=False)
+    _waiter: Optional[asyncio.Future] = field(default=None, repr=False)
+    _wbuf: bytearray = field(default_factory=bytearray, repr=False)
+    _drained: Optional[asyncio.Future] = field(default=None, repr=False)
+    _error: Optional[BaseException] = field(default=None, repr=False)
+
+    async def open(self) -> None:
+        """
+        Otwiera port i rejestruje jego deskryptor w bieżącej pętli zdarzeń.
+
+        Tak jak SerialTransport.open(): czyści bufory i czeka (maks.
+        ready_timeout) na READY po resecie Arduino – tu bez blokowania pętli.
+        """
+        if serial is None:
+            raise RuntimeError("pyserial not available")
+
+        self._ser = serial.Serial(
+            self.port,
+            self.baud,
+            timeout=0,
+            write_timeout=0,
+            rtscts=False,
+            dsrdtr=False,
+            xonxoff=False,
+        )
+        try:
+            self._fd = self._ser.fileno()
+        except Exception:
+            self._ser.close()
+            self._ser = None
+            raise RuntimeError("asyncio transport requires a POSIX serial port")
+
+        os.set_blocking(self._fd, False)
+        try:
+            self._ser.reset_input_buffer()
+            self._ser.reset_output_buffer()
+        except Exception:
+            pass
+
+        self._loop = asyncio.get_running_loop()
+        self._error = None
+        self._framer.clear()
+        self._lines.clear()
+        self._loop.add_reader(self._fd, self._on_readable)
+
+        # Arduino resetuje się przy otwarciu portu – czekamy na READY z setup(),
+        # porzucając wszystko, co przyszło wcześniej
+        self.ready = False
+        end = self._loop.time() + self.ready_timeout
+        while not self.ready:
+            remaining = end - self._loop.time()
+            if remaining <= 0:
+                break
+            line = await self.read_line(timeout=remaining)
+            self.ready = line is not None and line.startswith(READY_LINE)
+
+        if DEBUG:
+            print(f"[DEBUG] Opened {self.port} @ {self.baud} baud (asyncio)")
+
+    async def close(self) -> None:
+        """
+        Wyrejestrowuje deskryptor z pętli i zamyka port.
+
+        Oczekujący read_line() / write_line() kończą się błędem.
+        """
+        if self._ser is None:
+            return
+        try:
+            self._loop.remove_reader(self._fd)
+            self._loop.remove_writer(self._fd)
+            self._fail(RuntimeError("port closed"))
+            self._ser.close()
+            if DEBUG:
+                print("[DEBUG] Port closed")
+        finally:
+            self._ser = None
+            self._fd = None
+
+    def reset_input(self) -> None:
+        """Porzuca nieodczytane dane (bufor portu, gotowe linie i niepełny ogon)."""
+        if self._ser is None:
+            raise RuntimeError("not open")
+        self._ser.reset_input_buffer()
+        self._framer.clear()
+        self._lines.clear()
+
+    async def write_line(self, line: str) -> None:
+        """
+        Wysyła jedną linię (te same zasady co SerialTransport.write_line()).
+
+        Kończy się, gdy całe dane trafią do bufora systemowego portu.
+        """
+        if self._ser is None:
+            raise RuntimeError("not open")
+
+        data = (line.rstrip("\r\n") + "\n").encode("ascii", errors="ignore")
+        if DEBUG:
+            hex_data = " ".join(f"{b:02X}" for b in data)
+            print(f"[TX] {line.strip()}  ({hex_data})")
+
+        self._wbuf += data
+        self._flush_wbuf()
+        if self._wbuf:
+            # system nie przyjął wszystkiego – dopisujemy resztę,
+            # gdy deskryptor będzie gotowy do zapisu
+            if self._drained is None:
+                self._drained = self._loop.create_future()
+                self._loop.add_writer(self._fd, self._on_writable)
+            await asyncio.shield(self._drained)
+
+    async def read_line(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Czeka na jedną linię tekstu.
+
+        Parametry:
+            timeout: sekundy; None oznacza self.timeout.
+
+        Zwraca:
+            - linię bez '\n' i ewentualnego '\r',
+            - None, jeśli w tym czasie nie przyszła pełna linia.
+        """
+        if self._ser is None:
+            raise RuntimeError("not open")
+        if self._lines:
+            return self._pop_line()
+        if self._error is not None:
+            raise RuntimeError(f"port failed: {self._error}")
+        if self._waiter is not None:
+            raise RuntimeError("read_line() already in progress")
+
+        self._waiter = self._loop.create_future()
+        try:
+            await asyncio.wait_for(self._waiter, timeout if timeout is not None else self.timeout)
+        except asyncio.TimeoutError:
+            if DEBUG:
+                print("[RX TIMEOUT] Brak danych z portu")
+            return None
+        finally:
+            self._waiter = None
+        return self._pop_line()
+
+    async def lines(self) -> AsyncIterator[str]:
+        """
+        Nieskończony strumień odebranych linii (np. telemetrii TEL;...).
+
+        Kończy się po close().
+        """
+        while self._ser is not None:
+            try:
+                line = await self.read_line(self.timeout)
+            except RuntimeError:
+                if self._ser is None:
+                    return
+                raise
+            if line is not None:
+                yield line
+
+    def _on_readable(self) -> None:
+        """Callback pętli: deskryptor ma dane do odczytu."""
+        try:
+            data = os.read(self._fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._loop.remove_reader(self._fd)
+            self._fail(e)
+            return
+        if not data:
+            self._loop.remove_reader(self._fd)
+            self._fail(RuntimeError("port disconnected"))
+            return
+
+        lines = self._framer.feed(data)
+        if lines:
+            self._lines.extend(lines)
+            if self._waiter is not None and not self._waiter.done():
+                self._waiter.set_result(None)
+
+    def _on_writable(self) -> None:
+        """Callback pętli: deskryptor przyjmie kolejne bajty."""
+        try:
+            self._flush_wbuf()
+        except OSError as e:
+            self._fail(e)
+            return
+        if not self._wbuf:
+            self._loop.remove_writer(self._fd)
+            fut, self._drained = self._drained, None
+            if fut is not None and not fut.done():
+                fut.set_result(None)
+
+    def _flush_wbuf(self) -> None:
+        """Zapisuje do portu tyle z bufora wyjściowego, ile system przyjmie."""
+        try:
+            n = os.write(self._fd, self._wbuf)
+        except BlockingIOError:
+            return
+        del self._wbuf[:n]
+
+    def _fail(self, exc: BaseException) -> None:
+        """Zapamiętuje błąd portu i budzi oczekujących."""
+        self._error = exc
+        for fut in (self._waiter, self._drained):
+            if fut is not None and not fut.done():
+                fut.set_exception(RuntimeError(f"port failed: {exc}"))
+        self._drained = None
+        self._wbuf.clear()
+
+    def _pop_line(self) -> str:
+        line = self._lines.popleft()
+        if DEBUG:
+            print(f"[RX] {line}")
+        return line
@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Benchmarki warstwy komunikacji bez podłączonego Arduino.
+
+Urządzenie jest udawane przez pseudo-terminal (pty, tylko Linux/Unix):
+- SerialTransport otwiera stronę "slave" jak zwykły port szeregowy,
+- osobny wątek pisze do strony "master" linie telemetrii.
+
+Użycie:
+    python bench.py read [--lines 50000]
+    python bench.py latency [--n 500] [--baud 9600]
+    python bench.py telemetry [--rate 1000] [--seconds 3] [--baud 115200]
+    python bench.py parse [--lines 1000000]
+    python bench.py crc [--frames 1000000]
+    python bench.py replay [sesja.cap] [--lines 200000] [--speed 0]
+
+Testy latency/telemetry korzystają z emulatora firmware'u (emulator.py).
+"""
+
+from __future__ import annotations
+import argparse
+import contextlib
+import os
+import threading
+import time
+import tty
+
+from capture import DIR_RX, DIR_TX, CaptureWriter
+from emulator import BallModel, FirmwareEmulator, PtyEmulator
+from fastproto import parse_telemetry_batch, validate_frames
+from monitor import TelemetryMonitor
+from protocol import add_crc, compute_crc, parse_telemetry
+from replay import ReplayTransport, capture_info
+from transport import SerialTransport
+
+TEL_LINE = b"TEL;dist=25.80;sp=26.50;err=-0.70;out=4.20\r\n"
+
+
+class PtyFeeder:
+    """
+    Udawane urządzenie: pseudo-terminal, do którego wątek pisze gotowe dane.
+
+    Atrybuty:
+        path : ścieżka strony "slave" (do otwarcia przez SerialTransport),
+        data : bajty wysyłane po start().
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.path = os.ttyname(self._slave)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _run(self) -> None:
+        view = memoryview(self.data)
+        while view:
+            n = os.write(self._master, view[:4096])
+            view = view[n:]
+
+    def close(self) -> None:
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def read_line_bytewise(x: SerialTransport, timeout: float) -> bytes:
+    """
+    Punkt odniesienia: dawny odczyt linii po 1 bajcie (read(1) w pętli).
+    """
+    end = time.time() + timeout
+    buf = bytearray()
+    while time.time() < end:
+        b = x._ser.read(1)
+        if not b:
+            continue
+        if b == b"\n":
+            if buf.endswith(b"\r"):
+                buf.pop()
+            return buf.decode("ascii", errors="ignore")
+        buf.extend(b)
+    return None
+
+
+def bench_read(n_lines: int) -> None:
+    """
+    Mierzy przepustowość ramkowania (bajty/s) dla read_line()
+    i dla dawnego odczytu bajt po bajcie.
+    """
+    variants = [
+        ("read_line (chunked)", lambda x: x.read_line(timeout=1.0)),
+        ("read(1) bytewise", lambda x: read_line_bytewise(x, timeout=1.0)),
+    ]
+    total = len(TEL_LINE) * n_lines
+
+    for name, read in variants:
+        feeder = PtyFeeder(TEL_LINE * n_lines)
+        x = SerialTransport(feeder.path, 115200, timeout=1.0)
+        x.open()
+        try:
+            feeder.start()
+            got = 0
+            t0 = time.perf_counter()
+            while got < n_lines:
+                if read(x) is None:
+                    break
+                got += 1
+            dt = time.perf_counter() - t0
+        finally:
+            x.close()
+            feeder.close()
+
+        print(f"{name:22s} {got:8d} linii  {dt:7.3f} s  "
+              f"{total / dt / 1e6:7.2f} MB/s  {got / dt:10.0f} linii/s")
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Percentyl q (0..100) z posortowanej listy (najbliższy ranga)."""
+    if not sorted_values:
+        return float("nan")
+    k = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def bench_latency(n: int, baud: int) -> None:
+    """
+    Czas odpowiedzi (write_line + read_line) na PING przez emulator.
+    """
+    with PtyEmulator(baud=baud) as dev:
+        x = SerialTransport(dev.path, baud, timeout=1.0)
+        x.open()
+        try:
+            x.reset_input()
+            frame = add_crc("PING")
+            samples = []
+            for _ in range(n):
+                t0 = time.perf_counter()
+                x.write_line(frame)
+                resp = x.read_line(timeout=1.0)
+                dt = time.perf_counter() - t0
+                if resp == "PONG":
+                    samples.append(dt * 1000.0)
+        finally:
+            x.close()
+
+    samples.sort()
+    print(f"PING @ {baud} baud: {len(samples)}/{n} odpowiedzi  "
+          f"p50={percentile(samples, 50):.2f} ms  p99={percentile(samples, 99):.2f} ms  "
+          f"max={samples[-1] if samples else float('nan'):.2f} ms")
+
+
+def bench_telemetry(rate: float, seconds: float, baud: int) -> None:
+    """
+    Ile linii TEL/s odbiera read_line() przy zadanej częstotliwości telemetrii.
+    """
+    emu = FirmwareEmulator(period=1.0 / rate, model=BallModel(noise=0.05))
+    with PtyEmulator(emu, baud=baud) as dev:
+        x = SerialTransport(dev.path, baud, timeout=1.0)
+        x.open()
+        try:
+            x.reset_input()
+            x.write_line(add_crc("TEST"))
+            got = 0
+            t0 = time.perf_counter()
+            end = t0 + seconds
+            while time.perf_counter() < end:
+                line = x.read_line(timeout=0.5)
+                if line and line.startswith("TEL;"):
+                    got += 1
+            dt = time.perf_counter() - t0
+            x.write_line(add_crc("STOP"))
+        finally:
+            x.close()
+
+    # limit łącza: 10 bitów na bajt, linia TEL ma ~45 bajtów
+    expected = min(rate, baud / 10.0 / len(TEL_LINE)) if baud else rate
+    print(f"TEL @ {rate:.0f} Hz, {baud} baud: {got} linii w {dt:.2f} s "
+          f"= {got / dt:.0f} linii/s (oczekiwane ~{expected:.0f})")
+
+
+def make_log(n_lines: int) -> bytes:
+    """
+    Sztuczny log: linie TEL z różnymi wartościami, co 10. linia to ACK,
+    co 97. – linia ucięta (jak przy zgubionych bajtach).
+    """
+    import random
+    rng = random.Random(1)
+    out = []
+    for i in range(n_lines):
+        if i % 10 == 9:
+            out.append(b"ACK\r\n")
+        elif i % 97 == 96:
+            out.append(b"TEL;dist=25.80;sp=26.5\r\n")
+        else:
+            d = rng.uniform(5, 50)
+            out.append(f"TEL;dist={d:.2f};sp=26.50;err={d - 26.5:.2f};out={rng.uniform(-90, 90):.2f}\r\n".encode())
+    return b"".join(out)
+
+
+def parse_naive(blob: bytes) -> list:
+    """Punkt odniesienia: split na linie + protocol.parse_telemetry() dla każdej."""
+    lines = blob.decode("ascii", errors="ignore").split("\n")
+    if lines and not lines[-1]:
+        lines.pop()
+    return [parse_telemetry(ln[:-1] if ln.endswith("\r") else ln) for ln in lines]
+
+
+def bench_parse(n_lines: int) -> None:
+    """
+    Porównanie wektorowego parse_telemetry_batch() z parsowaniem linia po linii.
+    """
+    blob = make_log(n_lines)
+
+    t0 = time.perf_counter()
+    naive = parse_naive(blob)
+    t_naive = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    records, valid = parse_telemetry_batch(blob)
+    t_batch = time.perf_counter() - t0
+
+    # zgodność wyników (float32 vs float)
+    ok_naive = [v is not None for v in naive]
+    assert ok_naive == valid.tolist(), "validity mismatch"
+    for name_idx, name in enumerate(records.dtype.names):
+        ref = [v[name_idx] for v in naive if v is not None]
+        diff = max(abs(a - b) for a, b in zip(ref, records[name][valid].tolist()))
+        assert diff < 1e-3, f"value mismatch in {name}: {diff}"
+
+    mb = len(blob) / 1e6
+    print(f"{n_lines} linii ({mb:.1f} MB), poprawnych TEL: {int(valid.sum())}")
+    print(f"naive split()      {t_naive:7.3f} s  {mb / t_naive:8.1f} MB/s")
+    print(f"batch (numpy)      {t_batch:7.3f} s  {mb / t_batch:8.1f} MB/s  "
+          f"x{t_naive / t_batch:.1f}")
+
+
+def validate_naive(blob: bytes) -> list:
+    """Punkt odniesienia: ramka po ramce – rpartition('|') + compute_crc()."""
+    out = []
+    for line in blob.decode("latin-1").split("\n")[:-1]:
+        payload, sep, crc = line.rstrip("\r").rpartition("|")
+        try:
+            out.append(bool(sep) and len(crc) >= 2 and int(crc[:2], 16) == compute_crc(payload))
+        except ValueError:
+            out.append(False)
+    return out
+
+
+def bench_crc(n_frames: int) -> None:
+    """
+    Porównanie wektorowego validate_frames() z weryfikacją ramka po ramce.
+    """
+    cmds = ["PING", "TARGET(26.5)", "PID(3,2,1.5)", "ZERO(95)", "ECHO(hello)", "START"]
+    frames = []
+    for i in range(n_frames):
+        f = add_crc(cmds[i % len(cmds)])
+        if i % 13 == 12:
+            f = f[:-1] + ("0" if f[-1] != "0" else "1")  # uszkodzone CRC
+        frames.append(f)
+    blob = ("\n".join(frames) + "\n").encode("ascii")
+
+    t0 = time.perf_counter()
+    naive = validate_naive(blob)
+    t_naive = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    valid, _ = validate_frames(blob)
+    t_batch = time.perf_counter() - t0
+
+    assert naive == valid.tolist(), "validity mismatch"
+    print(f"{n_frames} ramek ({len(blob) / 1e6:.1f} MB), poprawnych: {int(valid.sum())}")
+    print(f"naive rpartition   {t_naive:7.3f} s  {n_frames / t_naive / 1e6:6.2f} M ramek/s")
+    print(f"batch (numpy)      {t_batch:7.3f} s  {n_frames / t_batch / 1e6:6.2f} M ramek/s  "
+          f"x{t_naive / t_batch:.1f}  (z listą payloadów)")
+
+
+def make_capture(path: str, n_lines: int, period: float = 0.1) -> None:
+    """
+    Sztuczne nagranie: log z make_log() po jednej linii co period sekund
+    (jak telemetria firmware'u), poprzedzony komendą TEST i jej ACK.
+    """
+    w = CaptureWriter(path)
+    t = 0.0
+    w.write(DIR_TX, add_crc("TEST").encode() + b"\n", t)
+    w.write(DIR_RX, b"ACK\r\n", t)
+    for line in make_log(n_lines).splitlines(keepends=True):
+        t += period
+        w.write(DIR_RX, line, t)
+    w.close()
+
+
+def bench_replay(path: str, n_lines: int, speed: float) -> None:
+    """
+    Przepustowość odbioru na nagranej sesji (ReplayTransport):
+    - read_line() + TelemetryMonitor (samo ramkowanie i analiza),
+    - cli.follow_telemetry() z wyjściem do /dev/null (pełna ścieżka podglądu).
+    """
+    from cli import follow_telemetry
+
+    tmp = None
+    if not path:
+        tmp = path = f"/tmp/bench-replay-{os.getpid()}.cap"
+        make_capture(path, n_lines)
+    try:
+        info = capture_info(path)
+        print(f"{path}: {info.lines} linii, RX {info.rx_bytes / 1e6:.2f} MB "
+              f"w {info.rx_chunks} porcjach, nagranie {info.duration:.1f} s, tempo {speed:g}")
+
+        x = ReplayTransport(path=path, speed=speed)
+        x.open()
+        monitor = TelemetryMonitor()
+        got = 0
+        t0 = time.perf_counter()
+        while True:
+            line = x.read_line(timeout=1.0)
+            if line is None:
+                if x.eof:
+                    break
+                continue
+            monitor.on_line(line)
+            got += 1
+        dt = time.perf_counter() - t0
+        x.close()
+        print(f"read_line + monitor   {dt:7.3f} s  {got / dt:10.0f} linii/s  "
+              f"{info.rx_bytes / dt / 1e6:6.1f} MB/s  (TEL: {monitor.frames})")
+
+        x = ReplayTransport(path=path, speed=speed)
+        x.open()
+        t0 = time.perf_counter()
+        with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+            follow_telemetry(x)
+        dt = time.perf_counter() - t0
+        x.close()
+        print(f"follow_telemetry      {dt:7.3f} s  {info.lines / dt:10.0f} linii/s  "
+              f"x{info.duration / dt:.0f} czasu rzeczywistego")
+    finally:
+        if tmp:
+            os.unlink(tmp)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("read", help="przepustowość read_line()")
+    p.add_argument("--lines", type=int, default=50000)
+
+    p = sub.add_parser("latency", help="czas odpowiedzi PING przez emulator")
+    p.add_argument("--n", type=int, default=500)
+    p.add_argument("--baud", type=int, default=9600)
+
+    p = sub.add_parser("telemetry", help="odbiór telemetrii z emulatora")
+    p.add_argument("--rate", type=float, default=1000.0)
+    p.add_argument("--seconds", type=float, default=3.0)
+    p.add_argument("--baud", type=int, default=115200)
+
+    p = sub.add_parser("parse", help="parsowanie linii TEL: wektorowo vs linia po linii")
+    p.add_argument("--lines", type=int, default=1000000)
+
+    p = sub.add_parser("crc", help="weryfikacja CRC ramek: wektorowo vs ramka po ramce")
+    p.add_argument("--frames", type=int, default=1000000)
+
+    p = sub.add_parser("replay", help="odbiór nagranej sesji (.cap) z pełną prędkością")
+    p.add_argument("path", nargs="?", help="plik .cap (domyślnie sztuczne nagranie)")
+    p.add_argument("--lines", type=int, default=200000, help="linie sztucznego nagrania")
+    p.add_argument("--speed", type=float, default=0.0, help="tempo odtwarzania (0 = najszybciej)")
+
+    args = ap.parse_args()
+    if args.cmd == "read":
+        bench_read(args.lines)
+    elif args.cmd == "latency":
+        bench_latency(args.n, args.baud)
+    elif args.cmd == "telemetry":
+        bench_telemetry(args.rate, args.seconds, args.baud)
+    elif args.cmd == "parse":
+        bench_parse(args.lines)
+    elif args.cmd == "crc":
+        bench_crc(args.frames)
+    elif args.cmd == "replay":
+        bench_replay(args.path, args.lines, args.speed)
+
+
+if __name__ == "__main__":
+    main()
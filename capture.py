@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Zapis surowej komunikacji (RX i TX) do zwartego pliku binarnego.
+
+Format pliku (.cap):
+- nagłówek: MAGIC (8 bajtów) + czas ścienny początku (float64, epoch),
+- rekordy: struct "<BIH" – kierunek (0 = RX, 1 = TX, 2 = sama przerwa,
+  3 = początek segmentu), przyrost czasu od poprzedniego rekordu w µs
+  (uint32), długość danych (uint16), a po nich dane.
+
+Istniejący plik nie jest nadpisywany: kolejne otwarcie (np. close() /
+open() transportu przy ponownym łączeniu) dopisuje rekord "segment"
+z czasem ściennym wznowienia (float64), a read_capture() przelicza
+od niego czas, więc t rośnie dalej od początku pierwszego segmentu.
+
+Czasy są monotoniczne (time.monotonic()) i zapisywane jako przyrosty,
+więc rekord ma tylko 7 bajtów narzutu. Dłuższe przerwy niż ok. 71 min
+zapisywane są jako kilka rekordów "przerwa" bez danych.
+
+Klasa CapturingSerial owija obiekt serial.Serial i kopiuje każdy
+read() / write() do CaptureWriter – włączane przez
+SerialTransport(capture="sesja.cap"). Odtwarzanie: replay.py.
+"""
+
+from __future__ import annotations
+import struct
+import threading
+import time
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+MAGIC = b"ISSCAP1\n"
+_HEADER = struct.Struct("<d")
+_RECORD = struct.Struct("<BIH")
+
+DIR_RX = 0
+DIR_TX = 1
+DIR_PAUSE = 2
+DIR_SEGMENT = 3
+
+_MAX_DELTA = 0xFFFFFFFF
+_MAX_LEN = 0xFFFF
+
+
+class CaptureWriter:
+    """
+    Zapis rekordów RX/TX do pliku (bezpieczny dla wielu wątków –
+    RX może pisać wątek czytający, a TX wątek główny).
+
+    Do istniejącego pliku przechwycenia zapis jest dopisywany jako nowy
+    segment; plik o innej zawartości nie jest ruszany (ValueError).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.records = 0
+        f = open(path, "ab")
+        try:
+            if f.tell() == 0:
+                f.write(MAGIC + _HEADER.pack(time.time()))
+            else:
+                with open(path, "rb") as old:
+                    if old.read(len(MAGIC)) != MAGIC:
+                        raise ValueError(f"not a capture file: {path}")
+                wall = _HEADER.pack(time.time())
+                f.write(_RECORD.pack(DIR_SEGMENT, 0, len(wall)) + wall)
+        except BaseException:
+            f.close()
+            raise
+        self._f: Optional[BinaryIO] = f
+        self._lock = threading.Lock()
+        self._t_last = time.monotonic()
+
+    def write(self, direction: int, data: bytes, t: Optional[float] = None) -> None:
+        """Dopisuje dane odebrane (DIR_RX) albo wysłane (DIR_TX)."""
+        if not data:
+            return
+        with self._lock:
+            f = self._f
+            if f is None:
+                return
+            now = time.monotonic() if t is None else t
+            delta = max(0, int((now - self._t_last) * 1e6))
+            self._t_last = now
+            while delta > _MAX_DELTA:
+                f.write(_RECORD.pack(DIR_PAUSE, _MAX_DELTA, 0))
+                delta -= _MAX_DELTA
+            for i in range(0, len(data), _MAX_LEN):
+                part = data[i:i + _MAX_LEN]
+                f.write(_RECORD.pack(direction, delta, len(part)))
+                f.write(part)
+                delta = 0
+                self.records += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._f is not None:
+                self._f.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+
+def read_capture(path: str) -> Tuple[float, Iterator[Tuple[int, float, bytes]]]:
+    """
+    Otwiera plik przechwycenia.
+
+    Zwraca (czas ścienny początku, iterator rekordów (kierunek, t, dane)),
+    gdzie t to sekundy od początku zapisu (dla dopisanych segmentów
+    liczone z ich czasu ściennego). Rekordy "przerwa" i "segment"
+    są pomijane.
+    """
+    f = open(path, "rb")
+    head = f.read(len(MAGIC) + _HEADER.size)
+    if head[:len(MAGIC)] != MAGIC:
+        f.close()
+        raise ValueError(f"not a capture file: {path}")
+    (t0_wall,) = _HEADER.unpack(head[len(MAGIC):])
+
+    def records() -> Iterator[Tuple[int, float, bytes]]:
+        t_us = 0
+        with f:
+            while True:
+                rec = f.read(_RECORD.size)
+                if len(rec) < _RECORD.size:
+                    return
+                direction, delta, length = _RECORD.unpack(rec)
+                data = f.read(length)
+                if len(data) < length:
+                    # ucięty zapis (np. przerwany program) – kończymy na pełnych rekordach
+                    return
+                t_us += delta
+                if direction == DIR_SEGMENT:
+                    if length == _HEADER.size:
+                        (wall,) = _HEADER.unpack(data)
+                        t_us = max(t_us, int((wall - t0_wall) * 1e6))
+                elif direction != DIR_PAUSE:
+                    yield direction, t_us / 1e6, data
+
+    return t0_wall, records()
+
+
+class CapturingSerial:
+    """
+    Pośrednik przed serial.Serial: read() i write() są kopiowane
+    do CaptureWriter, pozostałe atrybuty (timeout, in_waiting, close, ...)
+    przekazywane bez zmian. Zapisem (i zamknięciem pliku) zarządza
+    właściciel writera, więc plik przeżywa ponowne otwarcie portu.
+    """
+
+    def __init__(self, ser, writer: CaptureWriter) -> None:
+        object.__setattr__(self, "_ser", ser)
+        object.__setattr__(self, "_writer", writer)
+
+    def read(self, size: int = 1) -> bytes:
+        data = self._ser.read(size)
+        if data:
+            self._writer.write(DIR_RX, data)
+        return data
+
+    def write(self, data: bytes) -> int:
+        self._writer.write(DIR_TX, data)
+        return self._ser.write(data)
+
+    def __getattr__(self, name: str):
+        return getattr(self._ser, name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._ser, name, value)
@@ -8,20 +8,44 @@ Funkcje:
 - wyświetlanie dostępnych portów COM,
 - wypisywanie pomocy z listą komend,
 - prosty REPL (pętla odczytu komend z klawiatury),
-- obsługa trybu TEST (ciągła telemetria) i START (pomiar MAE).
+- obsługa trybu TEST (ciągła telemetria) i START (pomiar MAE),
+- wariant REPL oparty na asyncio (AsyncSerialTransport, opcja --async),
+- tryb wielu stanowisk naraz (SerialHub, opcja --hub COM3 COM4 ...),
+- REPL współbieżny z telemetrią (opcja --concurrent, console.py),
+- strojenie nastaw PID na symulatorze (podkomenda: python cli.py tune ...),
+- strumień punktów zadanych wg trajektorii (podkomenda: python cli.py trajectory ...).
 
 Komunikacja:
-- każda komenda jest normalizowana (obcięcie spacji),
-- jeśli nie ma już dopiętego CRC (brak znaku '|'), dodajemy je przez add_crc(),
+- każda komenda jest zamieniana na ramkę przez protocol.to_frame():
+  normalizacja (obcięcie spacji) i CRC, jeśli nie ma już znaku '|',
 - ramka jest wysyłana przez SerialTransport.write_line(),
-- odpowiedzi czytamy przez SerialTransport.read_line().
+- odpowiedzi czytamy przez SerialTransport.read_line(); dispatch.read_reply()
+  pomija przy tym (i wypisuje) przeplecione linie TEL / MAE / READY.
 """
 
 from __future__ import annotations
 import argparse
+import asyncio
+import sys
 import time
-from transport import SerialTransport, available_ports
-from protocol import add_crc, normalize
+from typing import Optional, Union
+from transport import PRIORITY_KINDS, SerialTransport, available_ports
+from reconnect import ReconnectingTransport
+from async_transport import AsyncSerialTransport
+from hub import SerialHub
+from pipeline import CommandPipeline
+from recorder import TelemetryRecorder
+from monitor import TelemetryMonitor
+from render import RENDER_MODES, StatusRenderer
+from plot import LivePlot
+from console import ConcurrentSession, PromptPrinter
+from priority import send_stop
+from dispatch import (MAE, NACK, Message, read_reply, read_reply_async, read_until,
+                      read_until_async)
+from protocol import command_kind, to_frame
+from plant import PlantParams
+from tuner import METHODS, SearchSpace, format_ranking, tune
+import trajectory
 
 
 def show_ports() -> None:
@@ -51,62 +75,164 @@ def show_help() -> None:
     print("TEST                 -> włącza tryb strojenia PID (telemetria, auto-follow)")
     print("START                -> uruchamia tryb zaliczeniowy (PID + MAE)")
     print("---------------------------")
+    print("CMD1; CMD2; ...      -> kilka komend naraz (potokowo), np. ZERO(95); TARGET(26.5)")
+    print("---------------------------")
     print("help                 -> pokazuje tę listę")
     print("ports                -> pokazuje dostępne porty COM")
+    print("stats [reset|PLIK]   -> czasy odpowiedzi (opcja --latency); PLIK = zrzut JSON")
     print("quit / exit          -> zakończenie programu\n")
 
 
-def follow_telemetry(x: SerialTransport) -> None:
+def follow_telemetry(x: SerialTransport, recorder: Optional[TelemetryRecorder] = None,
+                     monitor: Optional[TelemetryMonitor] = None,
+                     view: Optional[Union[StatusRenderer, LivePlot]] = None) -> None:
     """
     Odbiera i wypisuje kolejne linie telemetrii z Arduino.
 
     Tryb używany po komendzie TEST:
     - Arduino wysyła linię tekstu (np. 'TEL;dist=...;sp=...;err=...;out=...'),
     - klient wypisuje ją ze strzałką '<-',
-    - pętla działa aż do przerwania Ctrl+C po stronie użytkownika.
+    - pętla działa aż do przerwania Ctrl+C po stronie użytkownika
+      (albo do końca nagrania, gdy x to replay.ReplayTransport).
+
+    Jeśli podano recorder, linie TEL są dodatkowo zapisywane do pliku sesji.
+
+    Każda linia trafia też do monitora jakości strumienia (TelemetryMonitor):
+    na terminalu pod telemetrią widać pasek stanu (odstępy, jitter,
+    przerwy), a po zakończeniu wypisywane jest podsumowanie sesji.
+
+    Jeśli podano view (render.StatusRenderer albo wykres plot.LivePlot),
+    linie nie są wypisywane pojedynczo – view dostaje każdą linię
+    i odświeża podgląd w miejscu ze stałą częstotliwością, więc odczyt
+    nie czeka na terminal.
 
     Po przerwaniu:
-    - wysyłamy komendę STOP (z CRC),
+    - wysyłamy komendę STOP ścieżką priorytetową (przed wszystkim,
+      co czeka w kolejce wysyłania) i powtarzamy ją do ACK
+      (priority.send_stop) – wypisywany jest czas od STOP do ACK,
     - czyścimy bufor wejściowy portu szeregowego.
     """
+    if monitor is None:
+        monitor = TelemetryMonitor()
+    # pasek stanu tylko na terminalu (przy przekierowaniu do pliku – same linie)
+    live = sys.stdout.isatty() and view is None
+    status, next_status = "", 0.0
+    wait = 0.3
+    if view is not None:
+        # pod tabelą: pasek stanu monitora bieżącej sesji
+        view.footer = monitor.status
+        view.start()
+        wait = min(wait, view.refresh)
+
     print("(telemetria aktywna — Ctrl+C aby przerwać)")
     try:
         while True:
-            # próbujemy przeczytać linię z krótkim timeoutem
-            line = x.read_line(timeout=0.3)
+            # read_line() czeka na dane (bez aktywnego odpytywania);
+            # timeout tylko po to, żeby co jakiś czas odświeżyć pasek stanu
+            line = x.read_line(timeout=wait)
+            now = time.monotonic()
+            if line is None and getattr(x, "eof", False):
+                # odtwarzanie nagrania dobiegło końca
+                if live:
+                    sys.stdout.write("\r\033[K")
+                if view is not None:
+                    view.render(now)
+                    view.close()
+                print("(koniec nagrania)")
+                break
             if line is not None:
-                # coś przyszło — wypisujemy
-                print("<-", line)
-            else:
-                # brak danych — dajemy trochę odetchnąć CPU
-                time.sleep(0.05)
+                monitor.on_line(line, now)
+                # coś przyszło — wypisujemy (i ewentualnie nagrywamy)
+                if view is not None:
+                    view.on_line(line, now)
+                else:
+                    if live:
+                        sys.stdout.write("\r\033[K")
+                    print("<-", line)
+                if recorder is not None:
+                    recorder.add_line(line)
+
+            if view is not None:
+                view.tick(now)
+            elif live:
+                # tekst paska przeliczamy co 0.5 s, rysujemy po każdej linii
+                if now >= next_status:
+                    status, next_status = monitor.status(), now + 0.5
+                sys.stdout.write(f"\r\033[K[{status}]")
+                sys.stdout.flush()
     except KeyboardInterrupt:
+        if live:
+            sys.stdout.write("\r\033[K")
+        if view is not None:
+            view.close()
         # użytkownik przerwał telemetrię
         print("\n(przerwano podgląd, wysyłam STOP...)")
         try:
-            # składamy ramkę STOP z CRC
-            stop_frame = add_crc("STOP")
-            x.write_line(stop_frame)
-            print("->", stop_frame)
-            # próbujemy odczytać ACK
-            ack = x.read_line(timeout=2.0)
-            if ack:
-                print("<-", ack)
-            else:
-                print("<- (brak odpowiedzi na STOP)")
+            # linie TEL, które były już w drodze, pomijamy
+            result = send_stop(x)
+            print("->", result.frame)
+            print("<-", result.format())
         except Exception as e:
             print("Błąd przy wysyłaniu STOP:", e)
 
         # dodatkowe czyszczenie bufora wejściowego
         try:
-            x._ser.reset_input_buffer()
+            x.reset_input()
         except Exception:
             pass
 
-        print("(tryb TEST zakończony)\n")
+    if x.dropped:
+        print(f"(utracono {x.dropped} linii – przepełniona kolejka odczytu)")
+    if recorder is not None:
+        recorder.flush()
+        print(f"(zapisano {recorder.rows_written} wierszy telemetrii do {recorder.path})")
+    print(monitor.summary())
+    print("(tryb TEST zakończony)\n")
+
+
+def run_batch(x: SerialTransport, cmds: list) -> None:
+    """
+    Wysyła kilka komend potokowo (CommandPipeline) i wypisuje odpowiedzi.
+
+    Kolejne ramki wychodzą bez czekania na odpowiedź poprzednich
+    (w granicach bufora odbiorczego Arduino), a odpowiedzi są
+    przypisywane komendom po kolei.
+    """
+    pipe = CommandPipeline(x, on_unsolicited=lambda line: print("<-", line))
+    futures = pipe.run(cmds)
+    for cmd, fut in zip(cmds, futures):
+        try:
+            resp = fut.result()
+        except TimeoutError:
+            resp = "(brak odpowiedzi)"
+        print(f"-> {cmd.strip():20s} <- {resp}")
+
 
+def show_stats(x: SerialTransport, arg: str = "") -> None:
+    """
+    Komenda lokalna 'stats': tabela czasów odpowiedzi per typ komendy.
 
-def repl(x: SerialTransport) -> None:
+    'stats reset' zeruje histogramy, 'stats PLIK' zapisuje je do pliku JSON.
+    """
+    tracker = x.latency
+    if tracker is None:
+        print("Pomiar czasów wyłączony (uruchom z opcją --latency).")
+        return
+    if arg.upper() == "RESET":
+        tracker.stats.reset()
+        print("(histogramy wyzerowane)")
+        return
+    if arg:
+        tracker.stats.dump_json(arg)
+        print(f"(zapisano do {arg})")
+        return
+    print(tracker.stats.format_table())
+    if tracker.expired:
+        print(f"(ramek bez odpowiedzi: {tracker.expired})")
+
+
+def repl(x: SerialTransport, recorder: Optional[TelemetryRecorder] = None,
+         view: Optional[Union[StatusRenderer, LivePlot]] = None) -> None:
     """
     Prosty REPL (Read-Eval-Print Loop) do wysyłania komend do Arduino.
 
@@ -146,16 +272,19 @@ def repl(x: SerialTransport) -> None:
         if cmd_upper == "PORTS":
             show_ports()
             continue
+        if cmd_upper == "STATS" or cmd_upper.startswith("STATS "):
+            show_stats(x, cmd[5:].strip())
+            continue
 
-        # --- Komenda ma pójść na Arduino ---
+        # kilka komend rozdzielonych ';' – wysyłamy potokowo
+        if ";" in cmd:
+            run_batch(x, [c for c in cmd.split(";") if c.strip()])
+            continue
 
-        # normalizujemy (na razie tylko strip)
-        payload = normalize(cmd)
+        # --- Komenda ma pójść na Arduino ---
 
-        # jeśli payload nie zawiera już separatora CRC '|',
-        # to zakładamy, że CRC jest jeszcze nie dopięte
-        if "|" not in payload:
-            payload = add_crc(payload)
+        # normalizacja + CRC (jeśli użytkownik nie podał ramki z '|')
+        payload = to_frame(cmd)
 
         # zapis w strukturze SerialTransport: ostatnio wysłana komenda.
         # Dzięki temu read_line() może np. ustawić dłuższy timeout dla START.
@@ -166,33 +295,372 @@ def repl(x: SerialTransport) -> None:
         # specjalne traktowanie komendy TEST
         if cmd_upper == "TEST":
             # najpierw czekamy na pierwszą odpowiedź (ACK / błąd)
-            ack = x.read_line(timeout=2.0)
-            print("<-", ack if ack is not None else "(brak odpowiedzi)")
+            ack = read_reply(x, 2.0, on_other=_print_message)
+            print("<-", ack.line if ack is not None else "(brak odpowiedzi)")
+            if ack is not None and ack.kind == NACK:
+                continue
             # potem przechodzimy w tryb ciągłej telemetrii
-            follow_telemetry(x)
+            follow_telemetry(x, recorder, view=view)
             continue
 
         # specjalne traktowanie komendy START
         if cmd_upper == "START":
+            # najpierw ACK (albo NACK), potem po ~13 s wynik MAE=...
+            ack = read_reply(x, 2.0, on_other=_print_message)
+            if ack is None or ack.kind == NACK:
+                print("<-", ack.line if ack is not None else "(brak odpowiedzi)")
+                continue
+            print("<-", ack.line)
             print("(czekam na wynik MAE... może to potrwać ~15s)")
-            # czytamy pierwszą linię (MAE albo ACK+MAE, w zależności od logiki Arduino)
-            first = x.read_line(timeout=None)  # timeout dobierany dynamicznie
-            if first:
-                print("<-", first)
-                # ewentualnie druga linia (np. dodatkowe info)
-                second = x.read_line(timeout=0.5)
-                if second:
-                    print("<-", second)
-            else:
-                print("<- (brak odpowiedzi)")
+            mae = read_until(x, (MAE,), x.start_timeout, on_other=_print_message)
+            print("<-", mae.line if mae is not None else "(brak wyniku MAE)")
             continue
 
-        # standardowa ścieżka: jedna odpowiedź z określonym timeoutem
-        resp = x.read_line(timeout=2.0)
+        # standardowa ścieżka: jedna odpowiedź z określonym timeoutem;
+        # linie, które nie są odpowiedzią (np. spóźnione MAE), wypisujemy osobno
+        resp = read_reply(x, 2.0, on_other=_print_message)
         if resp is None:
             print("<- (brak odpowiedzi)")
         else:
-            print("<-", resp)
+            print("<-", resp.line)
+
+
+def _print_message(msg: Message) -> None:
+    """Linia odebrana w oczekiwaniu na odpowiedź (TEL, MAE, READY)."""
+    print("<-", msg.line)
+
+
+def concurrent_repl(x: SerialTransport, recorder: Optional[TelemetryRecorder] = None) -> None:
+    """
+    Wariant repl() z odczytem w tle (opcja --concurrent).
+
+    Telemetria po TEST płynie nad wierszem zachęty, a komendy (np. TARGET,
+    PID w trakcie regulacji) są wysyłane od razu, bez zatrzymywania trybu.
+    Odpowiedzi są przypisywane do komend przez ConcurrentSession.
+    Przy wyjściu w trakcie telemetrii wysyłany jest STOP.
+    """
+    prompt = "~> "
+    printer = PromptPrinter(prompt)
+    session = ConcurrentSession(x, printer,
+                                on_tel=recorder.add_line if recorder is not None else None)
+    print("help, ports, stats, quit;  komendy wysyłane od razu, także w trakcie TEST")
+    session.start()
+    try:
+        while True:
+            try:
+                raw = input(prompt)
+            except EOFError:
+                break
+
+            cmd = raw.strip()
+            if not cmd:
+                continue
+            cmd_upper = cmd.upper()
+
+            if cmd_upper in {"QUIT", "EXIT", "Q"}:
+                break
+            if cmd_upper == "HELP":
+                show_help()
+                continue
+            if cmd_upper == "PORTS":
+                show_ports()
+                continue
+            if cmd_upper == "STATS" or cmd_upper.startswith("STATS "):
+                show_stats(x, cmd[5:].strip())
+                continue
+
+            # kilka komend rozdzielonych ';' – każda wysyłana od razu;
+            # STOP / B ścieżką priorytetową, z powtarzaniem do ACK
+            for part in cmd.split(";"):
+                if not part.strip():
+                    continue
+                frame = to_frame(part)
+                if command_kind(frame) in PRIORITY_KINDS:
+                    printer.print(f"-> {frame}")
+                    printer.print(session.send_stop(frame).format())
+                    continue
+                session.send(frame)
+                printer.print(f"-> {frame}")
+    finally:
+        if session.streaming:
+            printer.print(session.send_stop().format())
+        session.stop()
+        if recorder is not None:
+            recorder.flush()
+        print()
+        print(session.monitor.summary())
+
+
+async def follow_telemetry_async(x: AsyncSerialTransport) -> None:
+    """
+    Asynchroniczny odpowiednik follow_telemetry().
+
+    Telemetria jest wypisywana, dopóki użytkownik nie naciśnie Enter
+    (input() działa w osobnym wątku, więc nie blokuje pętli zdarzeń).
+    Potem wysyłamy STOP i czekamy na ACK.
+    """
+    print("(telemetria aktywna — Enter aby przerwać)")
+    loop = asyncio.get_running_loop()
+    stop_pressed = loop.run_in_executor(None, input)
+
+    async def pump() -> None:
+        async for line in x.lines():
+            print("<-", line)
+
+    reader = asyncio.ensure_future(pump())
+    try:
+        await asyncio.wait({reader, stop_pressed}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        reader.cancel()
+
+    if not stop_pressed.done():
+        # strumień skończył się sam (port zamknięty / błąd) – input() w wątku
+        # puli nadal czeka i zjadłby następną linię wpisaną w REPL
+        if reader.done() and not reader.cancelled() and reader.exception() is not None:
+            print(f"(błąd odczytu: {reader.exception()})")
+        print("(strumień telemetrii zakończony — naciśnij Enter)")
+        try:
+            await stop_pressed
+        except EOFError:
+            pass
+
+    print("(przerwano podgląd, wysyłam STOP...)")
+    try:
+        stop_frame = to_frame("STOP")
+        await x.write_line(stop_frame)
+        print("->", stop_frame)
+        # linie TEL, które były już w drodze, pomijamy
+        ack = await read_reply_async(x, 2.0)
+        print("<-", ack.line if ack is not None else "(brak odpowiedzi na STOP)")
+    except Exception as e:
+        print("Błąd przy wysyłaniu STOP:", e)
+
+    try:
+        x.reset_input()
+    except Exception:
+        pass
+    print("(tryb TEST zakończony)\n")
+
+
+async def repl_async(x: AsyncSerialTransport) -> None:
+    """
+    Wariant repl() dla AsyncSerialTransport.
+
+    Zachowanie takie samo jak w repl(); input() wykonywany jest
+    w puli wątków pętli zdarzeń, więc pętla może w tym czasie
+    obsługiwać inne porty lub zadania.
+    """
+    loop = asyncio.get_running_loop()
+    print("help, ports, quit")
+    while True:
+        try:
+            raw = await loop.run_in_executor(None, input, "> ")
+        except EOFError:
+            break
+
+        if not raw.strip():
+            continue
+
+        cmd = raw.strip()
+        cmd_upper = cmd.upper()
+
+        if cmd_upper in {"QUIT", "EXIT", "Q"}:
+            break
+        if cmd_upper == "HELP":
+            show_help()
+            continue
+        if cmd_upper == "PORTS":
+            show_ports()
+            continue
+
+        payload = to_frame(cmd)
+        await x.write_line(payload)
+        print("->", payload)
+
+        if cmd_upper == "TEST":
+            ack = await read_reply_async(x, 2.0, on_other=_print_message)
+            print("<-", ack.line if ack is not None else "(brak odpowiedzi)")
+            if ack is not None and ack.kind == NACK:
+                continue
+            await follow_telemetry_async(x)
+            continue
+
+        if cmd_upper == "START":
+            # najpierw ACK (albo NACK), potem po ~13 s wynik MAE=...
+            ack = await read_reply_async(x, 2.0, on_other=_print_message)
+            if ack is None or ack.kind == NACK:
+                print("<-", ack.line if ack is not None else "(brak odpowiedzi)")
+                continue
+            print("<-", ack.line)
+            print("(czekam na wynik MAE... może to potrwać ~15s)")
+            mae = await read_until_async(x, (MAE,), x.start_timeout, on_other=_print_message)
+            print("<-", mae.line if mae is not None else "(brak wyniku MAE)")
+            continue
+
+        resp = await read_reply_async(x, 2.0, on_other=_print_message)
+        print("<-", resp.line if resp is not None else "(brak odpowiedzi)")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    """
+    Punkt wejścia dla opcji --async: te same kroki co main(),
+    ale z AsyncSerialTransport i repl_async().
+    """
+    x = AsyncSerialTransport(args.port, args.baud, timeout=1.0)
+    await x.open()
+    print(f"Opened {args.port} @ {args.baud} baud (asyncio)")
+
+    print(_ready_note(x.ready))
+
+    try:
+        await repl_async(x)
+    finally:
+        try:
+            await x.close()
+        except Exception:
+            pass
+        print("Port zamknięty.")
+
+
+def hub_repl(hub: SerialHub) -> None:
+    """
+    REPL dla trybu --hub.
+
+    Składnia:
+    - 'KOMENDA'            -> wysyłana do wszystkich stanowisk,
+    - '@COM3 KOMENDA'      -> tylko do stanowiska COM3,
+    - '@2 KOMENDA'         -> do stanowiska nr 2 (numeracja wg 'rigs'),
+    - 'rigs'               -> lista stanowisk,
+    - help, ports, quit    -> jak w zwykłym REPL.
+
+    Odpowiedzi i telemetria wszystkich stanowisk są wypisywane na bieżąco
+    przez pętlę huba działającą w osobnym wątku.
+    """
+    print("help, ports, rigs, quit;  @RIG KOMENDA – komenda do jednego stanowiska")
+    while hub.rigs:
+        try:
+            raw = input("hub> ")
+        except EOFError:
+            break
+
+        cmd = raw.strip()
+        if not cmd:
+            continue
+        cmd_upper = cmd.upper()
+
+        if cmd_upper in {"QUIT", "EXIT", "Q"}:
+            break
+        if cmd_upper == "HELP":
+            show_help()
+            continue
+        if cmd_upper == "PORTS":
+            show_ports()
+            continue
+        if cmd_upper == "RIGS":
+            for i, rig in enumerate(list(hub.rigs.values()), start=1):
+                print(f"{i:2d}  {rig.rig_id:12s}  linii odebranych: {rig.lines_rx}")
+            continue
+
+        try:
+            if cmd.startswith("@"):
+                target, _, rest = cmd[1:].partition(" ")
+                if not rest.strip():
+                    print("(brak komendy po @RIG)")
+                    continue
+                rig_id = hub.resolve(target)
+                print(f"[{rig_id}] ->", hub.send(rig_id, rest))
+            else:
+                print("[*] ->", hub.broadcast(cmd))
+        except KeyError as e:
+            print("Nieznane stanowisko:", e)
+        except Exception as e:
+            print("Błąd wysyłania:", e)
+
+
+def main_hub(args: argparse.Namespace) -> None:
+    """
+    Punkt wejścia dla opcji --hub: otwiera wszystkie porty i uruchamia hub_repl().
+    """
+    log = open(args.log, "a", encoding="ascii", errors="ignore") if args.log else None
+    hub = SerialHub(log=log)
+    try:
+        opened = hub.open_ports(args.hub, args.baud)
+        if not opened:
+            print("Nie udało się otworzyć żadnego portu.")
+            return
+        print(f"Otwarte stanowiska: {', '.join(opened)} @ {args.baud} baud\n")
+        hub.start()
+        hub_repl(hub)
+    finally:
+        hub.close()
+        if log is not None:
+            log.close()
+        print("Porty zamknięte.")
+
+
+def _ready_note(ready: bool) -> str:
+    """Komunikat o gotowości portu po open()."""
+    if ready:
+        return "(port gotowy, Arduino zgłosiło READY)\n"
+    return "(port gotowy; brak READY – płytka nie zresetowała się przy otwarciu?)\n"
+
+
+def _range(text: str) -> tuple:
+    """Zakres 'od:do' z linii poleceń."""
+    lo, _, hi = text.partition(":")
+    return float(lo), float(hi)
+
+
+def main_tune(argv: list) -> None:
+    """
+    Podkomenda tune: przeszukiwanie nastaw PID na symulatorze (tuner.py),
+    ranking najlepszych zestawów i opcjonalnie wysłanie najlepszego
+    jako PID(...) do stanowiska (--apply PORT).
+    """
+    ap = argparse.ArgumentParser(prog="cli.py tune",
+                                 description="strojenie PID na symulatorze stanowiska")
+    ap.add_argument("--method", choices=METHODS, default="cem")
+    ap.add_argument("--budget", type=int, default=10000, help="liczba symulowanych zestawów")
+    ap.add_argument("--rounds", type=int, default=5, help="liczba rund metody cem")
+    ap.add_argument("--kp", type=_range, default=(0.0, 10.0), metavar="OD:DO")
+    ap.add_argument("--ki", type=_range, default=(0.0, 5.0), metavar="OD:DO")
+    ap.add_argument("--kd", type=_range, default=(0.0, 5.0), metavar="OD:DO")
+    ap.add_argument("--target", type=float, default=26.5, help="punkt zadany TARGET (cm)")
+    ap.add_argument("--zero", type=int, default=90, help="położenie neutralne serwa ZERO")
+    ap.add_argument("--noise", type=float, default=0.0, help="szum pomiaru w symulacji (cm)")
+    ap.add_argument("--workers", type=int, default=None, help="liczba procesów (domyślnie: rdzenie)")
+    ap.add_argument("--chunk", type=int, default=2000, help="zestawy w jednej porcji pracy")
+    ap.add_argument("--abort-after", type=float, default=2.0,
+                    help="przerywaj przebieg po tylu s na ograniczniku belki (0 = nigdy)")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--top", type=int, default=10, help="długość rankingu")
+    ap.add_argument("--apply", metavar="PORT", help="wyślij najlepsze nastawy do stanowiska")
+    ap.add_argument("--baud", type=int, default=9600)
+    args = ap.parse_args(argv)
+
+    params = PlantParams(noise=args.noise, distance_point=args.target, servo_zero=args.zero)
+    result = tune(
+        args.method,
+        args.budget,
+        SearchSpace(args.kp, args.ki, args.kd),
+        params,
+        workers=args.workers,
+        chunk=args.chunk,
+        seed=args.seed,
+        rounds=args.rounds,
+        abort_after=args.abort_after or None,
+        top=args.top,
+    )
+    print(format_ranking(result))
+
+    best = result.best
+    if args.apply and best is not None and not best.aborted:
+        x = SerialTransport(args.apply, args.baud, timeout=1.0)
+        x.open()
+        try:
+            run_batch(x, [f"ZERO({args.zero})", f"TARGET({args.target:g})", best.command()])
+        finally:
+            x.close()
 
 
 def main() -> None:
@@ -202,37 +670,113 @@ def main() -> None:
     Kroki:
     1. Parsowanie argumentów linii poleceń (port + opcjonalny baud).
     2. Otwarcie portu szeregowego przez SerialTransport.
-    3. Krótkie czyszczenie bufora wejściowego.
+    3. Oczekiwanie na READY po resecie Arduino (w open()).
     4. Uruchomienie pętli REPL.
+
+    "python cli.py tune ..." uruchamia zamiast tego main_tune(),
+    a "python cli.py trajectory ..." – trajectory.main().
     """
+    if len(sys.argv) > 1 and sys.argv[1] == "tune":
+        main_tune(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "trajectory":
+        trajectory.main(sys.argv[2:])
+        return
+
     ap = argparse.ArgumentParser()
-    ap.add_argument("port", help="np. COM16")
+    ap.add_argument("port", nargs="?", help="np. COM16")
     ap.add_argument("--baud", type=int, default=9600, help="domyślnie 9600")
+    ap.add_argument("--reader-thread", action="store_true",
+                    help="odczyt w osobnym wątku (telemetria nie czeka na input())")
+    ap.add_argument("--queue-size", type=int, default=1024,
+                    help="pojemność kolejki linii w trybie --reader-thread")
+    ap.add_argument("--overflow", choices=["drop_oldest", "block"], default="drop_oldest",
+                    help="co robić przy pełnej kolejce (domyślnie drop_oldest)")
+    ap.add_argument("--async", dest="use_async", action="store_true",
+                    help="REPL na asyncio (AsyncSerialTransport, tylko POSIX)")
+    ap.add_argument("--hub", nargs="+", metavar="PORT",
+                    help="wiele stanowisk naraz, np. --hub COM3 COM4 (tylko POSIX)")
+    ap.add_argument("--log", help="plik zbiorczego logu linii w trybie --hub")
+    ap.add_argument("--record", metavar="DIR",
+                    help="nagrywaj telemetrię z trybu TEST do katalogu sesji (format binarny)")
+    ap.add_argument("--latency", action="store_true",
+                    help="mierz czasy odpowiedzi na komendy (REPL: stats)")
+    ap.add_argument("--reconnect", action="store_true",
+                    help="po zerwaniu połączenia otwieraj port ponownie i przywracaj ZERO/TARGET/PID")
+    ap.add_argument("--no-reset", action="store_true",
+                    help="otwieraj port bez DTR/RTS (bez resetu Arduino); na Linuksie "
+                         "wymaga też stty -hupcl")
+    ap.add_argument("--latency-json", metavar="PLIK",
+                    help="przy wyjściu zapisz histogramy czasów odpowiedzi do pliku JSON")
+    ap.add_argument("--concurrent", action="store_true",
+                    help="komendy wpisywane w trakcie telemetrii (odczyt w tle, telemetria nad zachętą)")
+    ap.add_argument("--render", choices=RENDER_MODES,
+                    help="telemetria TEST jako odświeżana w miejscu linia stanu / tabela "
+                         "(min/śr./max w oknie) zamiast linii po linii")
+    ap.add_argument("--plot", action="store_true",
+                    help="telemetria TEST jako wykres na żywo (sp, dist, err, out)")
+    ap.add_argument("--plot-column", type=float, default=0.1,
+                    help="czas na jedną kolumnę wykresu --plot (s, domyślnie 0.1)")
+    ap.add_argument("--refresh", type=float, default=5.0,
+                    help="częstotliwość odświeżania --render / --plot (Hz, domyślnie 5)")
+    ap.add_argument("--capture", metavar="PLIK",
+                    help="zapisuj wszystkie bajty RX/TX do pliku .cap (odtwarzanie: replay.py)")
+    ap.add_argument("--coalesce", action="store_true",
+                    help="kolejka wysyłania w tle: niewysłany TARGET/PID/ZERO zastępowany nowszym")
     args = ap.parse_args()
 
+    if args.hub:
+        main_hub(args)
+        return
+    if not args.port:
+        ap.error("podaj port albo --hub PORT [PORT ...]")
+
+    if args.use_async:
+        asyncio.run(main_async(args))
+        return
+
     # tworzymy transport i otwieramy port
-    x = SerialTransport(args.port, args.baud, timeout=1.0)
+    options = dict(
+        timeout=1.0,
+        reader_thread=args.reader_thread,
+        queue_size=args.queue_size,
+        overflow=args.overflow,
+        record_latency=args.latency or bool(args.latency_json),
+        reset_on_open=not args.no_reset,
+        capture=args.capture,
+        write_queue=args.coalesce,
+    )
+    if args.reconnect:
+        x = ReconnectingTransport(args.port, args.baud,
+                                  on_event=lambda msg: print(f"\n({msg})"), **options)
+    else:
+        x = SerialTransport(args.port, args.baud, **options)
     x.open()
     print(f"Opened {args.port} @ {args.baud} baud")
 
-    # chwilka na ustabilizowanie się portu oraz wyczyszczenie bufora
-    time.sleep(1.0)
+    # open() czekało już na READY i porzuciło wszystko, co przyszło przed nim
+    if args.no_reset:
+        print("(port gotowy, otwarty bez resetu Arduino)\n")
+    else:
+        print(_ready_note(x.ready))
+
+    recorder = TelemetryRecorder(args.record) if args.record else None
+    view = None
+    if args.plot:
+        view = LivePlot(1.0 / args.refresh, args.plot_column)
+    elif args.render:
+        view = StatusRenderer(1.0 / args.refresh, args.render)
     try:
-        # czyścimy wszystko co mogło leżeć w buforze wejściowym
-        while True:
-            line = x.read_line(timeout=0.2)
-            if not line:
-                break
-        x._ser.reset_input_buffer()
-    except Exception:
-        # jeśli coś pójdzie nie tak, po prostu ignorujemy błąd
-        pass
-    print("(port gotowy, bufor wyczyszczony)\n")
-
-    try:
-        repl(x)
+        if args.concurrent:
+            concurrent_repl(x, recorder)
+        else:
+            repl(x, recorder, view)
     finally:
-        # przy wychodzeniu zawsze zamykamy port
+        # przy wychodzeniu zawsze zamykamy port (i plik nagrania)
+        if recorder is not None:
+            recorder.close()
+        if args.latency_json and x.latency is not None:
+            x.latency.stats.dump_json(args.latency_json)
         try:
             x.close()
         except Exception:
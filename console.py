@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Współbieżna konsola: wpisywanie komend w trakcie strumienia telemetrii.
+
+W zwykłym REPL komenda TEST przełącza w follow_telemetry() aż do Ctrl+C,
+więc zmiana TARGET / PID wymaga zatrzymania regulatora. Tutaj:
+- osobny wątek (ConcurrentSession) bez przerwy czyta linie z portu,
+- telemetria wypisywana jest nad stałym wierszem zachęty (PromptPrinter),
+  z ograniczoną częstotliwością (najnowsza linia TEL co tel_interval s);
+  monitor i recorder dostają każdą linię,
+- wpisana komenda jest wysyłana od razu, a odpowiedzi (ACK, NACK(...),
+  PONG, echo) są oddzielane od TEL / MAE / READY i przypisywane do
+  wysłanych komend w kolejności przez dispatch.Dispatcher,
+- komenda bez odpowiedzi dłużej niż reply_timeout jest zgłaszana,
+- STOP / B idą ścieżką priorytetową i są powtarzane do ACK (send_stop()).
+
+Użycie: python cli.py COMx --concurrent (najlepiej z --reader-thread).
+"""
+
+from __future__ import annotations
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Optional
+
+from dispatch import ACK, MAE, READY, TEL, Dispatcher, Message, classify
+from monitor import TelemetryMonitor
+from priority import StopResult
+from protocol import command_kind, to_frame
+from transport import SerialTransport
+
+try:
+    import readline
+except ImportError:
+    # Windows: brak readline – zachęta jest odtwarzana bez wpisanego tekstu
+    readline = None
+
+DEBUG = False
+
+
+class PromptPrinter:
+    """
+    Wypisywanie tekstu nad wierszem zachęty input() z innego wątku.
+
+    Bieżący wiersz (zachęta + to, co użytkownik zdążył wpisać) jest
+    wymazywany, tekst wypisywany, a wiersz odtwarzany – wpisywanie
+    nie jest przerywane. Na terminalu bez readline odtwarzana jest
+    sama zachęta.
+    """
+
+    def __init__(self, prompt: str = "> ", out=None) -> None:
+        self.prompt = prompt
+        self.out = out or sys.stdout
+        self.live = self.out.isatty()
+        self._lock = threading.Lock()
+
+    def print(self, text: str) -> None:
+        with self._lock:
+            if not self.live:
+                self.out.write(text + "\n")
+                self.out.flush()
+                return
+            typed = readline.get_line_buffer() if readline is not None else ""
+            self.out.write(f"\r\033[K{text}\n{self.prompt}{typed}")
+            self.out.flush()
+
+
+class ConcurrentSession:
+    """
+    Wątek odbierający linie z portu w trakcie pracy REPL.
+
+    Parametry:
+        x             : otwarty SerialTransport (zalecany reader_thread=True),
+        printer       : wyjście nad zachętą,
+        monitor       : monitor telemetrii (domyślnie nowy),
+        on_tel        : wywoływane z każdą linią TEL (np. recorder.add_line),
+        tel_interval  : co ile sekund pokazywać najnowszą linię TEL (0 = każdą),
+        reply_timeout : po tylu sekundach komenda bez odpowiedzi jest zgłaszana.
+
+    Jeśli transport ma kolejkę wysyłania (write_queue=True), komenda
+    zastąpiona w niej nowszą wartością albo porzucona przez STOP jest
+    anulowana w dispatcherze, żeby nie przejęła cudzej odpowiedzi.
+
+    Atrybuty:
+        dispatcher : klasyfikacja linii (można dodać własnych subskrybentów),
+        replies    : liczba odpowiedzi przypisanych do komend,
+        expired    : komendy bez odpowiedzi.
+    """
+
+    def __init__(self, x: SerialTransport, printer: PromptPrinter,
+                 monitor: Optional[TelemetryMonitor] = None,
+                 on_tel: Optional[Callable[[str], None]] = None,
+                 tel_interval: float = 0.2, reply_timeout: float = 2.0) -> None:
+        self.x = x
+        self.printer = printer
+        self.monitor = monitor or TelemetryMonitor()
+        self.on_tel = on_tel
+        self.tel_interval = tel_interval
+        self.reply_timeout = reply_timeout
+        self.replies = 0
+        self.expired = 0
+        self.dispatcher = Dispatcher(on_unmatched=lambda m: printer.print(f"<- {m.line}"))
+        self.dispatcher.subscribe(None, lambda m: self.monitor.on_line(m.line, self._now))
+        self.dispatcher.subscribe(TEL, self._on_tel)
+        self.dispatcher.subscribe((MAE, READY), lambda m: printer.print(f"<- {m.line}"))
+        self._now = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._tel_hidden = 0
+        self._tel_next = 0.0
+        self._last_tel = 0.0
+        self._dropped: set = set()
+        if getattr(x, "write_queue", False):
+            if x.on_coalesced is None:
+                x.on_coalesced = lambda old, new: self.dispatcher.discard(old)
+            if x.on_dropped is None:
+                x.on_dropped = self._on_dropped
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="console-reader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    @property
+    def streaming(self) -> bool:
+        """Czy w ostatniej sekundzie przychodziła telemetria."""
+        return time.monotonic() - self._last_tel < 1.0
+
+    def send(self, frame: str) -> Future:
+        """
+        Wysyła ramkę od razu i zwraca Future odpowiedzi
+        (STOP / B – ścieżką priorytetową, jednokrotnie; z powtarzaniem
+        do ACK: send_stop()).
+        """
+        sent = time.monotonic()
+        fut = self._write(frame, sent)
+        fut.add_done_callback(lambda f: self._on_reply(frame, sent, f))
+        return fut
+
+    def send_stop(self, cmd: str = "STOP", timeout: float = 2.0,
+                  retry: float = 0.25) -> StopResult:
+        """
+        Odpowiednik priority.send_stop() dla sesji: odpowiedzi odbiera
+        wątek sesji, a tutaj czekamy na Future kolejnych prób. ACK dowolnej
+        z nich kończy czekanie; ACK pozostałych trafią do ich Future.
+        """
+        result = StopResult(to_frame(cmd))
+        start = time.monotonic()
+        end = start + timeout
+        waiting = []
+        while True:
+            sent = time.monotonic()
+            if sent >= end:
+                break
+            waiting.append(self._write(result.frame, sent))
+            result.attempts += 1
+            done, _ = wait(waiting, timeout=min(retry, end - sent), return_when=FIRST_COMPLETED)
+            for fut in done:
+                waiting.remove(fut)
+                reply = fut.result() if fut.exception() is None else None
+                if reply is not None and classify(reply).kind == ACK:
+                    now = time.monotonic()
+                    result.acked = True
+                    result.latency = now - start
+                    result.last = now - sent
+                    result.elapsed = result.latency
+                    return result
+                if reply is not None:
+                    result.reply = reply
+        result.elapsed = time.monotonic() - start
+        return result
+
+    def _write(self, frame: str, sent: float) -> Future:
+        """
+        Rejestruje ramkę w dispatcherze i ją wysyła. Ramka jest
+        rejestrowana przed zapisem, żeby szybka odpowiedź nie wyprzedziła
+        rejestracji; STOP / B – pod blokadą zapisu, po porzuceniu kolejki.
+        """
+        x = self.x
+        fut = Future()
+        try:
+            if getattr(x, "priority", ()) and command_kind(frame) in x.priority:
+                x.write_priority(frame, lambda: self.dispatcher.expect(frame, fut, sent))
+            else:
+                self.dispatcher.expect(frame, fut, sent)
+                x.write_line(frame)
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+            raise
+        return fut
+
+    def _run(self) -> None:
+        x, stop = self.x, self._stop
+        while not stop.is_set():
+            try:
+                line = x.read_line(timeout=0.2)
+            except Exception as e:
+                self.printer.print(f"(błąd odczytu: {e})")
+                return
+            self._now = now = time.monotonic()
+            if line is not None:
+                self.dispatcher.feed(line)
+            self.dispatcher.expire(self.reply_timeout, now)
+
+    def _on_dropped(self, frame: str) -> None:
+        """Ramka porzucona z kolejki wysyłania przez STOP / B."""
+        self._dropped.add(frame)
+        self.dispatcher.discard(frame)
+
+    def _on_tel(self, msg: Message) -> None:
+        now = self._now
+        self._last_tel = now
+        if self.on_tel is not None:
+            self.on_tel(msg.line)
+        if now < self._tel_next:
+            self._tel_hidden += 1
+            return
+        self._tel_next = now + self.tel_interval
+        hidden, self._tel_hidden = self._tel_hidden, 0
+        self.printer.print(f"<- {msg.line}" + (f"  (+{hidden})" if hidden else ""))
+
+    def _on_reply(self, frame: str, sent: float, fut: Future) -> None:
+        """Wypisuje odpowiedź (albo jej brak) razem z komendą i czasem."""
+        cmd = frame.partition("|")[0]
+        if fut.cancelled():
+            if frame in self._dropped:
+                self._dropped.discard(frame)
+                self.printer.print(f"({cmd} nie wysłane – porzucone przez STOP)")
+            else:
+                self.printer.print(f"({cmd} zastąpione nowszą wartością)")
+            return
+        if fut.exception() is not None:
+            self.expired += 1
+            self.printer.print(f"(brak odpowiedzi na {cmd})")
+            return
+        self.replies += 1
+        self.printer.print(f"<- {fut.result()}  [{cmd}, {(time.monotonic() - sent) * 1e3:.0f} ms]")
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Rozdzielanie odebranych linii według typu (demultiplekser odpowiedzi).
+
+Odpowiedź na komendę może być przeplatana telemetrią (TEL;...),
+komunikatem READY albo spóźnionym MAE=..., więc "następna linia"
+nie musi być odpowiedzią. Tutaj:
+
+- classify() rozpoznaje typ linii jednym przejściem: pierwszy znak
+  wybiera z gotowej tablicy (słownik) jeden lub dwa prefiksy do
+  sprawdzenia przez startswith(); bez wyrażeń regularnych i bez
+  wielokrotnego przeszukiwania linii,
+- Message to typ linii + argument (powód NACK, wartość MAE),
+- Dispatcher przekazuje linie TEL / MAE / READY subskrybentom,
+  a odpowiedzi (ACK, NACK, PONG, echo) – Future komendy, która czeka
+  najdłużej (firmware odpowiada na każdą ramkę jedną linią, po kolei),
+- read_reply() / read_until() – odczyt z transportu pierwszej linii
+  danego typu z pominięciem (i przekazaniem dalej) pozostałych;
+  read_reply_async() / read_until_async() – to samo dla AsyncSerialTransport.
+
+Przykład:
+    d = Dispatcher()
+    d.subscribe(TEL, lambda m: print("tel", m.line))
+    fut = d.expect("PING|2E")
+    x.write_line("PING|2E")
+    for line in x.iter_lines(timeout=1.0):
+        d.feed(line)
+        if fut.done():
+            break
+    print(fut.result())   # 'PONG'
+"""
+
+from __future__ import annotations
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from protocol import MAE_PREFIX, READY_LINE, TEL_PREFIX, parse_mae
+
+DEBUG = False
+
+# typy linii
+ACK = "ACK"
+NACK = "NACK"
+PONG = "PONG"
+ECHO = "ECHO"
+TEL = "TEL"
+MAE = "MAE"
+READY = "READY"
+
+KINDS = (ACK, NACK, PONG, ECHO, TEL, MAE, READY)
+# odpowiedzi na ramki (dokładnie jedna na ramkę, w kolejności odbioru)
+REPLY_KINDS = frozenset((ACK, NACK, PONG, ECHO))
+# linie wysyłane przez firmware z własnej inicjatywy
+UNSOLICITED_KINDS = frozenset((TEL, MAE, READY))
+
+_NACK_PREFIX = "NACK("
+
+# pierwszy znak -> (prefiks, typ, czy cała linia musi być równa prefiksowi);
+# wszystko, co nie pasuje, to echo (ECHO(txt) odpowiada samym txt)
+_PREFIX_TABLE: Dict[str, Tuple[Tuple[str, str, bool], ...]] = {}
+for _prefix, _kind, _exact in (
+    ("ACK", ACK, True),
+    (_NACK_PREFIX, NACK, False),
+    ("PONG", PONG, True),
+    (TEL_PREFIX, TEL, False),
+    (MAE_PREFIX, MAE, False),
+    (READY_LINE, READY, False),
+):
+    _PREFIX_TABLE[_prefix[0]] = _PREFIX_TABLE.get(_prefix[0], ()) + ((_prefix, _kind, _exact),)
+
+
+class Message:
+    """
+    Sklasyfikowana linia.
+
+    Atrybuty:
+        kind : typ (ACK, NACK, PONG, ECHO, TEL, MAE, READY),
+        line : oryginalna linia,
+        arg  : powód dla NACK ('CRC_FAIL'), wartość dla MAE (float), inaczej None.
+    """
+
+    __slots__ = ("kind", "line", "arg")
+
+    def __init__(self, kind: str, line: str, arg=None) -> None:
+        self.kind = kind
+        self.line = line
+        self.arg = arg
+
+    @property
+    def is_reply(self) -> bool:
+        return self.kind in REPLY_KINDS
+
+    def __repr__(self) -> str:
+        return f"Message({self.kind}, {self.line!r})"
+
+
+def classify(line: str) -> Message:
+    """Rozpoznaje typ linii (patrz _PREFIX_TABLE); pusta linia to echo."""
+    for prefix, kind, exact in _PREFIX_TABLE.get(line[:1], ()):
+        if line == prefix if exact else line.startswith(prefix):
+            if kind == NACK:
+                return Message(NACK, line, line[len(_NACK_PREFIX):].rstrip(")"))
+            if kind == MAE:
+                return Message(MAE, line, parse_mae(line))
+            return Message(kind, line)
+    return Message(ECHO, line)
+
+
+Kinds = Union[None, str, Iterable[str]]
+
+
+class Dispatcher:
+    """
+    Rozsyłanie sklasyfikowanych linii.
+
+    - subscribe(kinds, callback): callback(Message) dla linii danego typu
+      (kinds=None – dla wszystkich linii),
+    - expect(frame): Future odpowiedzi na ramkę – wywoływane przed zapisem
+      ramki do portu; wynik to linia odpowiedzi (str),
+    - feed(line): klasyfikacja i rozesłanie jednej linii.
+
+    Future zakończone wcześniej z zewnątrz (np. TimeoutError nadany przez
+    CommandPipeline) są pomijane przy przypisywaniu odpowiedzi.
+
+    Atrybuty:
+        on_unmatched : wywoływane dla odpowiedzi, na którą nic nie czekało,
+        counts       : liczba linii każdego typu,
+        unmatched    : liczba odpowiedzi bez oczekującej komendy.
+    """
+
+    def __init__(self, on_unmatched: Optional[Callable[[Message], None]] = None) -> None:
+        self.on_unmatched = on_unmatched
+        self.counts: Dict[str, int] = dict.fromkeys(KINDS, 0)
+        self.unmatched = 0
+        self._subs: Dict[str, List[Callable[[Message], None]]] = {}
+        self._all: List[Callable[[Message], None]] = []
+        self._pending: deque = deque()
+
+    def subscribe(self, kinds: Kinds, callback: Callable[[Message], None]) -> None:
+        if kinds is None:
+            self._all.append(callback)
+            return
+        for kind in ((kinds,) if isinstance(kinds, str) else kinds):
+            self._subs.setdefault(kind, []).append(callback)
+
+    def unsubscribe(self, callback: Callable[[Message], None]) -> None:
+        if callback in self._all:
+            self._all.remove(callback)
+        for subs in self._subs.values():
+            if callback in subs:
+                subs.remove(callback)
+
+    def expect(self, frame: str, future: Optional[Future] = None,
+               now: Optional[float] = None) -> Future:
+        """Rejestruje ramkę czekającą na odpowiedź (przed jej wysłaniem)."""
+        fut = future if future is not None else Future()
+        self._pending.append((frame, fut, time.monotonic() if now is None else now))
+        return fut
+
+    @property
+    def pending(self) -> int:
+        """Liczba ramek czekających na odpowiedź."""
+        self._prune()
+        return len(self._pending)
+
+    def oldest(self) -> Optional[Tuple[str, float]]:
+        """(ramka, czas wysłania) najdłużej czekającej ramki albo None."""
+        self._prune()
+        try:
+            frame, _, sent = self._pending[0]
+        except IndexError:
+            return None
+        return frame, sent
+
+    def feed(self, line: str) -> Message:
+        """Klasyfikuje linię, rozwiązuje Future odpowiedzi i powiadamia subskrybentów."""
+        msg = classify(line)
+        kind = msg.kind
+        self.counts[kind] += 1
+        if kind in REPLY_KINDS:
+            self._resolve(msg)
+        for cb in self._subs.get(kind, ()):
+            cb(msg)
+        for cb in self._all:
+            cb(msg)
+        return msg
+
+    def expire(self, max_age: float, now: Optional[float] = None) -> List[str]:
+        """
+        Kończy TimeoutError ramki czekające dłużej niż max_age;
+        zwraca listę tych ramek.
+        """
+        if now is None:
+            now = time.monotonic()
+        expired = []
+        pending = self._pending
+        while pending:
+            frame, fut, sent = pending[0]
+            if not fut.done() and now - sent < max_age:
+                break
+            pending.popleft()
+            if not fut.done():
+                fut.set_exception(TimeoutError(f"no reply to {frame}"))
+                expired.append(frame)
+        return expired
+
+    def discard(self, frame: str) -> bool:
+        """
+        Anuluje Future najstarszej oczekującej ramki frame – np. ramki
+        zastąpionej w kolejce wysyłania (transport.OutboundQueue) albo
+        porzuconej z niej przez STOP, która nie zostanie wysłana, więc
+        nie dostanie odpowiedzi.
+        """
+        # kopia: kolejka może być równocześnie skracana przez feed()
+        for pending_frame, fut, _ in list(self._pending):
+            if pending_frame == frame and not fut.done():
+                return fut.cancel()
+        return False
+
+    def cancel_pending(self) -> None:
+        """Kończy wszystkie oczekujące Future wyjątkiem TimeoutError."""
+        while self._pending:
+            frame, fut, _ = self._pending.popleft()
+            if not fut.done():
+                fut.set_exception(TimeoutError(f"no reply to {frame}"))
+
+    def _prune(self) -> None:
+        """Usuwa z początku kolejki Future zakończone z zewnątrz."""
+        pending = self._pending
+        while pending and pending[0][1].done():
+            pending.popleft()
+
+    def _resolve(self, msg: Message) -> None:
+        pending = self._pending
+        while pending:
+            try:
+                frame, fut, _ = pending.popleft()
+            except IndexError:
+                break
+            if not fut.done():
+                fut.set_result(msg.line)
+                return
+        self.unmatched += 1
+        if DEBUG:
+            print(f"[DISPATCH] unexpected reply: {msg.line}")
+        if self.on_unmatched is not None:
+            self.on_unmatched(msg)
+
+
+def read_reply(x, timeout: float,
+               on_other: Optional[Callable[[Message], None]] = None) -> Optional[Message]:
+    """
+    Czyta linie z transportu do pierwszej odpowiedzi (ACK, NACK, PONG, echo).
+
+    Linie TEL / MAE / READY odebrane po drodze trafiają do on_other.
+    Zwraca None, jeśli odpowiedź nie przyszła w czasie timeout.
+    """
+    return read_until(x, REPLY_KINDS, timeout, on_other)
+
+
+def read_until(x, kinds: Iterable[str], timeout: float,
+               on_other: Optional[Callable[[Message], None]] = None) -> Optional[Message]:
+    """
+    Czyta linie z transportu do pierwszej linii jednego z typów kinds
+    (np. {MAE} po START). Pozostałe linie trafiają do on_other.
+    """
+    end = time.monotonic() + timeout
+    while True:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            return None
+        line = x.read_line(timeout=remaining)
+        if line is None:
+            continue
+        msg = classify(line)
+        if msg.kind in kinds:
+            return msg
+        if on_other is not None:
+            on_other(msg)
+
+
+async def read_reply_async(x, timeout: float,
+                           on_other: Optional[Callable[[Message], None]] = None) -> Optional[Message]:
+    """read_reply() dla AsyncSerialTransport."""
+    return await read_until_async(x, REPLY_KINDS, timeout, on_other)
+
+
+async def read_until_async(x, kinds: Iterable[str], timeout: float,
+                           on_other: Optional[Callable[[Message], None]] = None) -> Optional[Message]:
+    """read_until() dla AsyncSerialTransport."""
+    end = time.monotonic() + timeout
+    while True:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            return None
+        line = await x.read_line(timeout=remaining)
+        if line is None:
+            continue
+        msg = classify(line)
+        if msg.kind in kinds:
+            return msg
+        if on_other is not None:
+            on_other(msg)
@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Emulator firmware'u pro2-iss.ino działający na pseudo-terminalu (pty).
+
+Pozwala testować i mierzyć cli.py / transport.py bez Arduino:
+SerialTransport otwiera ścieżkę pty (np. /dev/pts/5) jak zwykły port.
+
+Klasa FirmwareEmulator:
+- wierne odwzorowanie logiki szkicu: handleLine(), crc8(), hexVal(),
+  findSep(), komendy PING/ECHO/TARGET/PID/ZERO/TEST/START/STOP/S/I/B/M/R/V,
+  tryby IDLE/TEST/RUN/HOLD, PID_step(), telemetria TEL;dist=...,
+  wynik MAE=..., komunikaty NACK(...),
+- prosty model kulki na belce zamiast czujnika i serwa.
+
+Klasa PtyEmulator:
+- wątek obsługujący stronę "master" pty,
+- emulacja resetu przy otwarciu portu (jak Arduino przy DTR): stan
+  jest zerowany, a po boot_delay wypisywane jest READY,
+- opcjonalne ograniczenie prędkości nadawania do zadanego baud.
+
+Tylko Linux/Unix (moduł pty / os.openpty).
+
+Użycie:
+    python emulator.py [--rate 10] [--baud 9600] [--noise 0.05]
+"""
+
+from __future__ import annotations
+import argparse
+import errno
+import math
+import os
+import random
+import re
+import select
+import threading
+import time
+import tty
+from typing import List, Optional
+
+DEBUG = False
+
+MODE_IDLE = 0
+MODE_TEST = 1
+MODE_RUN = 2
+MODE_HOLD = 3
+
+_NUM_RE = re.compile(r"\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?")
+_INT_RE = re.compile(r"\s*[-+]?\d+")
+
+
+def hex_val(c: str) -> int:
+    """Odpowiednik hexVal(): cyfra szesnastkowa -> 0..15, inaczej 0xFF."""
+    if "0" <= c <= "9":
+        return ord(c) - ord("0")
+    if "A" <= c <= "F":
+        return 10 + ord(c) - ord("A")
+    if "a" <= c <= "f":
+        return 10 + ord(c) - ord("a")
+    return 0xFF
+
+
+def crc8(payload: str) -> int:
+    """Odpowiednik crc8(): suma bajtów payloadu obcięta do 1 bajtu."""
+    return sum(payload.encode("latin-1", errors="ignore")) & 0xFF
+
+
+def to_float(s: str) -> float:
+    """Odpowiednik String::toFloat(): liczba z początku tekstu albo 0."""
+    m = _NUM_RE.match(s)
+    return float(m.group(0)) if m else 0.0
+
+
+def to_int(s: str) -> int:
+    """Odpowiednik String::toInt(): liczba całkowita z początku tekstu albo 0."""
+    m = _INT_RE.match(s)
+    return int(m.group(0)) if m else 0
+
+
+def fmt2(v: float) -> str:
+    """Odpowiednik Serial.print(float, 2)."""
+    if math.isnan(v):
+        return "nan"
+    if math.isinf(v):
+        return "inf"
+    if abs(v) > 4294967040.0:
+        return "ovf"
+    return f"{v:.2f}"
+
+
+class BallModel:
+    """
+    Uproszczony model kulki na belce.
+
+    - kąt belki proporcjonalny do odchylenia serwa od poziomu (level),
+    - przyspieszenie toczącej się kuli: 5/7 * g * sin(kąt),
+    - zwiększenie kąta serwa przechyla belkę w stronę czujnika
+      (odległość maleje), ograniczniki na końcach belki zatrzymują kulkę,
+    - pomiar z szumem gaussowskim (noise, w cm).
+    """
+
+    def __init__(self, level: float = 90.0, gain: float = 0.15, x0: float = 40.0,
+                 x_min: float = 5.0, x_max: float = 50.0, noise: float = 0.0,
+                 seed: Optional[int] = None) -> None:
+        self.level = level
+        self.gain = gain
+        self.x_min = x_min
+        self.x_max = x_max
+        self.noise = noise
+        self.x = x0
+        self.v = 0.0
+        self._rng = random.Random(seed)
+
+    def step(self, servo_cmd: int, dt: float, substeps: int = 10) -> None:
+        """Całkuje ruch kulki przez dt sekund przy stałym położeniu serwa."""
+        theta = math.radians((servo_cmd - self.level) * self.gain)
+        a = -(5.0 / 7.0) * 981.0 * math.sin(theta)
+        h = dt / substeps
+        for _ in range(substeps):
+            self.v += a * h
+            self.x += self.v * h
+            if self.x < self.x_min:
+                self.x, self.v = self.x_min, 0.0
+            elif self.x > self.x_max:
+                self.x, self.v = self.x_max, 0.0
+
+    def measure(self) -> float:
+        """Odpowiednik get_dist(): odległość kulki od czujnika (cm)."""
+        if self.noise:
+            return self.x + self._rng.gauss(0.0, self.noise)
+        return self.x
+
+
+class FirmwareEmulator:
+    """
+    Stan i logika szkicu pro2-iss.ino.
+
+    Komunikacja odbywa się przez feed() (bajty z hosta) i tick()
+    (kolejny krok pętli loop() co `period` sekund); odpowiedzi
+    zbierane są w buforze pobieranym przez take_output().
+
+    Parametry:
+        period : okres kroku regulatora / telemetrii (firmware: t = 100 ms);
+                 PID_step() – jak w firmware – zawsze liczy z dt = 0.1,
+        model  : model obiektu (domyślnie BallModel()).
+    """
+
+    def __init__(self, period: float = 0.1, model: Optional[BallModel] = None) -> None:
+        self.period = period
+        self.model = model or BallModel()
+        self.reset()
+
+    def reset(self) -> None:
+        """Stan jak po włączeniu zasilania (inicjalizacja zmiennych globalnych)."""
+        self.rx = bytearray()
+        self._out: List[str] = []
+        self.distance = 0.0
+        self.kp = 3.0
+        self.ki = 2.0
+        self.kd = 1.5
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.previous_error = 0.0
+        self.distance_point = 26.5
+        self.servo_zero = 90
+        self.servo_cmd = 90
+        self.last_output = 0.0
+        self.last_error = 0.0
+        self.mode = MODE_IDLE
+        self.run_start = 0.0
+        self.hold_start = 0.0
+        self.mae_sum = 0.0
+        self.mae_count = 0
+
+    # --- wyjście ---------------------------------------------------------
+
+    def println(self, text: str) -> None:
+        """Serial.println(): tekst zakończony CRLF."""
+        self._out.append(text + "\r\n")
+
+    def take_output(self) -> bytes:
+        """Zwraca i czyści wszystko, co firmware "wypisał" od ostatniego wywołania."""
+        if not self._out:
+            return b""
+        data = "".join(self._out).encode("ascii", errors="ignore")
+        self._out.clear()
+        return data
+
+    # --- setup() / loop() -------------------------------------------------
+
+    def setup(self) -> None:
+        """Odpowiednik setup(): serwo na 95, tryb IDLE, komunikat READY."""
+        self.write_servo(95)
+        self.mode = MODE_IDLE
+        self.println("READY")
+
+    def feed(self, data: bytes) -> None:
+        """Bajty odebrane z portu: składanie linii jak w loop()."""
+        for c in data:
+            self.rx.append(c)
+            if c == 0x0A:
+                self.handle_line(self.rx.decode("latin-1"))
+                self.rx.clear()
+        if len(self.rx) > 512:
+            self.rx.clear()
+            self.println("NACK(OVERFLOW)")
+
+    def tick(self, now: float) -> None:
+        """
+        Jeden krok czasowy (co `period`): pomiar, ruch obiektu, krok trybu.
+
+        now: czas w sekundach (zegar monotoniczny), odpowiednik millis()/1000.
+        """
+        self.model.step(self.servo_cmd, self.period)
+        self.distance = self.model.measure()
+        if self.mode == MODE_TEST:
+            self.run_test_mode()
+        elif self.mode == MODE_RUN:
+            self.run_run_mode(now)
+        elif self.mode == MODE_HOLD:
+            self.run_hold_mode(now)
+
+    def write_servo(self, cmd: int) -> None:
+        """myservo.write(): Servo obcina kąt do 0..180."""
+        self.servo_cmd = min(max(int(cmd), 0), 180)
+
+    # --- regulator i tryby -----------------------------------------------
+
+    def pid_step(self) -> None:
+        proportional = self.distance - self.distance_point
+        self.integral = self.integral + proportional * 0.1
+        self.derivative = (proportional - self.previous_error) / 0.1
+        output = self.kp * proportional + self.ki * self.integral + self.kd * self.derivative
+        self.previous_error = proportional
+        self.last_output = output
+        self.last_error = proportional
+        # (int)output w C obcina w stronę zera
+        cmd = self.servo_zero + int(max(min(output, 1e9), -1e9))
+        if cmd < 0:
+            cmd = 0
+        if cmd > 180:
+            cmd = 180
+        self.write_servo(cmd)
+
+    def run_test_mode(self) -> None:
+        self.pid_step()
+        self._out.append(
+            f"TEL;dist={fmt2(self.distance)};sp={fmt2(self.distance_point)}"
+            f";err={fmt2(self.last_error)};out={fmt2(self.last_output)}\r\n"
+        )
+
+    def run_run_mode(self, now: float) -> None:
+        elapsed = now - self.run_start
+        self.pid_step()
+        if elapsed >= 10.0:
+            self.mae_sum = 0.0
+            self.mae_count = 0
+            self.hold_start = now
+            self.mode = MODE_HOLD
+        if elapsed >= 15.0:
+            self._finish_mae()
+
+    def run_hold_mode(self, now: float) -> None:
+        self.mae_sum += abs(self.distance - self.distance_point)
+        self.mae_count += 1
+        if now - self.hold_start >= 3.0:
+            self._finish_mae()
+
+    def _finish_mae(self) -> None:
+        mae = self.mae_sum / self.mae_count if self.mae_count > 0 else 0.0
+        self._out.append(f"MAE={fmt2(mae)}\r\n")
+        self.write_servo(self.servo_zero)
+        self.mode = MODE_IDLE
+
+    # --- komendy -----------------------------------------------------------
+
+    def handle_line(self, line: str) -> None:
+        """Odpowiednik handleLine(): weryfikacja CRC i wybór komendy."""
+        s = line
+        if s.endswith("\n"):
+            s = s[:-1]
+        if s.endswith("\r"):
+            s = s[:-1]
+        if not s:
+            self.println("NACK(EMPTY)")
+            return
+        k = s.rfind("|")
+        if k < 0:
+            self.println("NACK(CRC_MISSING)")
+            return
+        payload = s[:k]
+        crc_txt = s[k + 1:]
+        if len(crc_txt) < 2:
+            self.println("NACK(CRC_MISSING)")
+            return
+        hi, lo = hex_val(crc_txt[0]), hex_val(crc_txt[1])
+        if hi == 0xFF or lo == 0xFF:
+            self.println("NACK(CRC_BADHEX)")
+            return
+        if ((hi << 4) | lo) != crc8(payload):
+            self.println("NACK(CRC_FAIL)")
+            return
+
+        if DEBUG:
+            print(f"[EMU] {payload}")
+
+        up = payload.upper()
+        if up.startswith("TARGET(") and up.endswith(")"):
+            self.distance_point = to_float(payload[7:-1])
+            self.integral = 0.0
+            self.previous_error = 0.0
+            self.println("ACK")
+            return
+        if up.startswith("PID(") and up.endswith(")"):
+            self._handle_pid(payload)
+            return
+        if up.startswith("ZERO(") and up.endswith(")"):
+            self.servo_zero = to_int(payload[5:-1])
+            self.write_servo(self.servo_zero)
+            self.println("ACK")
+            return
+        if up == "TEST":
+            self.mode = MODE_TEST
+            self.integral = 0.0
+            self.previous_error = 0.0
+            self.println("ACK")
+            return
+        if up == "START":
+            self.write_servo(self.servo_zero + 5)
+            self.integral = 0.0
+            self.previous_error = 0.0
+            self.run_start = time.monotonic()
+            self.mode = MODE_RUN
+            self.println("ACK")
+            return
+        if up == "STOP":
+            self.mode = MODE_IDLE
+            self.write_servo(self.servo_zero)
+            self.println("ACK")
+            return
+        self._handle_known_simple(up, payload)
+
+    def _handle_pid(self, payload: str) -> None:
+        inside = payload[4:-1]
+        c1 = inside.find(",")
+        c2 = inside.find(",", c1 + 1)
+        if c1 == -1 or c2 == -1:
+            self.println("NACK(BAD_PID_ARGS)")
+            return
+        self.kp = to_float(inside[:c1])
+        self.ki = to_float(inside[c1 + 1:c2])
+        self.kd = to_float(inside[c2 + 1:])
+        self.integral = 0.0
+        self.previous_error = 0.0
+        self.println("ACK")
+
+    def _handle_known_simple(self, up: str, payload: str) -> None:
+        if up == "PING":
+            self.println("PONG")
+            return
+        if up.startswith("ECHO(") and up.endswith(")"):
+            lp = payload.find("(")
+            rp = payload.rfind(")")
+            if lp >= 0 and rp > lp:
+                self.println(payload[lp + 1:rp])
+                return
+        if up in ("S", "I", "B", "STOP") or _is_valid_mrv(up):
+            if up in ("B", "STOP"):
+                self.mode = MODE_IDLE
+                self.write_servo(self.servo_zero)
+            self.println("ACK")
+            return
+        self.println("NACK(UNKNOWN_CMD)")
+
+
+def _is_valid_mrv(u: str) -> bool:
+    """Odpowiednik isValidMRV()."""
+    if len(u) < 4:
+        return False
+    if u[0] not in "MRV":
+        return False
+    if u.find("(") != 1:
+        return False
+    return u[-1] == ")"
+
+
+class PtyEmulator:
+    """
+    Udostępnia FirmwareEmulator jako pseudo-terminal.
+
+    Atrybuty:
+        path       : ścieżka do otwarcia przez SerialTransport,
+        emulator   : emulowany firmware,
+        baud       : jeśli podane, nadawanie jest spowalniane do baud/10 B/s,
+        boot_delay : czas od otwarcia portu przez hosta do wypisania READY
+                     (emulacja resetu Arduino przy otwarciu portu).
+    """
+
+    def __init__(self, emulator: Optional[FirmwareEmulator] = None,
+                 baud: Optional[int] = None, boot_delay: float = 0.2) -> None:
+        self.emulator = emulator or FirmwareEmulator()
+        self.baud = baud
+        self.boot_delay = boot_delay
+        self.bytes_rx = 0
+        self.bytes_tx = 0
+        self._master, slave = os.openpty()
+        tty.setraw(slave)
+        self.path = os.ttyname(slave)
+        # zamykamy własną stronę slave – dzięki temu widać (EIO na master),
+        # kiedy host nie ma otwartego portu
+        os.close(slave)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pty-emulator", daemon=True)
+
+    def start(self) -> "PtyEmulator":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        try:
+            os.close(self._master)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "PtyEmulator":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        emu = self.emulator
+        master = self._master
+        connected = False
+        boot_at: Optional[float] = None
+        next_tick = time.monotonic() + emu.period
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+            wait = max(0.0, next_tick - now)
+            if not connected or boot_at is not None:
+                wait = min(wait, 0.01)
+            try:
+                r, _, _ = select.select([master], [], [], wait)
+            except (OSError, ValueError):
+                return
+
+            if r:
+                try:
+                    data = os.read(master, 4096)
+                except OSError as e:
+                    if e.errno != errno.EIO:
+                        return
+                    # host nie ma otwartego portu
+                    connected = False
+                    time.sleep(0.01)
+                    continue
+                if not connected:
+                    connected, boot_at = True, time.monotonic() + self.boot_delay
+                    emu.reset()
+                if boot_at is None:
+                    self.bytes_rx += len(data)
+                    emu.feed(data)
+            elif not connected:
+                # select bez EIO => ktoś otworzył port: "reset" Arduino
+                connected, boot_at = True, time.monotonic() + self.boot_delay
+                emu.reset()
+
+            now = time.monotonic()
+            if boot_at is not None:
+                if now < boot_at:
+                    next_tick = now + emu.period
+                    continue
+                boot_at = None
+                emu.setup()
+            if now >= next_tick:
+                emu.tick(now)
+                next_tick += emu.period
+                if next_tick < now:
+                    next_tick = now + emu.period
+
+            out = emu.take_output()
+            if out and connected:
+                self._send(out)
+
+    def _send(self, data: bytes) -> None:
+        """Zapis do hosta, opcjonalnie w tempie odpowiadającym baud."""
+        try:
+            os.write(self._master, data)
+        except OSError:
+            return
+        self.bytes_tx += len(data)
+        if self.baud:
+            # 8N1: 10 bitów na bajt; Arduino też czeka, gdy bufor TX jest pełny
+            time.sleep(len(data) * 10.0 / self.baud)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="emulator firmware'u pro2-iss.ino na pty")
+    ap.add_argument("--rate", type=float, default=10.0,
+                    help="częstotliwość kroku regulatora/telemetrii w Hz (domyślnie 10)")
+    ap.add_argument("--baud", type=int, default=None,
+                    help="ogranicz nadawanie do tej prędkości (domyślnie bez limitu)")
+    ap.add_argument("--noise", type=float, default=0.05, help="szum pomiaru w cm")
+    ap.add_argument("--boot-delay", type=float, default=0.2,
+                    help="opóźnienie READY po otwarciu portu (s)")
+    args = ap.parse_args()
+
+    emu = FirmwareEmulator(period=1.0 / args.rate, model=BallModel(noise=args.noise))
+    dev = PtyEmulator(emu, baud=args.baud, boot_delay=args.boot_delay)
+    dev.start()
+    print(f"Emulator gotowy: {dev.path}  (np. python cli.py {dev.path})")
+    print("Ctrl+C aby zakończyć")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dev.stop()
+
+
+if __name__ == "__main__":
+    main()
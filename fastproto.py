@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Wektorowe (NumPy) odpowiedniki funkcji z protocol.py do przetwarzania
+dużych ilości danych naraz – np. odtwarzania długich logów.
+
+Zamiast pętli w Pythonie po liniach (split(';'), split('=')) wszystkie
+operacje wykonywane są na całym buforze bajtów:
+- podział na linie: pozycje '\n' znalezione jednym porównaniem,
+- struktura linii: pozycje ';' i '=' oraz ich liczba w każdej linii
+  (searchsorted na posortowanych pozycjach),
+- wartości: wszystkie liczby wycięte naraz do macierzy znaków
+  i przeliczone kolumna po kolumnie (schemat Hornera).
+
+parse_telemetry_batch() akceptuje liczby w postaci wypisywanej przez
+firmware (Serial.print(float, 2)): opcjonalny znak, cyfry, kropka,
+a także 'nan' / 'inf'. Linie inne niż TEL, ucięte lub uszkodzone
+są oznaczane w masce valid.
+
+crc_batch() i validate_frames() liczą sumy kontrolne ramek 'PAYLOAD|XX'
+dokładnie tak jak crc8() / handleLine() w firmware – suma surowych
+bajtów payloadu modulo 256 (np.add.reduceat na uint8 "zawija się"
+sama), separator to ostatni znak '|', liczą się 2 pierwsze znaki po nim.
+
+Wymaga biblioteki numpy.
+"""
+
+from __future__ import annotations
+from typing import Tuple
+
+from protocol import TEL_FIELDS
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except Exception:
+    np = None
+
+DEBUG = False
+
+# maksymalna długość zapisu jednej liczby w linii TEL
+VALUE_WIDTH = 16
+
+if np is not None:
+    TEL_DTYPE = np.dtype([(name, "<f4") for name in TEL_FIELDS])
+else:
+    TEL_DTYPE = None
+
+
+def as_buffer(data) -> bytes:
+    """
+    Lista ramek (bytes / str) albo gotowy bufor -> jeden bufor z liniami
+    rozdzielonymi '\n'.
+    """
+    if isinstance(data, (list, tuple)):
+        return b"\n".join(
+            item.encode("latin-1") if isinstance(item, str) else bytes(item) for item in data
+        ) + (b"\n" if data else b"")
+    return data
+
+
+def split_lines(data) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    Dzieli bufor bajtów na linie (terminator '\n', końcowe '\r' usuwane).
+
+    Zwraca (a, starts, ends): tablicę bajtów (uint8, bez kopiowania)
+    oraz początki i końce [start, end) kolejnych linii. Niepełna linia
+    na końcu bufora (bez '\n') też jest zwracana.
+    """
+    a = np.frombuffer(data, dtype=np.uint8)
+    nl = np.flatnonzero(a == 0x0A)
+    starts = np.concatenate(([0], nl + 1))
+    ends = np.concatenate((nl, [len(a)]))
+    if starts[-1] == len(a):
+        # bufor kończy się na '\n' – nie ma linii po nim
+        starts, ends = starts[:-1], ends[:-1]
+
+    has_cr = ends > starts
+    has_cr[has_cr] = a[ends[has_cr] - 1] == 0x0D
+    ends = ends - has_cr
+    return a, starts, ends
+
+
+def pad(a: "np.ndarray") -> "np.ndarray":
+    """
+    Dokleja VALUE_WIDTH zerowych bajtów na koniec bufora, żeby okna
+    o stałej szerokości (sliding_window_view) istniały dla każdej pozycji.
+    """
+    return np.concatenate((a, np.zeros(VALUE_WIDTH, dtype=np.uint8)))
+
+
+def read_word(padded: "np.ndarray", pos: "np.ndarray", length: "np.ndarray") -> "np.ndarray":
+    """
+    Odczytuje do 4 bajtów padded[pos:pos+length] jako liczbę uint32
+    (little-endian), bajty poza length są zerowane. Pozwala porównać
+    krótkie słowa ('TEL;', nazwy pól, 'nan') jednym porównaniem liczb.
+    """
+    # widok uint32 zaczynający się pod każdym bajtem (krok 1 bajt)
+    words = np.ndarray(shape=(len(padded) - 3,), dtype="<u4", buffer=padded, strides=(1,))
+    return words[pos] & _WORD_MASK[length]
+
+
+# maski bajtów słowa dla długości 0..4
+_WORD_MASK = None if np is None else np.array([0, 0xFF, 0xFFFF, 0xFFFFFF, 0xFFFFFFFF], dtype=np.uint32)
+
+
+def word_code(text: bytes) -> int:
+    """Kod uint32 słowa (do 4 bajtów) zgodny z read_word()."""
+    return int.from_bytes(text[:4].ljust(4, b"\0"), "little")
+
+
+# potęgi dziesięciu 10^0..10^VALUE_WIDTH (dzielnik części ułamkowej)
+_POW10 = None if np is None else 10.0 ** np.arange(VALUE_WIDTH + 1)
+
+
+def parse_numbers(padded: "np.ndarray", starts: "np.ndarray", lengths: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Zamienia fragmenty padded[start:start+length] na liczby (float64),
+    bez pętli po liczbach i bez konwersji przez napisy.
+
+    Wszystkie liczby są wycinane naraz do macierzy (kolumna = pozycja
+    znaku w liczbie), a potem pętla po kolumnach (najwyżej VALUE_WIDTH
+    przebiegów) liczy schematem Hornera mantysę z cyfr, pozycję kropki
+    i poprawność znaków. Wynik = mantysa / 10^(cyfr po kropce).
+
+    Akceptowany format: [-+]?cyfry[.cyfry] oraz nan / inf / -inf.
+    Zwraca (values, ok) – ok = False dla niepoprawnych zapisów.
+    """
+    m = len(starts)
+    ok = (lengths >= 1) & (lengths <= VALUE_WIDTH)
+    lens = np.where(ok, lengths, 0)
+    width = int(lens.max()) if m else 0
+
+    # macierz (width, m): wiersz j = j-ty znak każdej liczby
+    cols = np.ascontiguousarray(sliding_window_view(padded, VALUE_WIDTH)[starts, :width].T)
+
+    mant = np.zeros(m)
+    n_dots = np.zeros(m, dtype=np.int8)
+    dot_at = np.zeros(m, dtype=np.int64)
+    any_digit = np.zeros(m, dtype=bool)
+    bad = np.zeros(m, dtype=bool)
+    neg = np.zeros(m, dtype=bool)
+    for j in range(width):
+        c = cols[j]
+        used = lens > j
+        d = c - np.uint8(0x30)
+        is_digit = (d < 10) & used
+        is_dot = (c == 0x2E) & used
+        allowed = is_digit | is_dot
+        if j == 0:
+            neg = (c == 0x2D) & used
+            allowed |= neg | ((c == 0x2B) & used)
+        bad |= used & ~allowed
+        any_digit |= is_digit
+        n_dots += is_dot
+        dot_at[is_dot] = j
+        mant = np.where(is_digit, mant * 10.0 + d, mant)
+
+    frac = np.where(n_dots > 0, lens - dot_at - 1, 0)
+    values = mant / _POW10[frac]
+    values[neg] = -values[neg]
+    ok &= ~bad & (n_dots <= 1) & any_digit
+
+    # wartości specjalne wypisywane przez Serial.print(float)
+    word = read_word(padded, starts, np.clip(lengths, 0, 4))
+    for text, special in ((b"nan", np.nan), (b"inf", np.inf), (b"-inf", -np.inf)):
+        hit = (lengths == len(text)) & (word == word_code(text))
+        values[hit] = special
+        ok |= hit
+
+    return values, ok
+
+
+def parse_telemetry_batch(data) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Rozbiera wiele linii 'TEL;dist=..;sp=..;err=..;out=..' naraz.
+
+    Parametry:
+        data: bytes / bytearray / memoryview z liniami rozdzielonymi '\n'.
+
+    Zwraca (records, valid):
+        records : tablica strukturalna TEL_DTYPE (pola dist, sp, err, out,
+                  float32), po jednym wierszu na linię wejścia,
+        valid   : maska bool – False dla linii, które nie są kompletną,
+                  poprawną linią TEL (ich wartości w records to nan).
+    """
+    if np is None:
+        raise RuntimeError("numpy not available")
+
+    a, starts, ends = split_lines(data)
+    n = len(starts)
+    records = np.full(n, np.nan, dtype=TEL_DTYPE)
+    if n == 0:
+        return records, np.zeros(0, dtype=bool)
+    padded = pad(a)
+
+    n_fields = len(TEL_FIELDS)
+    semi = np.flatnonzero(a == 0x3B)
+    eq = np.flatnonzero(a == 0x3D)
+
+    # liczba ';' i '=' w każdej linii oraz indeks pierwszego z nich
+    semi_first = np.searchsorted(semi, starts)
+    eq_first = np.searchsorted(eq, starts)
+    valid = (
+        (np.searchsorted(semi, ends) - semi_first == n_fields)
+        & (np.searchsorted(eq, ends) - eq_first == n_fields)
+    )
+    # nagłówek 'TEL;'
+    valid &= read_word(padded, starts, np.minimum(ends - starts, 4)) == word_code(b"TEL;")
+
+    rows = np.flatnonzero(valid)
+    if not len(rows):
+        return records, valid
+    # pozycje k-tego ';' i k-tego '=' w każdej kandydującej linii
+    s_pos = semi[semi_first[rows, None] + np.arange(n_fields)]
+    e_pos = eq[eq_first[rows, None] + np.arange(n_fields)]
+
+    ok = np.ones(len(rows), dtype=bool)
+    v_start = e_pos + 1
+    v_end = np.empty_like(v_start)
+    v_end[:, :-1] = s_pos[:, 1:]
+    v_end[:, -1] = ends[rows]
+    for k, name in enumerate(TEL_FIELDS):
+        # nazwa pola: między k-tym ';' a k-tym '='
+        key_len = e_pos[:, k] - s_pos[:, k] - 1
+        key = read_word(padded, s_pos[:, k] + 1, np.clip(key_len, 0, 4))
+        ok &= (key_len == len(name)) & (key == word_code(name.encode()))
+
+    # wszystkie wartości naraz (wiersz po wierszu, pole po polu)
+    values, v_ok = parse_numbers(padded, v_start.ravel(), (v_end - v_start).ravel())
+    ok &= v_ok.reshape(-1, n_fields).all(axis=1)
+    values = values.reshape(-1, n_fields)
+
+    good = rows[ok]
+    for k, name in enumerate(TEL_FIELDS):
+        records[name][good] = values[ok, k]
+
+    valid[rows[~ok]] = False
+    if DEBUG:
+        print(f"[FASTPROTO] {n} lines, {int(valid.sum())} valid TEL")
+    return records, valid
+
+
+# hexVal() z firmware'u: kod znaku -> 0..15, inne znaki -> 0xFF
+if np is not None:
+    _HEX = np.full(256, 0xFF, dtype=np.uint8)
+    _HEX[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+    _HEX[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+    _HEX[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+else:
+    _HEX = None
+
+
+def segment_sums(a: "np.ndarray", starts: "np.ndarray", ends: "np.ndarray") -> "np.ndarray":
+    """
+    Suma bajtów a[start:end] modulo 256 dla każdego zakresu (uint8).
+
+    np.add.reduceat na przeplecionych indeksach [start0, end0, start1, ...]
+    – co druga suma to szukany zakres; puste zakresy dają 0.
+    """
+    if not len(starts):
+        return np.zeros(0, dtype=np.uint8)
+    padded = np.concatenate((a, np.zeros(1, dtype=np.uint8)))
+    idx = np.empty(2 * len(starts), dtype=np.intp)
+    idx[0::2] = starts
+    idx[1::2] = ends
+    sums = np.add.reduceat(padded, idx, dtype=np.uint8)[0::2]
+    sums[ends <= starts] = 0
+    return sums
+
+
+def crc_batch(payloads) -> "np.ndarray":
+    """
+    Sumy kontrolne wielu payloadów naraz (jak crc8() w firmware).
+
+    Parametry:
+        payloads: lista payloadów (bytes / str) albo bufor z payloadami
+                  rozdzielonymi '\n'.
+
+    Zwraca tablicę uint8 – po jednej sumie na payload.
+    """
+    if np is None:
+        raise RuntimeError("numpy not available")
+    a, starts, ends = split_lines(as_buffer(payloads))
+    return segment_sums(a, starts, ends)
+
+
+def validate_frames(data) -> Tuple["np.ndarray", list]:
+    """
+    Weryfikuje wiele ramek 'PAYLOAD|XX' naraz, tak jak handleLine() w firmware.
+
+    Parametry:
+        data: lista ramek (bytes / str) albo bufor z ramkami rozdzielonymi '\n'.
+
+    Zwraca (valid, payloads):
+        valid    : maska bool – True, jeśli ramka ma separator, poprawny
+                   zapis hex i zgodną sumę kontrolną,
+        payloads : lista payloadów (bytes, część przed ostatnim '|');
+                   None dla linii pustych albo bez separatora.
+    """
+    if np is None:
+        raise RuntimeError("numpy not available")
+
+    buf = as_buffer(data)
+    a, starts, ends = split_lines(buf)
+    n = len(starts)
+    if n == 0:
+        return np.zeros(0, dtype=bool), []
+
+    # ostatni '|' przed końcem każdej linii
+    bars = np.flatnonzero(a == 0x7C)
+    k = np.searchsorted(bars, ends) - 1
+    sep = bars[np.maximum(k, 0)] if len(bars) else np.zeros(n, dtype=np.intp)
+    has_sep = (k >= 0) & (sep >= starts)
+    sep = np.where(has_sep, sep, ends)
+
+    # co najmniej 2 znaki CRC po separatorze, oba poprawne hex
+    padded = np.concatenate((a, np.zeros(2, dtype=np.uint8)))
+    hi = _HEX[padded[sep + 1]]
+    lo = _HEX[padded[sep + 2]]
+    valid = has_sep & (ends - sep - 1 >= 2) & (hi != 0xFF) & (lo != 0xFF)
+    valid &= ((hi << 4) | lo) == segment_sums(a, starts, sep)
+
+    payloads = [
+        buf[s:e] if ok else None
+        for s, e, ok in zip(starts.tolist(), sep.tolist(), has_sep.tolist())
+    ]
+    if DEBUG:
+        print(f"[FASTPROTO] {n} frames, {int(valid.sum())} valid")
+    return valid, payloads
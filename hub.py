@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Obsługa wielu stanowisk (wielu portów szeregowych) z jednego procesu.
+
+Klasa SerialHub:
+- otwiera wiele instancji SerialTransport (równolegle, bo każde
+  otwarcie czeka na reset Arduino),
+- multipleksuje deskryptory wszystkich portów przez selectors
+  (epoll/kqueue/select – co jest dostępne) w jednej pętli,
+- składa linie osobno dla każdego portu i przekazuje je
+  do handlera danego stanowiska,
+- wysyła komendy do wybranego stanowiska albo do wszystkich naraz,
+- opcjonalnie zapisuje wszystkie odebrane linie do wspólnego logu.
+
+Identyfikatorem stanowiska (rig id) jest nazwa portu (np. 'COM3');
+w komendach można też używać numeru stanowiska (1, 2, ...).
+
+Wymaga systemu POSIX (selectors nie obsługuje portów COM na Windows).
+"""
+
+from __future__ import annotations
+import selectors
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, TextIO
+
+from transport import SerialTransport
+from protocol import to_frame
+
+DEBUG = False
+
+Handler = Callable[[str, str], None]
+
+
+def print_handler(rig_id: str, line: str) -> None:
+    """Domyślny handler: wypisuje linię z identyfikatorem stanowiska."""
+    print(f"[{rig_id}] <- {line}")
+
+
+@dataclass
+class Rig:
+    """
+    Jedno stanowisko podłączone do huba.
+
+    Atrybuty:
+        rig_id    : identyfikator (nazwa portu),
+        transport : otwarty SerialTransport,
+        handler   : funkcja wywoływana dla każdej odebranej linii,
+        lines_rx  : licznik odebranych linii.
+    """
+    rig_id: str
+    transport: SerialTransport
+    handler: Handler
+    lines_rx: int = 0
+
+
+class SerialHub:
+    """
+    Pętla zdarzeń dla wielu portów szeregowych.
+
+    Typowe użycie:
+        hub = SerialHub()
+        hub.open_ports(["COM3", "COM4"], baud=9600)
+        hub.start()                  # pętla select w osobnym wątku
+        hub.broadcast("PING")
+        hub.send("COM3", "TARGET(25.0)")
+        ...
+        hub.close()
+    """
+
+    def __init__(self, handler: Optional[Handler] = None, log: Optional[TextIO] = None) -> None:
+        """
+        Parametry:
+            handler : domyślny handler linii dla nowych stanowisk,
+            log     : opcjonalny plik tekstowy na zbiorczy log
+                      (czas, stanowisko, linia – rozdzielane tabulatorem).
+        """
+        self.handler = handler or print_handler
+        self.log = log
+        self.rigs: Dict[str, Rig] = {}
+        self._sel = selectors.DefaultSelector()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, rig_id: str, transport: SerialTransport, handler: Optional[Handler] = None) -> Rig:
+        """
+        Dołącza otwarty transport jako stanowisko rig_id.
+        """
+        if rig_id in self.rigs:
+            raise ValueError(f"rig already registered: {rig_id}")
+        rig = Rig(rig_id, transport, handler or self.handler)
+        self._sel.register(transport.fileno(), selectors.EVENT_READ, rig)
+        self.rigs[rig_id] = rig
+        return rig
+
+    def remove(self, rig_id: str) -> None:
+        """
+        Odłącza stanowisko i zamyka jego port.
+        """
+        rig = self.rigs.pop(rig_id)
+        try:
+            self._sel.unregister(rig.transport.fileno())
+        except Exception:
+            pass
+        try:
+            rig.transport.close()
+        except Exception:
+            pass
+
+    def open_ports(self, ports: List[str], baud: int = 9600, timeout: float = 1.0) -> List[str]:
+        """
+        Otwiera wszystkie porty równolegle i dołącza je jako stanowiska.
+
+        Zwraca listę identyfikatorów stanowisk, które udało się otworzyć;
+        błędy otwarcia są wypisywane, ale nie przerywają pozostałych.
+        """
+        def _open(port: str) -> SerialTransport:
+            t = SerialTransport(port, baud, timeout=timeout)
+            t.open()
+            return t
+
+        opened = []
+        with ThreadPoolExecutor(max_workers=max(1, len(ports))) as pool:
+            futures = [(port, pool.submit(_open, port)) for port in ports]
+            for port, fut in futures:
+                try:
+                    transport = fut.result()
+                except Exception as e:
+                    print(f"[{port}] nie udało się otworzyć portu: {e}")
+                    continue
+                try:
+                    self.add(port, transport)
+                except Exception as e:
+                    # port jest już otwarty – nie zostawiamy go bez właściciela
+                    transport.close()
+                    print(f"[{port}] nie udało się dołączyć stanowiska: {e}")
+                    continue
+                opened.append(port)
+        return opened
+
+    def resolve(self, target: str) -> str:
+        """
+        Zamienia identyfikator lub numer stanowiska (1..N) na rig id.
+        """
+        if target in self.rigs:
+            return target
+        if target.isdigit():
+            n = int(target)
+            ids = list(self.rigs)
+            if 1 <= n <= len(ids):
+                return ids[n - 1]
+        raise KeyError(f"unknown rig: {target}")
+
+    def send(self, target: str, cmd: str) -> str:
+        """
+        Wysyła komendę do jednego stanowiska (CRC doklejane, jeśli go brak).
+
+        Zwraca wysłaną ramkę.
+        """
+        rig = self.rigs[self.resolve(target)]
+        frame = self._frame(cmd)
+        rig.transport.write_line(frame)
+        return frame
+
+    def broadcast(self, cmd: str) -> str:
+        """
+        Wysyła tę samą komendę do wszystkich stanowisk.
+
+        Zwraca wysłaną ramkę.
+        """
+        frame = self._frame(cmd)
+        for rig in list(self.rigs.values()):
+            try:
+                rig.transport.write_line(frame)
+            except Exception as e:
+                print(f"[{rig.rig_id}] błąd zapisu: {e}")
+        return frame
+
+    def poll(self, timeout: Optional[float] = None) -> int:
+        """
+        Jedna iteracja pętli: czeka (do timeout) na dane z dowolnego portu
+        i rozsyła wszystkie pełne linie do handlerów.
+
+        Zwraca liczbę obsłużonych linii.
+        """
+        handled = 0
+        for key, _ in self._sel.select(timeout):
+            rig = key.data
+            try:
+                # deskryptor gotowy, a w buforze nic – urządzenie zniknęło
+                if not rig.transport.in_waiting:
+                    raise RuntimeError("device disconnected")
+                lines = rig.transport.poll_lines()
+            except Exception as e:
+                print(f"[{rig.rig_id}] błąd portu, odłączam: {e}")
+                self.remove(rig.rig_id)
+                continue
+
+            if not lines:
+                continue
+            rig.lines_rx += len(lines)
+            handled += len(lines)
+            if self.log is not None:
+                now = time.time()
+                self.log.writelines(f"{now:.3f}\t{rig.rig_id}\t{line}\n" for line in lines)
+            for line in lines:
+                rig.handler(rig.rig_id, line)
+        return handled
+
+    def run(self, poll_timeout: float = 0.2) -> None:
+        """
+        Pętla główna huba – działa do stop() albo odłączenia wszystkich portów.
+        """
+        while not self._stop.is_set() and self.rigs:
+            self.poll(poll_timeout)
+
+    def start(self) -> None:
+        """Uruchamia run() w osobnym wątku (wątek główny może obsługiwać input())."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="serial-hub", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Zatrzymuje pętlę uruchomioną przez start()."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def close(self) -> None:
+        """Zatrzymuje pętlę i zamyka wszystkie porty."""
+        self.stop()
+        for rig_id in list(self.rigs):
+            self.remove(rig_id)
+        self._sel.close()
+        if self.log is not None:
+            self.log.flush()
+
+    @staticmethod
+    def _frame(cmd: str) -> str:
+        payload = to_frame(cmd)
+        if DEBUG:
+            print(f"[HUB TX] {payload}")
+        return payload
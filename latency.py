@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Pomiar czasu odpowiedzi (round-trip) na komendy.
+
+Klasa LatencyHistogram:
+- histogram log-liniowy w stylu HDR Histogram: przedziały mają stałą
+  szerokość względną (ok. 2^-(bits-1), domyślnie < 1%), więc stała,
+  niewielka tablica liczników pokrywa zakres od mikrosekund do minut,
+- record() to kilka operacji na liczbach całkowitych, bez alokacji,
+- percentyle odczytywane z liczników (dokładność = szerokość przedziału).
+
+Klasa LatencyStats:
+- osobny histogram dla każdego typu komendy (PING, TARGET, PID, ...),
+- tabela do wypisania i zrzut JSON (to_dict() / dump_json()).
+
+Klasa LatencyTracker:
+- łączy ramki wysłane (znacznik czasu TX) z odpowiedziami (RX);
+  firmware odpowiada na każdą ramkę jedną linią w kolejności odbioru,
+  więc wystarcza kolejka FIFO,
+- linie samoczynne (TEL, MAE, READY) są pomijane,
+- ramki bez odpowiedzi dłużej niż max_age są wyrzucane z kolejki
+  (licznik expired), żeby zgubiona odpowiedź nie przesunęła
+  przypisania wszystkich kolejnych.
+
+Używane przez SerialTransport(record_latency=True); przy wyłączonym
+pomiarze transport nie wykonuje żadnej dodatkowej pracy.
+"""
+
+from __future__ import annotations
+import json
+import math
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from dispatch import classify
+from protocol import command_kind
+
+DEBUG = False
+
+# percentyle w podsumowaniach
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    """
+    Histogram czasów o stałym rozmiarze (log-liniowy, jak HDR Histogram).
+
+    Wartości przechowywane są w jednostkach unit (domyślnie 1 µs) jako
+    liczby całkowite. Wartości < 2^bits mają przedziały szerokości 1,
+    powyżej każda potęga dwójki dzielona jest na 2^(bits-1) równych części.
+
+    Parametry:
+        highest : największa rozróżniana wartość w sekundach
+                  (większe trafiają do ostatniego przedziału),
+        bits    : liczba bitów precyzji (7 -> błąd względny < 1/64),
+        unit    : rozdzielczość w sekundach.
+    """
+
+    __slots__ = ("bits", "unit", "_sub", "_half", "_max_raw", "counts",
+                 "count", "total", "min", "max")
+
+    def __init__(self, highest: float = 60.0, bits: int = 7, unit: float = 1e-6) -> None:
+        if bits < 2:
+            raise ValueError("bits must be >= 2")
+        self.bits = bits
+        self.unit = unit
+        self._sub = 1 << bits
+        self._half = self._sub >> 1
+        self._max_raw = max(self._sub, int(highest / unit))
+        self.counts: List[int] = [0] * (self._index(self._max_raw) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def _index(self, raw: int) -> int:
+        if raw < self._sub:
+            return raw
+        e = raw.bit_length() - self.bits
+        return e * self._half + (raw >> e)
+
+    def _lower(self, idx: int) -> int:
+        """Dolna granica przedziału idx (w jednostkach unit)."""
+        if idx < self._sub:
+            return idx
+        e = idx // self._half - 1
+        return (idx - e * self._half) << e
+
+    def _upper(self, idx: int) -> int:
+        """Górna granica przedziału idx (włącznie, w jednostkach unit)."""
+        if idx < self._sub:
+            return idx
+        e = idx // self._half - 1
+        return ((idx - e * self._half + 1) << e) - 1
+
+    def record(self, seconds: float) -> None:
+        """Dodaje jeden pomiar (w sekundach)."""
+        raw = int(seconds / self.unit)
+        if raw < 0:
+            raw = 0
+        elif raw > self._max_raw:
+            raw = self._max_raw
+        self.counts[self._index(raw)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Dodaje liczniki innego histogramu o tych samych parametrach."""
+        if (other.bits, other.unit, other._max_raw) != (self.bits, self.unit, self._max_raw):
+            raise ValueError("histogram layout mismatch")
+        for i, n in enumerate(other.counts):
+            if n:
+                self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def reset(self) -> None:
+        """Zeruje wszystkie liczniki."""
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float("nan")
+
+    def percentile(self, p: float) -> float:
+        """
+        Percentyl p (0..100) w sekundach – górna granica przedziału,
+        w którym wypada p% pomiarów (ograniczona do zmierzonego max).
+        """
+        if not self.count:
+            return float("nan")
+        rank = max(1, math.ceil(p / 100.0 * self.count - 1e-9))
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min((self._upper(idx) + 1) * self.unit, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Liczba, min, średnia, percentyle i max (sekundy)."""
+        out = {"count": self.count, "min": self.min if self.count else float("nan"),
+               "mean": self.mean}
+        for p in PERCENTILES:
+            out[f"p{p:g}"] = self.percentile(p)
+        out["max"] = self.max if self.count else float("nan")
+        return out
+
+    def to_dict(self) -> dict:
+        """
+        Postać do JSON: podsumowanie oraz niezerowe przedziały
+        jako listy [dolna granica, górna granica, liczba] w sekundach.
+        """
+        buckets = [[self._lower(i) * self.unit, (self._upper(i) + 1) * self.unit, n]
+                   for i, n in enumerate(self.counts) if n]
+        return {"summary": _json_safe(self.summary()), "buckets": buckets}
+
+
+class LatencyStats:
+    """Histogramy czasów odpowiedzi dla poszczególnych typów komend."""
+
+    def __init__(self, highest: float = 60.0, bits: int = 7) -> None:
+        self.highest = highest
+        self.bits = bits
+        self.by_kind: Dict[str, LatencyHistogram] = {}
+
+    def record(self, kind: str, seconds: float) -> None:
+        h = self.by_kind.get(kind)
+        if h is None:
+            h = self.by_kind[kind] = LatencyHistogram(self.highest, self.bits)
+        h.record(seconds)
+
+    def total(self) -> LatencyHistogram:
+        """Histogram wszystkich komend razem."""
+        out = LatencyHistogram(self.highest, self.bits)
+        for h in self.by_kind.values():
+            out.merge(h)
+        return out
+
+    def reset(self) -> None:
+        self.by_kind.clear()
+
+    def to_dict(self) -> dict:
+        return {kind: h.to_dict() for kind, h in sorted(self.by_kind.items())}
+
+    def dump_json(self, path: str) -> None:
+        """Zapisuje histogramy do pliku JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format_table(self) -> str:
+        """Tabela czasów w milisekundach do wypisania na konsolę."""
+        cols = ["count", "min", "mean"] + [f"p{p:g}" for p in PERCENTILES] + ["max"]
+        lines = [f"{'komenda':<10}" + "".join(f"{c:>9}" for c in cols)]
+        rows = sorted(self.by_kind.items())
+        if len(rows) > 1:
+            rows.append(("(razem)", self.total()))
+        for kind, h in rows:
+            s = h.summary()
+            cells = [f"{s['count']:>9d}"] + [f"{s[c] * 1e3:>9.2f}" for c in cols[1:]]
+            lines.append(f"{kind:<10}" + "".join(cells))
+        if not self.by_kind:
+            lines.append("(brak pomiarów)")
+        return "\n".join(lines)
+
+
+class LatencyTracker:
+    """
+    Dopasowanie odpowiedzi do wysłanych ramek i zapis czasów do LatencyStats.
+
+    Atrybuty:
+        stats   : zebrane histogramy,
+        max_age : ramka czekająca dłużej jest uznawana za bez odpowiedzi,
+        expired : liczba takich ramek.
+    """
+
+    def __init__(self, stats: Optional[LatencyStats] = None, max_age: float = 5.0) -> None:
+        self.stats = stats or LatencyStats()
+        self.max_age = max_age
+        self.expired = 0
+        self._pending: deque = deque()
+
+    def on_tx(self, frames: Iterable[str], now: Optional[float] = None) -> None:
+        """Ramki właśnie wysyłane (wywoływane przed zapisem do portu)."""
+        if now is None:
+            now = time.monotonic()
+        for frame in frames:
+            self._pending.append((command_kind(frame), now))
+
+    def on_rx(self, lines: Iterable[str], now: Optional[float] = None) -> None:
+        """Linie właśnie złożone z danych z portu."""
+        pending = self._pending
+        if not pending:
+            return
+        if now is None:
+            now = time.monotonic()
+        for line in lines:
+            if not classify(line).is_reply:
+                continue
+            while pending:
+                try:
+                    kind, sent = pending.popleft()
+                except IndexError:
+                    break
+                if now - sent <= self.max_age:
+                    self.stats.record(kind, now - sent)
+                    break
+                self.expired += 1
+                if DEBUG:
+                    print(f"[LAT] no reply to {kind} within {self.max_age} s")
+
+    def clear(self) -> None:
+        """Porzuca ramki czekające na odpowiedź (np. po reset_input())."""
+        self._pending.clear()
+
+
+def _json_safe(d: dict) -> dict:
+    """nan/inf nie są poprawnym JSON – zamieniamy na None."""
+    return {k: (None if isinstance(v, float) and (v != v or v in (float("inf"), float("-inf"))) else v)
+            for k, v in d.items()}
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Odczyt nagranych sesji telemetrii (format z recorder.py) do analizy offline.
+
+Klasa TelemetryLog:
+- mapuje pliki kolumn w pamięci (np.memmap, tylko do odczytu),
+- udostępnia kolumny t, dist, sp, err, out jako widoki NumPy
+  bez kopiowania danych – system wczytuje tylko te strony pliku,
+  które są faktycznie używane,
+- wycinki czasowe (window()) to również widoki,
+- metryki (MAE, MAE w oknach, odpowiedź skokowa) liczone są
+  porcjami (chunk), więc zużycie pamięci nie zależy od długości nagrania.
+
+Użycie z linii poleceń (krótkie podsumowanie sesji):
+    python logreader.py sesja.tel [--window 3.0]
+
+Wymaga biblioteki numpy.
+"""
+
+from __future__ import annotations
+import argparse
+import bisect
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+from recorder import COLUMNS, column_path, read_meta
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# domyślny rozmiar porcji (wierszy) przy liczeniu metryk
+CHUNK_ROWS = 1 << 20
+
+
+@dataclass
+class StepMetrics:
+    """
+    Parametry odpowiedzi skokowej (odległość kulki po zmianie punktu zadanego).
+
+    Atrybuty:
+        t_step        : czas zmiany punktu zadanego,
+        initial       : wartość dist w chwili skoku,
+        target        : nowy punkt zadany,
+        rise_time     : czas przejścia od 10% do 90% skoku (nan, jeśli nie osiągnięto),
+        overshoot     : przeregulowanie w % wielkości skoku,
+        settling_time : czas od skoku do ostatniego wyjścia poza pasmo tolerancji
+                        (nan, jeśli przebieg nie ustalił się w oknie),
+        steady_error  : średni błąd w ostatnich 10% okna.
+    """
+    t_step: float
+    initial: float
+    target: float
+    rise_time: float
+    overshoot: float
+    settling_time: float
+    steady_error: float
+
+
+class TelemetryWindow:
+    """
+    Fragment sesji – zestaw widoków (bez kopiowania) na wszystkie kolumny.
+    """
+
+    def __init__(self, columns: Dict[str, "np.ndarray"]) -> None:
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns["t"])
+
+    def __getattr__(self, name: str) -> "np.ndarray":
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def mae(self, chunk: int = CHUNK_ROWS) -> float:
+        """Średni błąd bezwzględny |dist - sp| (jak w fazie HOLD firmware'u)."""
+        total, count = 0.0, 0
+        for a, b in _chunks(len(self), chunk):
+            total += float(np.abs(self.dist[a:b] - self.sp[a:b]).sum(dtype=np.float64))
+            count += b - a
+        return total / count if count else float("nan")
+
+
+class TelemetryLog(TelemetryWindow):
+    """
+    Cała nagrana sesja zmapowana w pamięci.
+
+    Przykład:
+        log = TelemetryLog("sesja.tel")
+        hold = log.window(10.0, 13.0)        # sekundy od początku nagrania
+        print(hold.mae(), log.mae_windows(3.0))
+    """
+
+    def __init__(self, path: str) -> None:
+        if np is None:
+            raise RuntimeError("numpy not available")
+        self.path = path
+        self.meta = read_meta(path)
+
+        rows = min(
+            os.path.getsize(column_path(path, name)) // np.dtype(dtype).itemsize
+            for name, dtype in COLUMNS
+        )
+        columns = {}
+        for name, dtype in COLUMNS:
+            if rows:
+                columns[name] = np.memmap(column_path(path, name), dtype=dtype, mode="r", shape=(rows,))
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+        super().__init__(columns)
+
+    @property
+    def t_start(self) -> float:
+        """Czas (w jednostkach kolumny t) pierwszej próbki; nan dla pustej sesji."""
+        return float(self.t[0]) if len(self) else float("nan")
+
+    @property
+    def duration(self) -> float:
+        """Czas trwania nagrania w sekundach."""
+        return float(self.t[-1] - self.t[0]) if len(self) else 0.0
+
+    def wall_time(self, t: float) -> float:
+        """
+        Zamienia czas z kolumny t na czas ścienny (epoch) – względem
+        segmentu (otwarcia sesji), w którym wypada t.
+        """
+        meta = self.meta
+        if meta["version"] == 1:
+            return meta["t0_wall"] + (t - meta["t0_monotonic"])
+        segments = meta["segments"]
+        i = bisect.bisect_right([s["t"] for s in segments], t) - 1
+        seg = segments[max(i, 0)]
+        return seg["t0_wall"] + (t - seg["t"])
+
+    def index_range(self, t0: Optional[float] = None, t1: Optional[float] = None,
+                    relative: bool = True) -> Tuple[int, int]:
+        """
+        Zakres indeksów [a, b) dla czasu t0 <= t < t1.
+
+        relative=True: czasy liczone w sekundach od pierwszej próbki,
+        relative=False: czasy w jednostkach kolumny t (sekundy od początku
+        sesji; w sesjach w wersji 1 – time.monotonic()).
+        Kolumna t jest rosnąca, więc wystarcza wyszukiwanie binarne.
+        """
+        offset = self.t_start if relative and len(self) else 0.0
+        a = 0 if t0 is None else int(np.searchsorted(self.t, t0 + offset, side="left"))
+        b = len(self) if t1 is None else int(np.searchsorted(self.t, t1 + offset, side="left"))
+        return a, max(a, b)
+
+    def window(self, t0: Optional[float] = None, t1: Optional[float] = None,
+               relative: bool = True) -> TelemetryWindow:
+        """Wycinek czasowy sesji (widoki bez kopiowania)."""
+        a, b = self.index_range(t0, t1, relative)
+        return TelemetryWindow({name: col[a:b] for name, col in self.columns.items()})
+
+    def mae_windows(self, width: float, chunk: int = CHUNK_ROWS) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        MAE w kolejnych, nienachodzących oknach czasowych o szerokości width [s].
+
+        Zwraca (początki okien w sekundach od startu, MAE w oknach);
+        okna bez próbek mają MAE = nan.
+        """
+        if not len(self):
+            return np.empty(0), np.empty(0)
+        n_bins = int(self.duration // width) + 1
+        sums = np.zeros(n_bins)
+        counts = np.zeros(n_bins)
+        t_start = self.t_start
+        for a, b in _chunks(len(self), chunk):
+            bins = ((self.t[a:b] - t_start) // width).astype(np.int64)
+            err = np.abs(self.dist[a:b] - self.sp[a:b]).astype(np.float64)
+            sums += np.bincount(bins, weights=err, minlength=n_bins)[:n_bins]
+            counts += np.bincount(bins, minlength=n_bins)[:n_bins]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mae = sums / counts
+        return np.arange(n_bins) * width, mae
+
+    def setpoint_changes(self, chunk: int = CHUNK_ROWS) -> "np.ndarray":
+        """Indeksy próbek, w których zmienił się punkt zadany sp."""
+        found = []
+        for a, b in _chunks(len(self), chunk):
+            lo = max(a - 1, 0)
+            idx = np.flatnonzero(np.diff(self.sp[lo:b]) != 0) + lo + 1
+            found.append(idx)
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def step_response(self, index: int, duration: float, tol: float = 0.05) -> StepMetrics:
+        """
+        Metryki odpowiedzi skokowej od próbki index (np. z setpoint_changes())
+        przez duration sekund; tol – pasmo ustalenia jako ułamek wielkości skoku.
+        """
+        t0 = float(self.t[index])
+        b = int(np.searchsorted(self.t, t0 + duration, side="left"))
+        t = self.t[index:b] - t0
+        y = self.dist[index:b].astype(np.float64)
+        target = float(self.sp[index])
+        initial = float(y[0]) if len(y) else float("nan")
+        step = target - initial
+
+        nan = float("nan")
+        if len(y) < 2 or step == 0:
+            return StepMetrics(t0, initial, target, nan, nan, nan, nan)
+
+        # postęp w stronę celu: 0 = start, 1 = punkt zadany
+        progress = (y - initial) / step
+        i10 = np.flatnonzero(progress >= 0.1)
+        i90 = np.flatnonzero(progress >= 0.9)
+        rise = float(t[i90[0]] - t[i10[0]]) if len(i10) and len(i90) else nan
+        overshoot = max(0.0, float(progress.max()) - 1.0) * 100.0
+
+        outside = np.flatnonzero(np.abs(y - target) > tol * abs(step))
+        if not len(outside):
+            settling = 0.0
+        elif outside[-1] == len(y) - 1:
+            settling = nan
+        else:
+            settling = float(t[outside[-1] + 1])
+
+        tail = y[int(len(y) * 0.9):]
+        steady = float(np.mean(tail - target))
+        return StepMetrics(t0, initial, target, rise, overshoot, settling, steady)
+
+
+def _chunks(n: int, chunk: int) -> Iterator[Tuple[int, int]]:
+    """Kolejne zakresy [a, b) długości chunk pokrywające 0..n."""
+    for a in range(0, n, chunk):
+        yield a, min(a + chunk, n)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="podsumowanie nagranej sesji telemetrii")
+    ap.add_argument("path", help="katalog sesji (z cli.py --record)")
+    ap.add_argument("--window", type=float, default=3.0, help="szerokość okna MAE w s")
+    ap.add_argument("--step-duration", type=float, default=10.0,
+                    help="czas analizy odpowiedzi po zmianie punktu zadanego (s)")
+    args = ap.parse_args()
+
+    log = TelemetryLog(args.path)
+    print(f"{args.path}: {len(log)} próbek, {log.duration:.1f} s, MAE całości = {log.mae():.3f}")
+
+    starts, mae = log.mae_windows(args.window)
+    for s, m in zip(starts, mae):
+        print(f"  [{s:8.1f} s, +{args.window:g} s)  MAE = {m:.3f}")
+
+    for idx in log.setpoint_changes():
+        m = log.step_response(int(idx), args.step_duration)
+        print(f"  skok sp -> {m.target:.2f} @ {m.t_step - log.t_start:.1f} s: "
+              f"rise={m.rise_time:.2f} s  overshoot={m.overshoot:.1f}%  "
+              f"settling={m.settling_time:.2f} s  e_ss={m.steady_error:.3f}")
+
+
+if __name__ == "__main__":
+    main()
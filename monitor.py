@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Monitor jakości strumienia telemetrii (TEL co 100 ms).
+
+Klasa TelemetryMonitor dostaje każdą odebraną linię w chwili odbioru
+i liczy:
+- odstępy między kolejnymi poprawnymi liniami TEL (inter-arrival)
+  i ich odchylenie od okresu firmware'u (jitter),
+- wygładzony jitter jak w RTP (RFC 3550: J += (|D| - J) / 16),
+- przerwy (odstęp > gap_factor * period) i szacowaną liczbę
+  zgubionych linii,
+- linie uszkodzone: ucięte / niepoprawne linie TEL (malformed)
+  oraz sklejone – dwie ramki w jednej linii po zgubionym '\n' (merged).
+
+Pamięć jest stała:
+- percentyle "kroczące" liczone są z pierścienia ostatnich window
+  odstępów (array o stałym rozmiarze),
+- percentyle całej sesji – z histogramu log-liniowego (latency.py).
+
+status() zwraca krótką linię do paska stanu, summary() – podsumowanie sesji.
+"""
+
+from __future__ import annotations
+import time
+from array import array
+from typing import Optional
+
+from latency import LatencyHistogram
+from protocol import TEL_FIELDS, TEL_PREFIX, parse_telemetry
+
+DEBUG = False
+
+# fragmenty pól TEL – po nich rozpoznajemy linię TEL z uciętym początkiem
+_TEL_MARKERS = tuple(f";{name}=" for name in TEL_FIELDS[1:])
+
+
+class TelemetryMonitor:
+    """
+    Statystyki odbioru linii telemetrii.
+
+    Parametry:
+        period     : nominalny okres telemetrii (firmware: t = 100 ms),
+        gap_factor : odstęp większy niż gap_factor * period to przerwa,
+        window     : liczba ostatnich odstępów do percentyli kroczących.
+
+    Atrybuty (liczniki):
+        frames    : poprawne linie TEL,
+        malformed : linie zaczynające się od TEL; ale niepoprawne/ucięte,
+        merged    : linie zawierające więcej niż jedną ramkę TEL,
+        other     : pozostałe linie (ACK, MAE=..., itp.),
+        gaps      : liczba przerw,
+        lost      : szacowana liczba zgubionych linii (na podstawie przerw),
+        jitter    : wygładzony jitter (s).
+    """
+
+    def __init__(self, period: float = 0.1, gap_factor: float = 1.5, window: int = 1024) -> None:
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        self.period = period
+        self.gap_factor = gap_factor
+        self.window = window
+        self.reset()
+
+    def reset(self) -> None:
+        """Zeruje wszystkie statystyki (nowa sesja)."""
+        self.frames = 0
+        self.malformed = 0
+        self.merged = 0
+        self.other = 0
+        self.gaps = 0
+        self.lost = 0
+        self.jitter = 0.0
+        self.max_gap = 0.0
+        self.t_first: Optional[float] = None
+        self.t_last: Optional[float] = None
+        self._ring = array("d", bytes(8 * self.window))
+        self._ring_n = 0
+        self._ring_i = 0
+        self._hist = LatencyHistogram(highest=60.0)
+
+    def on_line(self, line: str, t: Optional[float] = None) -> bool:
+        """
+        Rejestruje linię odebraną w chwili t (domyślnie time.monotonic()).
+
+        Zwraca True dla poprawnej linii TEL.
+        """
+        if t is None:
+            t = time.monotonic()
+        if not line.startswith(TEL_PREFIX):
+            if TEL_PREFIX in line:
+                # ogon ramki sklejony z początkiem następnej
+                self.merged += 1
+            elif any(m in line for m in _TEL_MARKERS):
+                # linia TEL bez początku
+                self.malformed += 1
+            else:
+                self.other += 1
+            return False
+        if line.count(TEL_PREFIX) > 1:
+            self.merged += 1
+            return False
+        if parse_telemetry(line) is None:
+            self.malformed += 1
+            return False
+
+        self.frames += 1
+        if self.t_last is None:
+            self.t_first = t
+        else:
+            self._interval(t - self.t_last)
+        self.t_last = t
+        return True
+
+    def _interval(self, dt: float) -> None:
+        ring = self._ring
+        ring[self._ring_i] = dt
+        self._ring_i = (self._ring_i + 1) % self.window
+        if self._ring_n < self.window:
+            self._ring_n += 1
+        self._hist.record(dt)
+
+        self.jitter += (abs(dt - self.period) - self.jitter) / 16.0
+        if dt > self.gap_factor * self.period:
+            self.gaps += 1
+            self.lost += max(0, int(round(dt / self.period)) - 1)
+            if DEBUG:
+                print(f"[MON] gap {dt * 1e3:.1f} ms")
+        if dt > self.max_gap:
+            self.max_gap = dt
+
+    def recent_percentile(self, p: float) -> float:
+        """Percentyl p (0..100) odstępu z ostatnich window linii (s)."""
+        n = self._ring_n
+        if not n:
+            return float("nan")
+        values = sorted(self._ring[:n])
+        k = min(n - 1, max(0, int(p / 100.0 * n + 0.5) - 1))
+        return values[k]
+
+    @property
+    def rate(self) -> float:
+        """Średnia liczba linii TEL na sekundę w całej sesji."""
+        if self.t_first is None or self.t_last == self.t_first:
+            return 0.0
+        return (self.frames - 1) / (self.t_last - self.t_first)
+
+    def status(self) -> str:
+        """Krótka linia do paska stanu."""
+        p50 = self.recent_percentile(50) * 1e3
+        p99 = self.recent_percentile(99) * 1e3
+        text = (f"TEL {self.frames}  {self.rate:5.2f}/s  dt p50 {p50:6.1f} p99 {p99:6.1f} ms  "
+                f"jitter {self.jitter * 1e3:5.1f} ms  przerwy {self.gaps} (zgub. {self.lost})")
+        bad = self.malformed + self.merged
+        if bad:
+            text += f"  błędne {bad}"
+        return text
+
+    def summary(self) -> str:
+        """Podsumowanie całej sesji (kilka linii)."""
+        h = self._hist
+        if not h.count:
+            return f"Telemetria: {self.frames} linii TEL (za mało do statystyk)."
+        duration = self.t_last - self.t_first
+        return "\n".join([
+            f"Telemetria: {self.frames} linii TEL w {duration:.1f} s ({self.rate:.2f}/s, "
+            f"nominalnie {1 / self.period:.2f}/s)",
+            f"  odstęp [ms]: min {_ms(h.min)}  p50 {_ms(h.percentile(50))}  "
+            f"p90 {_ms(h.percentile(90))}  p99 {_ms(h.percentile(99))}  max {_ms(h.max)}",
+            f"  jitter (RFC 3550): {_ms(self.jitter)} ms",
+            f"  przerwy: {self.gaps} (najdłuższa {_ms(self.max_gap)} ms), "
+            f"zgubione ok. {self.lost} linii",
+            f"  uszkodzone: {self.malformed}, sklejone: {self.merged}, inne linie: {self.other}",
+        ])
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1e3:.1f}"
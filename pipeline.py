@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Potokowe (pipelined) wysyłanie komend do Arduino.
+
+Zamiast schematu "wyślij komendę -> czekaj na odpowiedź -> następna"
+CommandPipeline wysyła kolejne ramki, zanim przyjdą odpowiedzi
+na poprzednie, pilnując jedynie, żeby suma bajtów "w locie"
+(wysłanych, jeszcze bez odpowiedzi) mieściła się w buforze
+odbiorczym Arduino UNO (64 bajty).
+
+Firmware odpowiada na każdą ramkę dokładnie jedną linią (ACK, NACK(...),
+PONG albo tekst ECHO) i robi to w kolejności odbioru, więc odpowiedzi
+przypisywane są komendom po kolei (FIFO) – robi to dispatch.Dispatcher.
+Linie niebędące odpowiedziami (TEL;..., MAE=..., READY) są przekazywane
+do on_unsolicited (i subskrybentów dispatchera).
+
+Przykład:
+    p = CommandPipeline(transport)
+    futs = p.submit(["ZERO(95)", "TARGET(26.5)", "PID(3,2,1.5)"])
+    p.pump(timeout=2.0)
+    print([f.result() for f in futs])
+"""
+
+from __future__ import annotations
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Iterable, List, Optional
+
+from dispatch import REPLY_KINDS, Dispatcher
+from transport import RX_BUFFER, SerialTransport
+from protocol import to_frame
+
+DEBUG = False
+
+
+class _Command:
+    __slots__ = ("frame", "size", "future", "sent_at")
+
+    def __init__(self, frame: str) -> None:
+        self.frame = frame
+        self.size = len(frame) + 1  # + '\n'
+        self.future: Future = Future()
+        self.sent_at = 0.0
+
+
+class CommandPipeline:
+    """
+    Kolejka komend z oknem "w locie" liczonym w bajtach.
+
+    Atrybuty:
+        transport      : otwarty SerialTransport,
+        window         : maks. liczba bajtów wysłanych bez odpowiedzi
+                         (domyślnie RX_BUFFER = 64),
+        timeout        : maks. czas oczekiwania na odpowiedź na jedną ramkę,
+        on_unsolicited : wywoływane dla linii, które nie są odpowiedziami,
+        dispatcher     : klasyfikacja linii i przypisywanie odpowiedzi
+                         (domyślnie własny; można podać wspólny, np. z
+                         subskrybentami telemetrii).
+
+    Pojedyncza ramka dłuższa niż window jest wysyłana, gdy nic innego
+    nie jest w locie.
+    """
+
+    def __init__(self, transport: SerialTransport, window: int = RX_BUFFER,
+                 timeout: float = 2.0,
+                 on_unsolicited: Optional[Callable[[str], None]] = None,
+                 dispatcher: Optional[Dispatcher] = None) -> None:
+        self.transport = transport
+        self.window = window
+        self.timeout = timeout
+        self.on_unsolicited = on_unsolicited
+        self.dispatcher = dispatcher if dispatcher is not None else Dispatcher()
+        self._queued: deque = deque()
+        self._inflight: deque = deque()
+        self._inflight_bytes = 0
+
+    def submit(self, cmds: Iterable[str]) -> List[Future]:
+        """
+        Dodaje komendy do kolejki i zwraca ich Future (w tej samej kolejności).
+
+        Wynikiem Future jest linia odpowiedzi; przy braku odpowiedzi
+        w czasie timeout – wyjątek TimeoutError.
+        """
+        futures = []
+        for cmd in cmds:
+            c = _Command(to_frame(cmd))
+            self._queued.append(c)
+            futures.append(c.future)
+        return futures
+
+    @property
+    def pending(self) -> int:
+        """Liczba komend bez odpowiedzi (w kolejce i w locie)."""
+        return len(self._queued) + len(self._inflight)
+
+    def pump(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wysyła i odbiera, dopóki wszystkie komendy nie dostaną odpowiedzi
+        albo nie minie timeout (None = bez limitu całkowitego; pojedyncze
+        komendy i tak wygasają po self.timeout).
+
+        Zwraca True, jeśli nic już nie czeka.
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while self.pending:
+            self._send_window()
+
+            now = time.monotonic()
+            if end is not None and now >= end:
+                break
+
+            # czekamy nie dłużej niż do wygaśnięcia najstarszej ramki w locie
+            wait = self._inflight[0].sent_at + self.timeout - now
+            if end is not None:
+                wait = min(wait, end - now)
+            line = self.transport.read_line(timeout=max(wait, 0.0)) if wait > 0 else None
+
+            if line is None:
+                self._expire(time.monotonic())
+                continue
+            msg = self.dispatcher.feed(line)
+            if msg.kind in REPLY_KINDS:
+                self._settle()
+            elif self.on_unsolicited is not None:
+                self.on_unsolicited(line)
+
+        return not self.pending
+
+    def run(self, cmds: Iterable[str], timeout: Optional[float] = None) -> List[Future]:
+        """
+        submit() + pump(); komendy, które nie zdążyły, kończą się TimeoutError.
+        """
+        futures = self.submit(cmds)
+        if not self.pump(timeout):
+            self.cancel_pending()
+        return futures
+
+    def cancel_pending(self) -> None:
+        """Kończy wszystkie oczekujące komendy wyjątkiem TimeoutError."""
+        while self._inflight:
+            self._fail(self._inflight.popleft())
+        while self._queued:
+            self._fail(self._queued.popleft())
+        self._inflight_bytes = 0
+
+    def _send_window(self) -> None:
+        """Wysyła jednym zapisem tyle ramek z kolejki, ile mieści okno."""
+        batch = []
+        now = time.monotonic()
+        while self._queued:
+            c = self._queued[0]
+            if self._inflight and self._inflight_bytes + c.size > self.window:
+                break
+            self._queued.popleft()
+            c.sent_at = now
+            self.dispatcher.expect(c.frame, c.future, now)
+            self._inflight.append(c)
+            self._inflight_bytes += c.size
+            batch.append(c.frame)
+        if batch:
+            self.transport.write_lines(batch)
+            if DEBUG:
+                print(f"[PIPE] sent {len(batch)} frame(s), in flight {self._inflight_bytes} B")
+
+    def _settle(self) -> None:
+        """Zwalnia okno po ramkach, które dostały już odpowiedź (przez dispatcher)."""
+        while self._inflight and self._inflight[0].future.done():
+            c = self._inflight.popleft()
+            self._inflight_bytes -= c.size
+
+    def _expire(self, now: float) -> None:
+        """Kończy TimeoutError ramki, które czekają dłużej niż self.timeout."""
+        while self._inflight and now - self._inflight[0].sent_at >= self.timeout:
+            c = self._inflight.popleft()
+            self._inflight_bytes -= c.size
+            self._fail(c)
+
+    def _fail(self, c: _Command) -> None:
+        if not c.future.done():
+            c.future.set_exception(TimeoutError(f"no reply to {c.frame}"))
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Wektorowy symulator stanowiska kulka-belka do oceny nastaw PID offline.
+
+Jeden przebieg START na stanowisku trwa ok. 15 s, więc strojenie
+"na żywo" jest powolne. Funkcja simulate() odtwarza ten sam przebieg
+dla wielu zestawów nastaw (kp, ki, kd) jednocześnie – każdy zestaw
+to jeden element tablic NumPy, a pętla w Pythonie idzie tylko po
+krokach czasu (kilkaset iteracji niezależnie od liczby zestawów).
+
+Odwzorowanie firmware'u pro2-iss.ino:
+- START: serwo na servo_zero + 5, zerowanie całki i poprzedniego błędu,
+- krok co period (t = 100 ms): ruch kulki, pomiar, PID_step()
+  liczony zawsze z dt = 0.1, (int)output obcinane w stronę zera,
+  komenda serwa ograniczona do 0..180,
+- po 10 s faza HOLD: PID_step() nie jest wywoływane (serwo zostaje
+  w ostatnim położeniu), sumowany jest |dist - sp|,
+- po 3 s HOLD wynik MAE = średnia z próbek HOLD.
+
+Model obiektu jest ten sam co BallModel w emulator.py, więc dla
+pojedynczego zestawu bez szumu wynik jest zgodny z MAE=... emulatora.
+
+Użycie z linii poleceń (pomiar czasu dla losowych nastaw):
+    python plant.py [--n 10000] [--noise 0.05] [--seed 1]
+
+Wymaga biblioteki numpy.
+"""
+
+from __future__ import annotations
+import argparse
+import math
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+DEBUG = False
+
+# przyspieszenie ziemskie w cm/s^2 i współczynnik 5/7 toczącej się kuli
+_G_ROLL = (5.0 / 7.0) * 981.0
+
+# (int)output w C – zakres, w którym obcięcie ma sens (jak w emulator.py)
+_OUT_LIMIT = 1e9
+
+
+@dataclass
+class PlantParams:
+    """
+    Parametry obiektu i przebiegu START.
+
+    Atrybuty:
+        level          : kąt serwa, przy którym belka jest pozioma,
+        gain           : stopnie przechyłu belki na stopień serwa,
+        x0             : położenie kulki w chwili START (cm od czujnika),
+        x_min, x_max   : ograniczniki na końcach belki,
+        noise          : odchylenie standardowe szumu pomiaru (cm),
+        substeps       : kroki całkowania ruchu na jeden okres,
+        period         : okres pętli regulatora (firmware: t = 100 ms),
+        servo_zero     : ZERO(...) – położenie neutralne serwa,
+        distance_point : TARGET(...) – punkt zadany,
+        run_time       : czas fazy RUN (s),
+        hold_time      : czas fazy HOLD, z której liczone jest MAE (s).
+    """
+    level: float = 90.0
+    gain: float = 0.15
+    x0: float = 40.0
+    x_min: float = 5.0
+    x_max: float = 50.0
+    noise: float = 0.0
+    substeps: int = 10
+    period: float = 0.1
+    servo_zero: int = 90
+    distance_point: float = 26.5
+    run_time: float = 10.0
+    hold_time: float = 3.0
+
+    def ticks(self) -> Tuple[int, int]:
+        """
+        Liczba kroków fazy RUN i HOLD.
+
+        Firmware przechodzi do HOLD w kroku, w którym elapsed >= run_time
+        (PID_step() jest w nim jeszcze wykonywane), a kończy pomiar
+        w kroku, w którym od wejścia do HOLD minęło >= hold_time.
+        """
+        eps = 1e-9
+        return (max(1, math.ceil(self.run_time / self.period - eps)),
+                max(1, math.ceil(self.hold_time / self.period - eps)))
+
+
+@dataclass
+class SimResult:
+    """
+    Wynik symulacji (tablice o kształcie nastaw po rozgłoszeniu).
+
+    Atrybuty:
+        mae     : MAE z fazy HOLD – to, co firmware wypisuje jako MAE=...
+                  (inf dla przebiegów przerwanych),
+        final   : położenie kulki na końcu przebiegu (albo w chwili przerwania),
+        aborted : True dla przebiegów przerwanych jako rozbieżne,
+        trace   : opcjonalnie zmierzone odległości w kolejnych krokach
+                  (kształt: (liczba kroków,) + kształt nastaw; nan po przerwaniu).
+    """
+    mae: "np.ndarray"
+    final: "np.ndarray"
+    aborted: "np.ndarray"
+    trace: Optional["np.ndarray"] = None
+
+
+def simulate(kp, ki, kd, params: Optional[PlantParams] = None,
+             seed: Optional[int] = None, trace: bool = False,
+             abort_after: Optional[float] = None) -> SimResult:
+    """
+    Symuluje przebieg START dla wszystkich zestawów nastaw naraz.
+
+    kp, ki, kd mogą być liczbami albo tablicami (rozgłaszanymi wspólnie),
+    np. simulate(kp_grid[:, None, None], ki_grid[None, :, None], kd_grid).
+    seed – ziarno generatora szumu pomiaru (gdy params.noise > 0).
+
+    abort_after – wczesne przerywanie wyraźnie rozbieżnych przebiegów:
+    zestaw, którego kulka leży na ograniczniku belki nieprzerwanie
+    przez abort_after sekund, jest usuwany z dalszych obliczeń
+    (mae = inf, aborted = True). None = symulacja do końca (jak firmware).
+    """
+    if np is None:
+        raise RuntimeError("numpy not available")
+    p = params or PlantParams()
+    kp, ki, kd = (np.asarray(g, dtype=np.float64) for g in np.broadcast_arrays(kp, ki, kd))
+    shape = kp.shape
+    n = kp.size
+    rng = np.random.default_rng(seed) if p.noise else None
+
+    # obliczenia na płaskich tablicach aktywnych zestawów (idx -> pozycja w wyniku)
+    idx = np.arange(n)
+    kp, ki, kd = kp.ravel(), ki.ravel(), kd.ravel()
+    x = np.full(n, float(p.x0))
+    v = np.zeros(n)
+    integral = np.zeros(n)
+    previous_error = np.zeros(n)
+    servo = np.full(n, float(min(max(p.servo_zero + 5, 0), 180)))
+    mae_sum = np.zeros(n)
+    pinned = np.zeros(n, dtype=np.int32)
+
+    mae = np.full(n, np.inf)
+    final = np.empty(n)
+    aborted = np.zeros(n, dtype=bool)
+
+    run_ticks, hold_ticks = p.ticks()
+    h = p.period / p.substeps
+    sp = float(p.distance_point)
+    pin_limit = None if abort_after is None else max(1, math.ceil(abort_after / p.period - 1e-9))
+    rec = np.full((run_ticks + hold_ticks, n), np.nan) if trace else None
+
+    for k in range(run_ticks + hold_ticks):
+        if not len(idx):
+            break
+
+        # ruch kulki przy stałym położeniu serwa (BallModel.step)
+        a = -_G_ROLL * np.sin(np.radians((servo - p.level) * p.gain))
+        for _ in range(p.substeps):
+            v += a * h
+            x += v * h
+            stop = (x < p.x_min) | (x > p.x_max)
+            if stop.any():
+                np.clip(x, p.x_min, p.x_max, out=x)
+                v[stop] = 0.0
+
+        # pomiar (get_dist)
+        distance = x + p.noise * rng.standard_normal(len(idx)) if rng is not None else x
+        if rec is not None:
+            rec[k, idx] = distance
+
+        if k < run_ticks:
+            # PID_step()
+            proportional = distance - sp
+            integral += proportional * 0.1
+            derivative = (proportional - previous_error) / 0.1
+            output = kp * proportional + ki * integral + kd * derivative
+            previous_error = proportional
+            output = np.nan_to_num(output, nan=0.0, posinf=_OUT_LIMIT, neginf=-_OUT_LIMIT)
+            servo = np.clip(p.servo_zero + np.trunc(np.clip(output, -_OUT_LIMIT, _OUT_LIMIT)), 0, 180)
+        else:
+            # run_hold_mode(): bez PID_step(), tylko suma błędów
+            mae_sum += np.abs(distance - sp)
+
+        if pin_limit is not None:
+            at_stop = (x <= p.x_min) | (x >= p.x_max)
+            pinned = np.where(at_stop, pinned + 1, 0)
+            drop = pinned >= pin_limit
+            if drop.any():
+                aborted[idx[drop]] = True
+                final[idx[drop]] = x[drop]
+                keep = ~drop
+                idx, kp, ki, kd = idx[keep], kp[keep], ki[keep], kd[keep]
+                x, v, servo, pinned = x[keep], v[keep], servo[keep], pinned[keep]
+                integral, previous_error, mae_sum = integral[keep], previous_error[keep], mae_sum[keep]
+
+    mae[idx] = mae_sum / hold_ticks
+    final[idx] = x
+    if DEBUG:
+        print(f"[PLANT] {n} gain set(s), {run_ticks}+{hold_ticks} ticks, "
+              f"aborted {int(aborted.sum())}")
+    return SimResult(
+        mae.reshape(shape),
+        final.reshape(shape),
+        aborted.reshape(shape),
+        rec.reshape((len(rec),) + shape) if rec is not None else None,
+    )
+
+
+def random_gains(n: int, kp: Tuple[float, float] = (0.0, 10.0),
+                 ki: Tuple[float, float] = (0.0, 5.0), kd: Tuple[float, float] = (0.0, 5.0),
+                 seed: Optional[int] = None) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """n losowych zestawów (kp, ki, kd) z rozkładu jednostajnego w podanych zakresach."""
+    if np is None:
+        raise RuntimeError("numpy not available")
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(*kp, n), rng.uniform(*ki, n), rng.uniform(*kd, n))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="symulacja przebiegu START dla wielu nastaw PID")
+    ap.add_argument("--n", type=int, default=10000, help="liczba losowych zestawów nastaw")
+    ap.add_argument("--noise", type=float, default=0.0, help="szum pomiaru (cm)")
+    ap.add_argument("--target", type=float, default=26.5, help="punkt zadany (cm)")
+    ap.add_argument("--zero", type=int, default=90, help="położenie neutralne serwa")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--top", type=int, default=10, help="ile najlepszych zestawów wypisać")
+    args = ap.parse_args()
+
+    params = PlantParams(noise=args.noise, distance_point=args.target, servo_zero=args.zero)
+    kp, ki, kd = random_gains(args.n, seed=args.seed)
+
+    t0 = time.perf_counter()
+    res = simulate(kp, ki, kd, params, seed=args.seed)
+    elapsed = time.perf_counter() - t0
+
+    print(f"{args.n} zestawów nastaw w {elapsed:.2f} s "
+          f"({args.n / elapsed:.0f} przebiegów/s, 1 przebieg na stanowisku ≈ 15 s)")
+    for i in np.argsort(res.mae)[:args.top]:
+        print(f"  PID({kp[i]:.3f},{ki[i]:.3f},{kd[i]:.3f})  MAE={res.mae[i]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Wykres telemetrii na żywo w terminalu (sp, dist, err, out).
+
+Klasa LivePlot:
+- pamięć stała: każde pole ma pierścień width kolumn (array 'd' z min
+  i max), niezależnie od długości sesji,
+- kolumna odpowiada stałemu odcinkowi czasu (column, domyślnie 0.1 s);
+  wszystkie linie TEL z tego odcinka są łączone w obwiednię min..max,
+  więc przy telemetrii dużo szybszej niż 10 Hz koszt rysowania się
+  nie zmienia, a krótkie skoki są widoczne,
+- rysowanie jak w oscyloskopie (sweep): nowe kolumny wpisywane są
+  w miejsce najstarszych, a przy każdym odświeżeniu przerysowywane są
+  tylko zmienione kolumny (sekwencje ANSI przesuwające kursor);
+  całość rysowana jest od nowa tylko po zmianie zakresu osi Y,
+- on_line() wykonuje tylko parsowanie i kilka porównań – odczyt
+  z portu nie czeka na terminal.
+
+Linie inne niż TEL (ACK, MAE=..., ...) pokazywane są w wierszu
+komunikatu pod wykresem (wykres nie przewija się).
+
+Interfejs jak render.StatusRenderer (start / on_line / tick / render /
+close), używany przez cli.follow_telemetry(view=...);
+w REPL: python cli.py COMx --plot.
+"""
+
+from __future__ import annotations
+import shutil
+import sys
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence, TextIO, Tuple
+
+from protocol import TEL_FIELDS, TEL_PREFIX, parse_telemetry
+
+DEBUG = False
+
+# znak każdej serii na wykresie
+SERIES_CHARS = {"dist": "*", "sp": "-", "err": "+", "out": "o"}
+
+# panele: (pola rysowane na wspólnej osi, wysokość w wierszach)
+DEFAULT_PANELS: Tuple[Tuple[Tuple[str, ...], int], ...] = (
+    (("sp", "dist"), 10),
+    (("err",), 5),
+    (("out",), 5),
+)
+
+# szerokość etykiet osi Y po lewej stronie
+_LABEL = 8
+
+
+class LivePlot:
+    """
+    Wykres telemetrii odświeżany przyrostowo.
+
+    Parametry:
+        refresh : okres odświeżania ekranu (s),
+        column  : odcinek czasu na jedną kolumnę wykresu (s),
+        width   : liczba kolumn (domyślnie szerokość terminala),
+        panels  : układ paneli, jak DEFAULT_PANELS,
+        out     : strumień wyjściowy (domyślnie sys.stdout),
+        live    : rysowanie w miejscu (domyślnie: gdy out to terminal);
+                  poza terminalem wykres wypisywany jest raz, w close(),
+        footer  : opcjonalna funkcja zwracająca linię pod wykresem
+                  (np. TelemetryMonitor.status).
+
+    Atrybuty:
+        frames  : liczba poprawnych linii TEL od start(),
+        bad     : liczba linii TEL, których nie udało się rozebrać,
+        redraws : liczba pełnych przerysowań (zmiana zakresu osi).
+    """
+
+    def __init__(self, refresh: float = 0.1, column: float = 0.1, width: Optional[int] = None,
+                 panels: Sequence[Tuple[Sequence[str], int]] = DEFAULT_PANELS,
+                 out: Optional[TextIO] = None, live: Optional[bool] = None,
+                 footer: Optional[Callable[[], str]] = None) -> None:
+        if refresh <= 0 or column <= 0:
+            raise ValueError("refresh and column must be > 0")
+        for names, height in panels:
+            for name in names:
+                if name not in TEL_FIELDS:
+                    raise ValueError(f"unknown telemetry field: {name!r}")
+            if height < 2:
+                raise ValueError("panel height must be >= 2")
+        self.refresh = refresh
+        self.column = column
+        self.out = out or sys.stdout
+        self.live = self.out.isatty() if live is None else live
+        self.footer = footer
+
+        size = shutil.get_terminal_size()
+        self.width = max(10, width or size.columns - _LABEL - 1)
+        # panele muszą się zmieścić na ekranie (ruchy kursora w górę
+        # zatrzymują się na pierwszym wierszu)
+        heights = [h for _, h in panels]
+        room = size.lines - 4
+        if self.live and sum(heights) > room:
+            scale = room / sum(heights)
+            heights = [max(2, int(h * scale)) for h in heights]
+        self.panels = [(tuple(names), h) for (names, _), h in zip(panels, heights)]
+        self._series = sorted({name for names, _ in self.panels for name in names},
+                              key=TEL_FIELDS.index)
+        self._field = {name: TEL_FIELDS.index(name) for name in self._series}
+        self.start()
+
+    def start(self, now: Optional[float] = None) -> None:
+        """Początek wykresu (nowa sesja TEST): czyści dane i rysuje pusty wykres."""
+        w = self.width
+        self._lo: Dict[str, array] = {n: array("d", [float("inf")]) * w for n in self._series}
+        self._hi: Dict[str, array] = {n: array("d", [float("-inf")]) * w for n in self._series}
+        self._range: List[Optional[Tuple[float, float]]] = [None] * len(self.panels)
+        self._t0 = time.monotonic() if now is None else now
+        self._col = 0
+        self._next = self._t0 + self.refresh
+        self._dirty = set()
+        self._full = True
+        self._rows = 1 + sum(h for _, h in self.panels) + 2
+        self._drawn = False
+        self._message = ""
+        self.frames = 0
+        self.bad = 0
+        self.redraws = 0
+
+    # --- dane ---
+
+    def on_line(self, line: str, t: Optional[float] = None) -> bool:
+        """Przyjmuje odebraną linię. Zwraca True dla poprawnej linii TEL."""
+        if not line.startswith(TEL_PREFIX):
+            self.message(f"<- {line}")
+            return False
+        values = parse_telemetry(line)
+        if values is None:
+            self.bad += 1
+            return False
+        if t is None:
+            t = time.monotonic()
+        col = int((t - self._t0) / self.column)
+        if col > self._col:
+            self._advance(col)
+        pos = self._col % self.width
+        lo, hi, field = self._lo, self._hi, self._field
+        for name in self._series:
+            v = values[field[name]]
+            if v < lo[name][pos]:
+                lo[name][pos] = v
+            if v > hi[name][pos]:
+                hi[name][pos] = v
+        self.frames += 1
+        return True
+
+    def _advance(self, col: int) -> None:
+        """Przejście do kolumny col; pominięte kolumny (przerwa) zostają puste."""
+        w = self.width
+        self._dirty.add(self._col % w)
+        if col - self._col >= w:
+            first = col - w + 1
+            self._full = True
+        else:
+            first = self._col + 1
+        for c in range(first, col + 1):
+            pos = c % w
+            for name in self._series:
+                self._lo[name][pos] = float("inf")
+                self._hi[name][pos] = float("-inf")
+            self._dirty.add(pos)
+        self._col = col
+
+    def message(self, text: str) -> None:
+        """Tekst do wiersza komunikatu pod wykresem (np. odpowiedź ACK)."""
+        self._message = text
+        if not self.live:
+            self.out.write(text + "\n")
+
+    # --- rysowanie ---
+
+    def tick(self, now: Optional[float] = None) -> None:
+        """Odświeża ekran, jeśli minął okres refresh (tanie, gdy nie minął)."""
+        if now is None:
+            now = time.monotonic()
+        if now >= self._next:
+            self.render(now)
+
+    def render(self, now: Optional[float] = None) -> None:
+        """Przerysowuje zmienione kolumny (albo cały wykres po zmianie osi)."""
+        if now is None:
+            now = time.monotonic()
+        # czas płynie także bez danych – przerwa w telemetrii jest widoczna
+        col = int((now - self._t0) / self.column)
+        if col > self._col:
+            self._advance(col)
+        w = self.width
+        cur = self._col % w
+        self._dirty.add(cur)
+        self._dirty.add((cur + 1) % w)
+        self._update_ranges(self._dirty)
+        self._next = now + self.refresh
+
+        if self.live:
+            if self._full or not self._drawn:
+                self._draw_full()
+            else:
+                self._draw_columns(sorted(self._dirty))
+                for r, text in ((0, self._header()), (self._rows - 2, self._message),
+                                (self._rows - 1, self._footer())):
+                    self._write_row(r, text)
+            self.out.flush()
+        self._dirty.clear()
+        self._full = False
+
+    def close(self) -> None:
+        """Koniec wykresu: kursor pod wykresem; poza terminalem – wypisanie wykresu."""
+        if not self.live:
+            self._update_ranges(range(self.width))
+            self.out.write("\n".join(self.frame()) + "\n")
+        self.out.flush()
+
+    def frame(self) -> List[str]:
+        """Cały wykres jako lista wierszy tekstu (bez sekwencji ANSI)."""
+        rows = [self._header()]
+        columns = [self._column(p, pos) for p in range(len(self.panels))
+                   for pos in range(self.width)]
+        w = self.width
+        for p, (names, h) in enumerate(self.panels):
+            cols = columns[p * w:(p + 1) * w]
+            for r in range(h):
+                rows.append(self._label(p, r) + "".join(c[r] for c in cols))
+        rows.append(self._message)
+        rows.append(self._footer())
+        return rows
+
+    def _update_ranges(self, positions) -> None:
+        """Rozszerza zakresy osi Y, jeśli nowe wartości z nich wychodzą."""
+        for p, (names, _) in enumerate(self.panels):
+            lo = min((self._lo[n][pos] for n in names for pos in positions), default=float("inf"))
+            hi = max((self._hi[n][pos] for n in names for pos in positions), default=float("-inf"))
+            if lo > hi:
+                continue
+            rng = self._range[p]
+            if rng is not None and rng[0] <= lo and hi <= rng[1]:
+                continue
+            if rng is not None:
+                lo, hi = min(lo, rng[0]), max(hi, rng[1])
+            # zapas 25%, żeby oś nie zmieniała się przy każdym drobnym wyjściu
+            pad = max((hi - lo) * 0.25, 0.5)
+            self._range[p] = (lo - pad, hi + pad)
+            self._full = True
+
+    def _column(self, p: int, pos: int) -> List[str]:
+        """Znaki jednej kolumny panelu p (od góry)."""
+        names, h = self.panels[p]
+        cells = [" "] * h
+        rng = self._range[p]
+        if rng is None or pos == (self._col + 1) % self.width:
+            # kolumna za bieżącą pozostaje pusta – widać, gdzie jest "pióro"
+            return cells
+        y0, y1 = rng
+        scale = (h - 1) / (y1 - y0)
+        if y0 < 0 < y1:
+            cells[int((y1 - 0.0) * scale + 0.5)] = "."
+        for name in names:
+            lo, hi = self._lo[name][pos], self._hi[name][pos]
+            if lo > hi:
+                continue
+            r_top = int((y1 - hi) * scale + 0.5)
+            r_bot = int((y1 - lo) * scale + 0.5)
+            ch = SERIES_CHARS[name]
+            for r in range(max(0, r_top), min(h - 1, r_bot) + 1):
+                cells[r] = ch
+        return cells
+
+    def _label(self, p: int, r: int) -> str:
+        names, h = self.panels[p]
+        rng = self._range[p]
+        if rng is not None and r == 0:
+            text = f"{rng[1]:.1f}"
+        elif rng is not None and r == h - 1:
+            text = f"{rng[0]:.1f}"
+        elif r == h // 2:
+            text = "/".join(names)
+        else:
+            text = ""
+        return f"{text[:_LABEL - 1]:>{_LABEL - 1}}|"
+
+    def _header(self) -> str:
+        legend = "  ".join(f"{SERIES_CHARS[n]} {n}" for n in self._series)
+        text = (f"{legend}   kolumna {self.column:g} s, okno {self.width * self.column:g} s, "
+                f"TEL {self.frames}")
+        if self.bad:
+            text += f", błędne {self.bad}"
+        return text
+
+    def _footer(self) -> str:
+        return self.footer() if self.footer is not None else ""
+
+    def _draw_full(self) -> None:
+        out = self.out
+        if self._drawn:
+            out.write(f"\033[{self._rows}A\r")
+        cols = shutil.get_terminal_size().columns
+        for row in self.frame():
+            out.write(row[:cols - 1] + "\033[K\n")
+        self._drawn = True
+        self.redraws += 1
+
+    def _draw_columns(self, positions) -> None:
+        """Przerysowuje wybrane kolumny wszystkich paneli (kursor wraca pod wykres)."""
+        parts = []
+        top = 1
+        for p, (_, h) in enumerate(self.panels):
+            up = self._rows - top
+            for pos in positions:
+                cells = self._column(p, pos)
+                # na górę kolumny, potem znak po znaku w dół (znak, w lewo, w dół)
+                parts.append(f"\033[{up}A\033[{_LABEL + pos + 1}G")
+                parts.append("\033[D\033[B".join(cells))
+                parts.append(f"\033[{up - h + 1}B\r")
+            top += h
+        self.out.write("".join(parts))
+
+    def _write_row(self, r: int, text: str) -> None:
+        up = self._rows - r
+        cols = shutil.get_terminal_size().columns
+        self.out.write(f"\033[{up}A\r{text[:cols - 1]}\033[K\033[{up}B\r")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Priorytetowe zatrzymanie regulatora.
+
+STOP (albo B) jest komendą bezpieczeństwa, więc nie może czekać za
+ramkami TARGET / PID zalegającymi w kolejce wysyłania ani w RxBudgetPacer:
+- SerialTransport.write_priority() zapisuje ramkę od razu, a ramki
+  czekające jeszcze w kolejce wysyłania porzuca – TEST / START wpisane
+  przed STOP nie uruchomią regulatora po nim (write_line() robi to sam
+  dla STOP / B),
+- send_stop() powtarza ramkę co retry sekund (także po NACK, np.
+  CRC_FAIL przy zakłóceniu), aż przyjdzie ACK albo minie timeout;
+  odpowiedzi należne ramkom wysłanym wcześniej (SerialTransport.in_flight
+  w chwili pierwszego zapisu STOP) przychodzą przed ACK na STOP,
+  więc są pomijane; jeśli przez retry sekund nic nie przyszło,
+  uznajemy je za zaginione i w kolejnych próbach już nie pomijamy,
+- StopResult podaje zmierzony czas od pierwszego zapisu STOP do ACK
+  i od ostatniej próby do ACK.
+
+Powtórzony STOP jest nieszkodliwy (firmware odpowiada ACK w każdym
+trybie), a ACK-i spóźnionych prób porzuca reset_input() wywołującego.
+
+Przykład:
+    res = send_stop(x)
+    print(res.format())    # 'STOP: ACK po 14 ms (prób: 1)'
+"""
+
+from __future__ import annotations
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from dispatch import ACK, Message, read_reply
+from protocol import to_frame
+
+DEBUG = False
+
+
+@dataclass
+class StopResult:
+    """
+    Wynik send_stop().
+
+    Atrybuty:
+        frame    : wysyłana ramka (z CRC),
+        acked    : czy przyszło ACK,
+        attempts : liczba wysłanych ramek,
+        latency  : czas od pierwszego zapisu do ACK (s), None bez ACK,
+        last     : czas od ostatniej próby do ACK (s),
+        reply    : ostatnia odpowiedź inna niż ACK (np. 'NACK(CRC_FAIL)'),
+        elapsed  : całkowity czas send_stop() (s).
+    """
+    frame: str
+    acked: bool = False
+    attempts: int = 0
+    latency: Optional[float] = None
+    last: Optional[float] = None
+    reply: Optional[str] = None
+    elapsed: float = 0.0
+
+    def format(self) -> str:
+        cmd = self.frame.partition("|")[0]
+        if self.acked:
+            text = f"{cmd}: ACK po {self.latency * 1e3:.0f} ms (prób: {self.attempts}"
+            if self.attempts > 1:
+                text += f", ostatnia {self.last * 1e3:.0f} ms"
+            return text + ")"
+        text = f"{cmd}: brak ACK po {self.elapsed:.1f} s (prób: {self.attempts}"
+        if self.reply is not None:
+            text += f", ostatnio {self.reply}"
+        return text + ")"
+
+
+def send_stop(x, cmd: str = "STOP", timeout: float = 2.0, retry: float = 0.25,
+              on_other: Optional[Callable[[Message], None]] = None) -> StopResult:
+    """
+    Wysyła STOP ścieżką priorytetową i powtarza go do potwierdzenia.
+
+    Parametry:
+        x        : otwarty SerialTransport (odczyt w tym wątku – read_line()),
+        cmd      : komenda ('STOP' albo 'B'; może być gotową ramką z CRC),
+        timeout  : łączny czas na ACK,
+        retry    : po tylu sekundach bez ACK ramka jest wysyłana ponownie,
+        on_other : linie odebrane po drodze (TEL, MAE, READY).
+    """
+    result = StopResult(to_frame(cmd))
+    # liczba odpowiedzi do pominięcia – odczytywana pod blokadą zapisu,
+    # tuż przed wysłaniem pierwszego STOP
+    owed = []
+    start = time.monotonic()
+    end = start + timeout
+    while True:
+        sent = time.monotonic()
+        if sent >= end:
+            break
+        x.write_priority(result.frame, None if owed else lambda: owed.append(x.in_flight))
+        result.attempts += 1
+        attempt_end = min(sent + retry, end)
+        while True:
+            remaining = attempt_end - time.monotonic()
+            if remaining <= 0:
+                break
+            msg = read_reply(x, remaining, on_other)
+            if msg is None:
+                owed[0] = 0
+                break
+            if owed[0] > 0:
+                # odpowiedź na ramkę wysłaną przed STOP
+                owed[0] -= 1
+                if DEBUG:
+                    print(f"[STOP] skipped earlier reply {msg.line}")
+                continue
+            if msg.kind == ACK:
+                now = time.monotonic()
+                result.acked = True
+                result.latency = now - start
+                result.last = now - sent
+                result.elapsed = result.latency
+                return result
+            if DEBUG:
+                print(f"[STOP] reply {msg.line}")
+            result.reply = msg.line
+            # NACK na tę próbę – ponawiamy od razu, bez czekania na retry
+            break
+    result.elapsed = time.monotonic() - start
+    return result
@@ -8,6 +8,10 @@ Główne zadania:
 - policzenie CRC z payloadu (sumowanie bajtów ASCII & 0xFF),
 - doklejenie CRC do payloadu w formacie "PAYLOAD|CRC",
 - prosta normalizacja tekstu,
+- zamiana komendy na ramkę (to_frame),
+- typ komendy z ramki, np. 'TARGET(26.5)|E3' -> 'TARGET' (command_kind),
+- rozbiór linii telemetrii TEL;dist=..;sp=..;err=..;out=.. (parse_telemetry),
+- odczyt wyniku MAE=.. po przebiegu START (parse_mae),
 - funkcja pomocnicza do ręcznego debugowania CRC.
 
 Przykład:
@@ -15,8 +19,20 @@ Przykład:
     'PING|B0'   # (CRC zależy od sumy kodów ASCII)
 """
 
+from typing import Optional, Tuple
+
 DEBUG = False
 
+# kolejność pól w linii telemetrii wysyłanej przez firmware (run_test_mode)
+TEL_PREFIX = "TEL;"
+TEL_FIELDS = ("dist", "sp", "err", "out")
+
+# wynik przebiegu START (run_hold_mode)
+MAE_PREFIX = "MAE="
+
+# komunikat wypisywany przez setup() po starcie / resecie płytki
+READY_LINE = "READY"
+
 
 def compute_crc(payload: str) -> int:
     """
@@ -71,6 +87,70 @@ def normalize(s: str) -> str:
     return s.strip()
 
 
+def to_frame(cmd: str) -> str:
+    """
+    Zamienia wpisaną komendę na ramkę gotową do wysłania.
+
+    - komenda jest normalizowana (normalize()),
+    - jeśli nie zawiera jeszcze separatora CRC '|', doklejamy CRC (add_crc()),
+    - w przeciwnym razie zakładamy, że użytkownik podał ramkę ręcznie.
+    """
+    payload = normalize(cmd)
+    if "|" not in payload:
+        payload = add_crc(payload)
+    return payload
+
+
+def command_kind(frame: str) -> str:
+    """Typ komendy z ramki: 'TARGET(26.5)|E3' -> 'TARGET'."""
+    payload = frame.partition("|")[0]
+    return payload.partition("(")[0].strip().upper() or "?"
+
+
+def parse_telemetry(line: str) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Rozbiera linię telemetrii na wartości liczbowe.
+
+    Przykład:
+        >>> parse_telemetry("TEL;dist=25.8;sp=26.5;err=0.7;out=4.2")
+        (25.8, 26.5, 0.7, 4.2)
+
+    Zwraca None, jeśli linia nie jest kompletną linią TEL
+    (inna odpowiedź, ucięta linia, zła nazwa pola, niepoprawna liczba).
+    """
+    if not line.startswith(TEL_PREFIX):
+        return None
+    parts = line[len(TEL_PREFIX):].split(";")
+    if len(parts) != len(TEL_FIELDS):
+        return None
+
+    values = []
+    for part, name in zip(parts, TEL_FIELDS):
+        key, sep, val = part.partition("=")
+        if key != name or not sep:
+            return None
+        try:
+            values.append(float(val))
+        except ValueError:
+            return None
+    return tuple(values)
+
+
+def parse_mae(line: str) -> Optional[float]:
+    """
+    Odczytuje wynik z linii MAE=...
+
+    Zwraca None, jeśli linia nie jest linią MAE; wartości, których
+    nie da się zamienić na liczbę (np. "ovf" z Serial.print), dają nan.
+    """
+    if not line.startswith(MAE_PREFIX):
+        return None
+    try:
+        return float(line[len(MAE_PREFIX):])
+    except ValueError:
+        return float("nan")
+
+
 def crc_debug(payload: str) -> None:
     """
     Wypisuje na stdout payload, CRC i finalną ramkę.
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Automatyczne ponowne łączenie z portem po błędzie (np. chwilowy zanik USB).
+
+Klasa ReconnectingTransport (podklasa SerialTransport, zamiennik 1:1):
+- błąd portu w read_line() / write_line() / write_lines() powoduje
+  zamknięcie portu i ponowne otwieranie z wykładniczo rosnącą
+  przerwą (backoff_initial, 2x, 4x, ... do backoff_max),
+- zapamiętuje ostatnie ZERO(...), TARGET(...) i PID(...) potwierdzone
+  przez firmware (ACK – odpowiedzi są przypisywane do wysłanych ramek
+  w kolejności, NACK nie zmienia stanu); gdy firmware zgłosi READY (prawdziwy reset – zerowanie zmiennych
+  globalnych), stan jest wysyłany ponownie, a odpowiedzi ACK na te
+  ramki są połykane, żeby nie pomylić wywołującego,
+- razem z reset_on_open=False ponowne połączenie nie resetuje
+  Arduino, więc trwa tyle, co samo otwarcie portu.
+
+Przykład:
+    x = ReconnectingTransport("/dev/ttyACM0", reset_on_open=False,
+                              on_event=lambda msg: print(msg))
+    x.open()
+"""
+
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass, field
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional
+
+from transport import REPLY_MAX_AGE, SerialTransport
+from dispatch import ACK, NACK, classify
+from protocol import READY_LINE, command_kind, to_frame
+
+DEBUG = False
+
+# komendy ustawiające stan firmware'u – w kolejności ponownego wysyłania
+STATE_COMMANDS = ("ZERO", "TARGET", "PID")
+
+# błędy portu, po których próbujemy połączyć się ponownie (SerialException
+# dziedziczy po IOError; RuntimeError zgłasza transport, np. po awarii wątku
+# czytającego)
+_PORT_ERRORS = (OSError, RuntimeError)
+
+
+@dataclass
+class ReconnectingTransport(SerialTransport):
+    """
+    SerialTransport z automatycznym ponownym łączeniem.
+
+    Atrybuty (oprócz tych z SerialTransport):
+        backoff_initial : przerwa przed drugą próbą otwarcia (s),
+        backoff_max     : maksymalna przerwa między próbami (s),
+        max_attempts    : limit prób na jedno zerwanie (None = bez limitu),
+        restore_state   : ponowne wysłanie ZERO/TARGET/PID po resecie,
+        on_event        : wywoływane z komunikatem tekstowym (zerwanie,
+                          ponowne połączenie, przywrócenie stanu),
+        state           : ostatnie potwierdzone (ACK) komendy ZERO/TARGET/PID
+                          (payload),
+        reconnects      : liczba udanych ponownych połączeń.
+    """
+    backoff_initial: float = 0.1
+    backoff_max: float = 5.0
+    max_attempts: Optional[int] = None
+    restore_state: bool = True
+    on_event: Optional[Callable[[str], None]] = field(default=None, repr=False)
+    state: Dict[str, str] = field(default_factory=dict)
+    reconnects: int = 0
+    _swallow: int = field(default=0, repr=False)
+    # wysłane ramki czekające na odpowiedź: (czas wysłania, payload)
+    _sent: deque = field(default_factory=deque, repr=False)
+    _sent_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _closed: bool = field(default=True, repr=False)
+
+    def open(self) -> None:
+        # open() czeka na READY przez read_line(), więc po resecie płytki
+        # stan jest przywracany już tutaj
+        self._swallow = 0
+        with self._sent_lock:
+            self._sent.clear()
+        super().open()
+        self._closed = False
+
+    def close(self) -> None:
+        self._closed = True
+        super().close()
+
+    def write_line(self, line: str) -> None:
+        if self.priority and command_kind(line) in self.priority:
+            self.write_priority(line)
+            return
+        self._track((line,))
+        try:
+            super().write_line(line)
+        except _PORT_ERRORS as e:
+            # open() w reconnect() czyści listę wysłanych ramek
+            self._recover(e)
+            self._track((line,))
+            super().write_line(line)
+
+    def write_priority(self, line: str,
+                       before: Optional[Callable[[], None]] = None) -> list:
+        self._track((line,))
+        try:
+            dropped = super().write_priority(line, before)
+        except _PORT_ERRORS as e:
+            self._recover(e)
+            self._track((line,))
+            dropped = super().write_priority(line, before)
+        # porzucone ramki nie zostaną wysłane – nie czekamy na ich odpowiedź
+        for frame in dropped:
+            self._untrack(frame)
+        return dropped
+
+    def write_lines(self, lines) -> None:
+        lines = list(lines)
+        self._track(lines)
+        try:
+            super().write_lines(lines)
+        except _PORT_ERRORS as e:
+            self._recover(e)
+            self._track(lines)
+            super().write_lines(lines)
+
+    def read_line(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Jak SerialTransport.read_line(); po zerwaniu połączenia łączy się
+        ponownie i zwraca None (jak przy braku danych).
+
+        Linia READY jest przekazywana wywołującemu (po przywróceniu stanu),
+        odpowiedzi na ramki przywracające stan – nie. ACK na ZERO / TARGET
+        / PID aktualizuje state.
+        """
+        timeout = self._resolve_timeout(timeout)
+        end = time.monotonic() + timeout
+        while True:
+            try:
+                line = super().read_line(timeout=max(end - time.monotonic(), 0.0))
+            except _PORT_ERRORS as e:
+                self._recover(e)
+                return None
+            if line is None:
+                return None
+            if line.startswith(READY_LINE):
+                # reset: ramki wysłane wcześniej nie dostaną już odpowiedzi
+                with self._sent_lock:
+                    self._sent.clear()
+                self._on_reset()
+                return line
+            msg = classify(line)
+            if not msg.is_reply:
+                return line
+            if self._swallow:
+                self._swallow -= 1
+                if msg.kind == NACK:
+                    self._notify(f"przywracanie stanu: {line}")
+                continue
+            self._confirm(msg.kind)
+            return line
+
+    def reconnect(self) -> None:
+        """
+        Zamyka port i otwiera go ponownie, z wykładniczo rosnącą przerwą
+        między nieudanymi próbami. Po resecie płytki (READY w open())
+        stan jest przywracany.
+        """
+        try:
+            # sam port – plik capture (jeśli włączony) zapisuje dalej
+            self._close_port()
+        except Exception:
+            pass
+
+        delay = self.backoff_initial
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.open()
+                break
+            except Exception as e:
+                if self.max_attempts is not None and attempt >= self.max_attempts:
+                    self._closed = True
+                    raise
+                self._notify(f"ponowne otwarcie {self.port} nieudane ({e}), "
+                             f"kolejna próba za {delay:.1f} s")
+                time.sleep(delay)
+                delay = min(delay * 2.0, self.backoff_max)
+
+        self.reconnects += 1
+        self._notify(f"połączono ponownie z {self.port} (próba {attempt})")
+
+    def _recover(self, error: BaseException) -> None:
+        """Obsługa błędu portu: ponowne łączenie albo przekazanie błędu dalej."""
+        if self._closed:
+            raise error
+        self._notify(f"błąd portu {self.port}: {error}")
+        self.reconnect()
+
+    def _track(self, frames: Iterable[str]) -> None:
+        """Dopisuje wysłane ramki do kolejki czekających na odpowiedź."""
+        now = time.monotonic()
+        with self._sent_lock:
+            for frame in frames:
+                self._sent.append((now, frame.partition("|")[0].strip()))
+
+    def _untrack(self, frame: str) -> None:
+        """Usuwa ramkę, która nie zostanie wysłana (najnowszy wpis)."""
+        payload = frame.partition("|")[0].strip()
+        with self._sent_lock:
+            for i in range(len(self._sent) - 1, -1, -1):
+                if self._sent[i][1] == payload:
+                    del self._sent[i]
+                    return
+
+    def _coalesced(self, old: str, new: str) -> None:
+        # nowa ramka (dopisana na końcu przez _track) zajmuje w kolejce
+        # miejsce zastąpionej
+        self._untrack(new)
+        payload = old.partition("|")[0].strip()
+        with self._sent_lock:
+            for i in range(len(self._sent) - 1, -1, -1):
+                t, p = self._sent[i]
+                if p == payload:
+                    self._sent[i] = (t, new.partition("|")[0].strip())
+                    break
+        super()._coalesced(old, new)
+
+    def _confirm(self, kind: str) -> None:
+        """Odpowiedź kind dotyczy najstarszej wysłanej ramki; ACK zapisuje stan."""
+        sent = self._sent
+        # ramki bez odpowiedzi (jak w SerialTransport.in_flight)
+        limit = time.monotonic() - REPLY_MAX_AGE
+        with self._sent_lock:
+            while sent and sent[0][0] < limit:
+                sent.popleft()
+            if not sent:
+                return
+            _, payload = sent.popleft()
+        cmd = command_kind(payload)
+        if kind == ACK and cmd in STATE_COMMANDS:
+            self.state[cmd] = payload
+
+    def _on_reset(self) -> None:
+        """Firmware zgłosił READY: zmienne mają wartości domyślne – przywracamy stan."""
+        if not self.restore_state or not self.state:
+            return
+        frames = [to_frame(self.state[k]) for k in STATE_COMMANDS if k in self.state]
+        super().write_lines(frames)
+        self._swallow += len(frames)
+        self._notify("przywrócono stan po resecie: " + ", ".join(frames))
+
+    def _notify(self, message: str) -> None:
+        if DEBUG:
+            print(f"[RECONNECT] {message}")
+        if self.on_event is not None:
+            self.on_event(message)
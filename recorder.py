@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Zapis telemetrii do binarnego, kolumnowego formatu na dysku.
+
+Format sesji (katalog, np. 'strojenie.tel/'):
+- meta.json      : nagłówek – wersja formatu, lista kolumn z typami,
+                   czas ścienny początku sesji i lista segmentów,
+- t.bin          : czas odbioru w sekundach od początku sesji (float64),
+- dist.bin, sp.bin, err.bin, out.bin : wartości z linii TEL (float32).
+
+Każda kolumna to "goła" tablica little-endian o stałej szerokości,
+więc dopisywanie jest zwykłym dopisaniem bajtów na koniec pliku,
+a odczyt może mapować pliki w pamięci bez kopiowania (logreader.py).
+Liczba zapisanych wierszy = najkrótsza kolumna (ucięty zapis
+po awarii nie psuje reszty).
+
+Sesję można kontynuować (ponowne --record z tym samym katalogiem, też
+w innym procesie albo po restarcie systemu). Zegar monotoniczny nie jest
+wtedy porównywalny z poprzednim, więc każde otwarcie dopisuje segment:
+{"row": pierwszy wiersz, "t": czas sesji na starcie segmentu,
+"t0_wall": czas ścienny na starcie}. Czas sesji w nowym segmencie rusza
+od czasu ściennego, jaki upłynął od początku sesji, ale nigdy nie
+mniej niż ostatnia zapisana próbka – kolumna t pozostaje rosnąca.
+Sesje w wersji 1 (t = time.monotonic()) można czytać, ale nie dopisywać.
+
+Klasa TelemetryRecorder:
+- parsuje linie TEL (protocol.parse_telemetry),
+- trzyma wiersze w prealokowanych tablicach NumPy (po jednej na kolumnę),
+- zrzuca je na dysk dużymi blokami (block_rows wierszy naraz).
+
+Wymaga biblioteki numpy.
+"""
+
+from __future__ import annotations
+import json
+import os
+import time
+from typing import Optional
+
+from protocol import parse_telemetry
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+DEBUG = False
+
+FORMAT_NAME = "iss-telemetry"
+FORMAT_VERSION = 2
+# wersje obsługiwane przez read_meta() (1: t = time.monotonic(), bez segmentów)
+READ_VERSIONS = (1, 2)
+
+# (nazwa kolumny, typ NumPy) – kolejność jak w linii TEL, na początku czas
+COLUMNS = (
+    ("t", "<f8"),
+    ("dist", "<f4"),
+    ("sp", "<f4"),
+    ("err", "<f4"),
+    ("out", "<f4"),
+)
+
+META_FILE = "meta.json"
+
+
+def column_path(path: str, name: str) -> str:
+    """Ścieżka pliku z daną kolumną w katalogu sesji."""
+    return os.path.join(path, f"{name}.bin")
+
+
+def read_meta(path: str) -> dict:
+    """Wczytuje i sprawdza nagłówek sesji."""
+    with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_NAME:
+        raise ValueError(f"not a telemetry session: {path}")
+    if meta.get("version") not in READ_VERSIONS:
+        raise ValueError(f"unsupported telemetry format version: {meta.get('version')}")
+    return meta
+
+
+class TelemetryRecorder:
+    """
+    Nagrywanie telemetrii do katalogu sesji.
+
+    Atrybuty:
+        path         : katalog sesji (tworzony, jeśli nie istnieje;
+                       istniejąca sesja jest kontynuowana w nowym segmencie),
+        block_rows   : liczba wierszy buforowanych przed zapisem na dysk,
+        rows_written : wiersze już zapisane na dysku,
+        rejected     : linie odrzucone (nie-TEL, ucięte, błędne).
+
+    Przykład:
+        with TelemetryRecorder("sesja.tel") as rec:
+            for line in transport.iter_lines():
+                rec.add_line(line)
+    """
+
+    def __init__(self, path: str, block_rows: int = 8192) -> None:
+        if np is None:
+            raise RuntimeError("numpy not available")
+        if block_rows < 1:
+            raise ValueError("block_rows must be >= 1")
+
+        self.path = path
+        self.block_rows = block_rows
+        self.rows_written = 0
+        self.rejected = 0
+
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+        wall, mono = time.time(), time.monotonic()
+        if os.path.exists(meta_path):
+            meta = read_meta(path)
+            if meta["version"] != FORMAT_VERSION:
+                raise ValueError(f"cannot append to format version {meta['version']} session: {path}")
+            if [tuple(c) for c in meta["columns"]] != list(COLUMNS):
+                raise ValueError(f"column layout mismatch in {path}")
+        else:
+            meta = {
+                "format": FORMAT_NAME,
+                "version": FORMAT_VERSION,
+                "columns": [list(c) for c in COLUMNS],
+                "t0_wall": wall,
+                "segments": [],
+            }
+
+        self._bufs = [np.empty(block_rows, dtype=dtype) for _, dtype in COLUMNS]
+        self._n = 0
+        self._files = [open(column_path(path, name), "ab") for name, _ in COLUMNS]
+        # wyrównujemy kolumny do pełnych wierszy (ucięty zapis z poprzedniej sesji)
+        self.rows_written = min(
+            os.path.getsize(column_path(path, name)) // np.dtype(dtype).itemsize
+            for name, dtype in COLUMNS
+        )
+        for f, (_, dtype) in zip(self._files, COLUMNS):
+            f.truncate(self.rows_written * np.dtype(dtype).itemsize)
+
+        # nowy segment: czas sesji = _base + (time.monotonic() - _mono0)
+        base = max(0.0, wall - meta["t0_wall"])
+        if self.rows_written:
+            t_dtype = np.dtype(COLUMNS[0][1])
+            last = np.fromfile(column_path(path, "t"), dtype=t_dtype,
+                               offset=(self.rows_written - 1) * t_dtype.itemsize)
+            base = max(base, float(last[0]))
+        self._base, self._mono0 = base, mono
+        meta["segments"].append({"row": self.rows_written, "t": base, "t0_wall": wall})
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    def add_line(self, line: str, t: Optional[float] = None) -> bool:
+        """
+        Dodaje linię telemetrii; t – czas odbioru (domyślnie time.monotonic()).
+
+        Zwraca False (i zwiększa rejected), jeśli linia nie jest poprawną linią TEL.
+        """
+        values = parse_telemetry(line)
+        if values is None:
+            self.rejected += 1
+            return False
+        self.add(time.monotonic() if t is None else t, *values)
+        return True
+
+    def add(self, t: float, dist: float, sp: float, err: float, out: float) -> None:
+        """
+        Dodaje jeden wiersz już sparsowanych wartości;
+        t – czas odbioru (time.monotonic()), zapisywany jako czas sesji.
+        """
+        i = self._n
+        bt, bd, bs, be, bo = self._bufs
+        bt[i] = self._base + (t - self._mono0)
+        bd[i] = dist
+        bs[i] = sp
+        be[i] = err
+        bo[i] = out
+        self._n = i + 1
+        if self._n == self.block_rows:
+            self.flush()
+
+    @property
+    def rows(self) -> int:
+        """Wszystkie wiersze: zapisane i czekające w buforze."""
+        return self.rows_written + self._n
+
+    def flush(self) -> None:
+        """Zapisuje zbuforowane wiersze na koniec plików kolumn."""
+        n = self._n
+        if n:
+            for f, buf in zip(self._files, self._bufs):
+                f.write(buf[:n].tobytes())
+            self.rows_written += n
+            self._n = 0
+            if DEBUG:
+                print(f"[REC] flushed {n} rows to {self.path}")
+        for f in self._files:
+            f.flush()
+
+    def close(self) -> None:
+        """Zapisuje resztę bufora i zamyka pliki."""
+        if not self._files:
+            return
+        try:
+            self.flush()
+        finally:
+            for f in self._files:
+                f.close()
+            self._files = []
+
+    def __enter__(self) -> "TelemetryRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
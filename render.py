@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Wyświetlanie telemetrii z ograniczoną częstotliwością odświeżania.
+
+Przy szybkiej telemetrii wypisywanie każdej linii (print("<-", line))
+zapycha terminal – to on staje się wąskim gardłem i wstrzymuje odczyt
+z portu. StatusRenderer:
+- przyjmuje każdą linię (on_line()) – tylko parsowanie i kilka porównań,
+- co refresh sekund (tick()) rysuje w miejscu jedną linię stanu albo
+  małą tabelę: ostatnia wartość oraz min / średnia / max każdego pola
+  z okna od poprzedniego odświeżenia (decymacja – skoki nie znikają),
+- linie inne niż TEL (ACK, NACK, MAE=..., READY) wypisuje od razu
+  nad linią stanu,
+- poza terminalem (przekierowanie do pliku) wypisuje jedną linię
+  podsumowania na okno zamiast rysowania w miejscu.
+
+Interfejs start() / on_line() / tick() / close() wykorzystuje
+cli.follow_telemetry(view=...); w REPL: python cli.py COMx --render table.
+"""
+
+from __future__ import annotations
+import shutil
+import sys
+import time
+from typing import Callable, List, Optional, TextIO
+
+from protocol import TEL_FIELDS, TEL_PREFIX, parse_telemetry
+
+DEBUG = False
+
+RENDER_MODES = ("line", "table")
+
+
+class WindowStats:
+    """Min / max / suma wartości pól TEL w bieżącym oknie odświeżania."""
+
+    __slots__ = ("width", "n", "last", "min", "max", "sum")
+
+    def __init__(self, width: int = len(TEL_FIELDS)) -> None:
+        self.width = width
+        self.last: List[float] = [float("nan")] * width
+        self.reset()
+
+    def reset(self) -> None:
+        """Nowe okno (ostatnie wartości zostają)."""
+        self.n = 0
+        self.min = [float("inf")] * self.width
+        self.max = [float("-inf")] * self.width
+        self.sum = [0.0] * self.width
+
+    def add(self, values) -> None:
+        mn, mx, sm = self.min, self.max, self.sum
+        for i, v in enumerate(values):
+            if v < mn[i]:
+                mn[i] = v
+            if v > mx[i]:
+                mx[i] = v
+            sm[i] += v
+        self.last = values
+        self.n += 1
+
+    def mean(self, i: int) -> float:
+        return self.sum[i] / self.n if self.n else float("nan")
+
+
+class StatusRenderer:
+    """
+    Podgląd telemetrii odświeżany w miejscu ze stałą częstotliwością.
+
+    Parametry:
+        refresh : okres odświeżania (s), np. 0.2 = 5 Hz,
+        mode    : "line" – jedna linia stanu, "table" – tabela pól,
+        out     : strumień wyjściowy (domyślnie sys.stdout),
+        live    : rysowanie w miejscu (domyślnie: gdy out to terminal),
+        footer  : opcjonalna funkcja zwracająca dodatkową linię
+                  (np. TelemetryMonitor.status) – w trybie "table".
+
+    Atrybuty:
+        frames : liczba poprawnych linii TEL od start(),
+        bad    : liczba linii TEL, których nie udało się rozebrać,
+        renders: liczba odświeżeń.
+    """
+
+    def __init__(self, refresh: float = 0.2, mode: str = "line", out: Optional[TextIO] = None,
+                 live: Optional[bool] = None,
+                 footer: Optional[Callable[[], str]] = None) -> None:
+        if refresh <= 0:
+            raise ValueError("refresh must be > 0")
+        if mode not in RENDER_MODES:
+            raise ValueError(f"unknown render mode: {mode!r}")
+        self.refresh = refresh
+        self.mode = mode
+        self.out = out or sys.stdout
+        self.live = self.out.isatty() if live is None else live
+        self.footer = footer
+        self.start()
+
+    def start(self, now: Optional[float] = None) -> None:
+        """Początek podglądu (nowa sesja TEST)."""
+        self.window = WindowStats()
+        self.frames = 0
+        self.bad = 0
+        self.renders = 0
+        self._t_window = time.monotonic() if now is None else now
+        self._next = self._t_window + self.refresh
+        self._drawn = 0  # liczba linii ekranu zajętych przez ostatni rysunek
+
+    def on_line(self, line: str, t: Optional[float] = None) -> bool:
+        """
+        Przyjmuje odebraną linię. Zwraca True dla poprawnej linii TEL.
+
+        Inne linie są wypisywane od razu (nad linią stanu).
+        """
+        if line.startswith(TEL_PREFIX):
+            values = parse_telemetry(line)
+            if values is not None:
+                self.window.add(values)
+                self.frames += 1
+                return True
+            self.bad += 1
+            return False
+        self.message(f"<- {line}")
+        return False
+
+    def message(self, text: str) -> None:
+        """Wypisuje tekst nad linią stanu (która jest potem rysowana ponownie)."""
+        out = self.out
+        self._erase()
+        out.write(text + "\n")
+        if self.live and self.renders:
+            self._draw(self._rows(time.monotonic()))
+        out.flush()
+
+    def tick(self, now: Optional[float] = None) -> None:
+        """Odświeża podgląd, jeśli minął okres refresh (tanie, gdy nie minął)."""
+        if now is None:
+            now = time.monotonic()
+        if now < self._next:
+            return
+        self.render(now)
+
+    def render(self, now: Optional[float] = None) -> None:
+        """Rysuje podgląd dla bieżącego okna i zaczyna nowe okno."""
+        if now is None:
+            now = time.monotonic()
+        if self.live:
+            self._erase()
+            self._draw(self._rows(now))
+        elif self.window.n:
+            # poza terminalem: jedna linia na okno
+            self.out.write(self._line(now) + "\n")
+        self.out.flush()
+        self.renders += 1
+        self.window.reset()
+        self._t_window = now
+        self._next = now + self.refresh
+
+    def close(self) -> None:
+        """Koniec podglądu: ostatni stan zostaje na ekranie, kursor w nowej linii."""
+        if self.live and self._drawn:
+            self.out.write("\n")
+            self.out.flush()
+        self._drawn = 0
+
+    def _rows(self, now: float) -> List[str]:
+        if self.mode == "line":
+            return [self._line(now)]
+        return self._table(now)
+
+    def _line(self, now: float) -> str:
+        w = self.window
+        parts = [f"TEL {self.frames} (+{w.n}/{now - self._t_window:.1f} s)"]
+        for i, name in enumerate(TEL_FIELDS):
+            if w.n:
+                parts.append(f"{name} {w.last[i]:.2f} [{w.min[i]:.2f}..{w.max[i]:.2f}]")
+            else:
+                parts.append(f"{name} {w.last[i]:.2f}")
+        if self.bad:
+            parts.append(f"błędne {self.bad}")
+        return " | ".join(parts)
+
+    def _table(self, now: float) -> List[str]:
+        w = self.window
+        rows = [f"{'':<6}{'ostatnia':>10}{'min':>10}{'średnia':>10}{'max':>10}   "
+                f"okno {now - self._t_window:.2f} s: {w.n} TEL, razem {self.frames}"
+                + (f", błędne {self.bad}" if self.bad else "")]
+        for i, name in enumerate(TEL_FIELDS):
+            if w.n:
+                rows.append(f"{name:<6}{w.last[i]:>10.2f}{w.min[i]:>10.2f}"
+                            f"{w.mean(i):>10.2f}{w.max[i]:>10.2f}")
+            else:
+                rows.append(f"{name:<6}{w.last[i]:>10.2f}{'-':>10}{'-':>10}{'-':>10}")
+        if self.footer is not None:
+            rows.append(self.footer())
+        return rows
+
+    def _draw(self, rows: List[str]) -> None:
+        # zbyt długa linia zawinęłaby się i zepsuła liczenie linii do wymazania
+        width = shutil.get_terminal_size().columns - 1
+        self.out.write("\n".join(r[:width] for r in rows))
+        self._drawn = len(rows)
+
+    def _erase(self) -> None:
+        """Wymazuje poprzedni rysunek (kursor wraca na jego początek)."""
+        if not self.live or not self._drawn:
+            return
+        up = self._drawn - 1
+        self.out.write((f"\033[{up}A" if up else "") + "\r\033[J")
+        self._drawn = 0
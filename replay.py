@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Odtwarzanie przechwyconej sesji (capture.py) bez sprzętu.
+
+Klasa ReplayTransport (podklasa SerialTransport, ten sam interfejs):
+- zamiast portu używa ReplaySerial – udawanego serial.Serial, który
+  oddaje zapisane bajty RX z pliku .cap,
+- tempo odtwarzania (speed):
+    1.0  – czas rzeczywisty (oryginalne odstępy między porcjami),
+    k    – k razy szybciej (np. 10.0),
+    0    – najszybciej, jak się da (porcje bez czekania, ale z zachowaniem
+           oryginalnego podziału na porcje odczytu),
+- zapisy (write_line(), komendy) są przyjmowane i liczone, ale nie
+  wpływają na odtwarzane dane,
+- po końcu nagrania read_line() zwraca od razu None (eof = True),
+  więc iter_lines(timeout=...) kończy się bez czekania na timeout.
+
+Dzięki temu cli.follow_telemetry(), monitor, recorder i parsery można
+uruchomić na danych z prawdziwego stanowiska z pełną prędkością.
+
+Użycie:
+    python cli.py COM3 --capture sesja.cap      (nagranie)
+    python replay.py sesja.cap [--speed 0]       (odtworzenie przez follow_telemetry)
+    python replay.py sesja.cap --render table    (podgląd odświeżany w miejscu)
+    python replay.py sesja.cap --plot --speed 5  (wykres na żywo)
+    python replay.py sesja.cap --info            (podsumowanie pliku)
+    python bench.py replay sesja.cap             (przepustowość parsowania)
+"""
+
+from __future__ import annotations
+import argparse
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from capture import DIR_RX, DIR_TX, read_capture
+from latency import LatencyTracker
+from plot import LivePlot
+from render import RENDER_MODES, StatusRenderer
+from transport import LineFramer, SerialTransport
+
+DEBUG = False
+
+
+class ReplaySerial:
+    """
+    Udawany obiekt serial.Serial oddający bajty RX z pliku przechwycenia.
+
+    Obsługuje to, czego używa SerialTransport: read(), in_waiting,
+    write(), flush(), timeout, reset_input_buffer(), reset_output_buffer(),
+    close(). Zegar odtwarzania startuje przy pierwszym odczycie.
+
+    Atrybuty:
+        speed   : tempo odtwarzania (0 = najszybciej),
+        timeout : timeout read() jak w pyserial (None = bez limitu),
+        written : liczba bajtów przyjętych przez write(),
+        eof     : True, gdy wszystkie bajty zostały już oddane.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, timeout: Optional[float] = None) -> None:
+        if speed < 0:
+            raise ValueError("speed must be >= 0")
+        self.path = path
+        self.speed = speed
+        self.timeout = timeout
+        self.written = 0
+        self.is_open = True
+        _, records = read_capture(path)
+        self._t: List[float] = []
+        self._data: List[bytes] = []
+        for direction, t, data in records:
+            if direction == DIR_RX:
+                self._t.append(t)
+                self._data.append(data)
+        self._next = 0
+        self._buf = bytearray()
+        self._t0: Optional[float] = None
+
+    @property
+    def total(self) -> int:
+        """Liczba bajtów RX w nagraniu."""
+        return sum(len(d) for d in self._data)
+
+    @property
+    def duration(self) -> float:
+        """Czas trwania nagrania (od pierwszego do ostatniego RX, s)."""
+        return self._t[-1] - self._t[0] if self._t else 0.0
+
+    @property
+    def eof(self) -> bool:
+        return not self._buf and self._next >= len(self._data)
+
+    def _due(self, i: int) -> float:
+        """Chwila (time.monotonic()), w której porcja i ma być dostępna."""
+        return self._t0 + (self._t[i] - self._t[0]) / self.speed
+
+    def _stage(self) -> None:
+        """Przenosi do bufora porcje, których czas już nadszedł."""
+        n = len(self._data)
+        if self._next >= n:
+            return
+        if self._t0 is None:
+            self._t0 = time.monotonic()
+        if self.speed == 0:
+            # najszybciej: jedna porcja na raz, tak jak przyszła z portu
+            if not self._buf:
+                self._buf += self._data[self._next]
+                self._next += 1
+            return
+        now = time.monotonic()
+        while self._next < n and self._due(self._next) <= now:
+            self._buf += self._data[self._next]
+            self._next += 1
+
+    @property
+    def in_waiting(self) -> int:
+        self._stage()
+        return len(self._buf)
+
+    def read(self, size: int = 1) -> bytes:
+        self._stage()
+        if not self._buf:
+            if self._next < len(self._data):
+                # czekamy na następną porcję, ale nie dłużej niż timeout
+                wait = self._due(self._next) - time.monotonic()
+                if self.timeout is not None:
+                    wait = min(wait, self.timeout)
+                if wait > 0:
+                    time.sleep(wait)
+                self._stage()
+            elif self.timeout:
+                # koniec nagrania – jak cichy port: read() czeka timeout
+                time.sleep(self.timeout)
+        data = bytes(self._buf[:size])
+        del self._buf[:size]
+        return data
+
+    def write(self, data: bytes) -> int:
+        self.written += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def reset_input_buffer(self) -> None:
+        # porzucamy tylko to, co już "dotarło" – dalsza część nagrania zostaje
+        self._stage()
+        self._buf.clear()
+
+    def reset_output_buffer(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+@dataclass
+class ReplayTransport(SerialTransport):
+    """
+    SerialTransport odtwarzający plik przechwycenia zamiast portu.
+
+    Atrybuty (oprócz tych z SerialTransport):
+        path  : plik .cap (port przyjmuje wartość path, np. do komunikatów),
+        speed : tempo odtwarzania (1.0 = czas rzeczywisty, 0 = najszybciej).
+
+    Domyślnie pace=False (brak sprzętowego bufora RX) i ready_timeout=0
+    (READY z nagrania trafia do wywołującego jak każda inna linia).
+    """
+    port: str = ""
+    path: str = ""
+    speed: float = 1.0
+    pace: bool = False
+    ready_timeout: float = 0.0
+
+    def open(self) -> None:
+        """Wczytuje nagranie; zegar odtwarzania rusza przy pierwszym odczycie."""
+        path = self.path or self.port
+        if not path:
+            raise ValueError("no capture file")
+        self.port = self.port or path
+        self._ser = ReplaySerial(path, self.speed, self.timeout)
+        self._framer.clear()
+        self._lines.clear()
+        self._pacer = None
+        if self.record_latency and self._latency is None:
+            self._latency = LatencyTracker()
+        self._ready = self.wait_ready(self.ready_timeout) if self.ready_timeout > 0 else False
+        if self.reader_thread:
+            self._start_reader()
+        if DEBUG:
+            print(f"[REPLAY] {path}: {self._ser.total} B, {self._ser.duration:.1f} s, "
+                  f"speed {self.speed:g}")
+
+    @property
+    def eof(self) -> bool:
+        """Czy nagranie zostało w całości odczytane (i nie czekają już żadne linie)."""
+        if not self._ser:
+            return True
+        if self._queue is not None:
+            return self._ser.eof and not len(self._queue)
+        return self._ser.eof and not self._lines
+
+    def read_line(self, timeout: Optional[float] = None) -> Optional[str]:
+        # po końcu nagrania nie ma na co czekać
+        if self._ser and self._queue is None and not self._lines and self._ser.eof:
+            return None
+        return super().read_line(timeout)
+
+
+@dataclass
+class CaptureInfo:
+    """Podsumowanie pliku przechwycenia."""
+    started: float
+    duration: float
+    rx_bytes: int
+    tx_bytes: int
+    rx_chunks: int
+    tx_chunks: int
+    lines: int
+
+
+def capture_info(path: str) -> CaptureInfo:
+    """Liczy porcje, bajty i linie w pliku przechwycenia."""
+    started, records = read_capture(path)
+    rx = tx = nrx = ntx = 0
+    t_last = 0.0
+    framer = LineFramer()
+    lines = 0
+    for direction, t, data in records:
+        t_last = t
+        if direction == DIR_RX:
+            rx += len(data)
+            nrx += 1
+            lines += len(framer.feed(data))
+        elif direction == DIR_TX:
+            tx += len(data)
+            ntx += 1
+    return CaptureInfo(started, t_last, rx, tx, nrx, ntx, lines)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="odtwarzanie przechwyconej sesji (.cap)")
+    ap.add_argument("path", help="plik zapisany przez --capture")
+    ap.add_argument("--speed", type=float, default=1.0,
+                    help="tempo: 1 = czas rzeczywisty, 10 = 10x szybciej, 0 = najszybciej")
+    ap.add_argument("--info", action="store_true", help="tylko podsumowanie pliku")
+    ap.add_argument("--render", choices=RENDER_MODES,
+                    help="podgląd odświeżany w miejscu zamiast linii po linii")
+    ap.add_argument("--plot", action="store_true", help="wykres na żywo (sp, dist, err, out)")
+    ap.add_argument("--refresh", type=float, default=5.0, help="odświeżanie --render / --plot (Hz)")
+    ap.add_argument("--reader-thread", action="store_true",
+                    help="odtwarzanie przez wątek czytający (jak cli.py --reader-thread)")
+    args = ap.parse_args()
+
+    if args.info:
+        info = capture_info(args.path)
+        print(f"{args.path}: {info.duration:.1f} s, "
+              f"RX {info.rx_bytes} B w {info.rx_chunks} porcjach ({info.lines} linii), "
+              f"TX {info.tx_bytes} B w {info.tx_chunks} porcjach, "
+              f"start {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(info.started))}")
+        return
+
+    # import tutaj – cli.py importuje całą resztę projektu
+    from cli import follow_telemetry
+
+    x = ReplayTransport(path=args.path, speed=args.speed, reader_thread=args.reader_thread)
+    view = None
+    if args.plot:
+        view = LivePlot(1.0 / args.refresh)
+    elif args.render:
+        view = StatusRenderer(1.0 / args.refresh, args.render)
+    x.open()
+    t0 = time.perf_counter()
+    try:
+        follow_telemetry(x, view=view)
+    finally:
+        x.close()
+    print(f"Odtworzono w {time.perf_counter() - t0:.2f} s (tempo {args.speed:g}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Strumień punktów zadanych TARGET(x) według zadanej trajektorii.
+
+Zamiast samej odpowiedzi skokowej mierzymy nadążanie za zmieniającym
+się punktem zadanym:
+- profile: ramp (rampa), sine (sinusoida), square (prostokąt),
+  csv (dowolny przebieg: kolumny t,value, interpolacja liniowa),
+- PeriodicScheduler: kolejne chwile wysłania to t0 + k * period na
+  zegarze monotonicznym (bezwzględne terminy – błąd pojedynczego
+  sleep() nie kumuluje się); jeśli łącze nie nadąża i termin minął,
+  pośrednie punkty są pomijane i wysyłany jest tylko najnowszy,
+- TrajectoryStreamer wysyła TARGET(...) przez SerialTransport.write_line(),
+  na bieżąco odbiera ACK/NACK i telemetrię (bez blokowania) i liczy
+  statystyki: opóźnienie wysłania względem terminu (histogram), liczbę
+  pominiętych punktów, a w trybie TEST – błąd nadążania |err| z linii TEL.
+
+Użycie:
+    python cli.py trajectory COM3 sine --center 26.5 --amplitude 5 --period 4 --rate 20 --duration 30
+    python trajectory.py COM3 csv --file profil.csv --rate 50
+"""
+
+from __future__ import annotations
+import argparse
+import bisect
+import csv
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from dispatch import NACK, TEL, Dispatcher, Message, read_reply
+from latency import LatencyHistogram
+from priority import send_stop
+from protocol import parse_telemetry, to_frame
+from transport import SerialTransport
+
+DEBUG = False
+
+# profil: funkcja czasu od początku (s) -> punkt zadany (cm)
+Profile = Callable[[float], float]
+
+SHAPES = ("ramp", "sine", "square", "csv")
+
+
+def ramp(start: float, end: float, duration: float) -> Profile:
+    """Liniowo od start do end w czasie duration, potem stale end."""
+    if duration <= 0:
+        raise ValueError("duration must be > 0")
+
+    def f(t: float) -> float:
+        return end if t >= duration else start + (end - start) * t / duration
+    return f
+
+
+def sine(center: float, amplitude: float, period: float) -> Profile:
+    """center + amplitude * sin(2 pi t / period)."""
+    if period <= 0:
+        raise ValueError("period must be > 0")
+    w = 2.0 * math.pi / period
+
+    def f(t: float) -> float:
+        return center + amplitude * math.sin(w * t)
+    return f
+
+
+def square(low: float, high: float, period: float, duty: float = 0.5) -> Profile:
+    """high przez duty * period, potem low (zaczyna od high)."""
+    if period <= 0 or not 0.0 < duty < 1.0:
+        raise ValueError("period must be > 0 and 0 < duty < 1")
+
+    def f(t: float) -> float:
+        return high if (t % period) < duty * period else low
+    return f
+
+
+def load_profile(path: str) -> Tuple[Profile, float]:
+    """
+    Profil z pliku CSV (kolumny: t, value; nagłówek opcjonalny).
+
+    Między punktami – interpolacja liniowa, poza zakresem – wartość skrajna.
+    Zwraca (profil, czas trwania = ostatnie t).
+    """
+    ts: List[float] = []
+    vs: List[float] = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 2:
+                continue
+            try:
+                t, v = float(row[0]), float(row[1])
+            except ValueError:
+                continue  # nagłówek / komentarz
+            if ts and t <= ts[-1]:
+                raise ValueError(f"{path}: t must be increasing (t={t})")
+            ts.append(t)
+            vs.append(v)
+    if not ts:
+        raise ValueError(f"{path}: no data points")
+
+    def f(t: float) -> float:
+        i = bisect.bisect_right(ts, t)
+        if i == 0:
+            return vs[0]
+        if i == len(ts):
+            return vs[-1]
+        t0, t1 = ts[i - 1], ts[i]
+        return vs[i - 1] + (vs[i] - vs[i - 1]) * (t - t0) / (t1 - t0)
+    return f, ts[-1]
+
+
+class PeriodicScheduler:
+    """
+    Terminy t0 + k * period na zegarze monotonicznym.
+
+    wait() czeka do najbliższego terminu i zwraca go; jeśli termin
+    (i kolejne) już minęły, przeskakuje do ostatniego minionego –
+    pominięte terminy liczone są w coalesced.
+
+    Parametry:
+        period : okres (s),
+        spin   : końcówkę oczekiwania (s) wykonuje aktywnie zamiast sleep(),
+                 co zmniejsza rozrzut kosztem CPU (0 = tylko sleep()).
+    """
+
+    def __init__(self, period: float, spin: float = 0.0, t0: Optional[float] = None) -> None:
+        if period <= 0:
+            raise ValueError("period must be > 0")
+        self.period = period
+        self.spin = spin
+        self.t0 = time.monotonic() if t0 is None else t0
+        self.k = -1
+        self.coalesced = 0
+
+    def wait(self) -> float:
+        """Czeka do następnego terminu i zwraca go (time.monotonic())."""
+        self.k += 1
+        deadline = self.t0 + self.k * self.period
+        now = time.monotonic()
+        if now >= deadline + self.period:
+            # spóźnienie o co najmniej cały okres – pomijamy zaległe terminy
+            behind = int((now - deadline) / self.period)
+            self.k += behind
+            self.coalesced += behind
+            deadline = self.t0 + self.k * self.period
+        elif now < deadline:
+            delay = deadline - now - self.spin
+            if delay > 0:
+                time.sleep(delay)
+            while time.monotonic() < deadline:
+                pass
+        return deadline
+
+
+@dataclass
+class TrajectoryStats:
+    """
+    Wyniki strumienia.
+
+    Atrybuty:
+        sent      : wysłane ramki TARGET,
+        coalesced : punkty pominięte, bo łącze / proces nie nadążał,
+        acks/nacks: odpowiedzi firmware'u,
+        lateness  : histogram opóźnienia wysłania względem terminu (s),
+        duration  : czas trwania strumienia (s),
+        tel       : liczba linii TEL, abs_err / sq_err – sumy |err| i err^2.
+    """
+    sent: int = 0
+    coalesced: int = 0
+    acks: int = 0
+    nacks: int = 0
+    duration: float = 0.0
+    tel: int = 0
+    abs_err: float = 0.0
+    sq_err: float = 0.0
+    lateness: LatencyHistogram = field(default_factory=lambda: LatencyHistogram(highest=10.0))
+
+    @property
+    def rate(self) -> float:
+        return self.sent / self.duration if self.duration > 0 else 0.0
+
+    def format(self) -> str:
+        h = self.lateness
+        lines = [
+            f"Wysłano {self.sent} ramek TARGET w {self.duration:.1f} s ({self.rate:.1f}/s), "
+            f"pominięte (spóźnione): {self.coalesced}, ACK {self.acks}, NACK {self.nacks}",
+        ]
+        if h.count:
+            lines.append(
+                f"  opóźnienie wysłania [ms]: p50 {h.percentile(50) * 1e3:.2f}  "
+                f"p90 {h.percentile(90) * 1e3:.2f}  p99 {h.percentile(99) * 1e3:.2f}  "
+                f"max {h.max * 1e3:.2f}")
+        if self.tel:
+            lines.append(
+                f"  nadążanie (TEL: {self.tel}): średni |err| {self.abs_err / self.tel:.2f} cm, "
+                f"RMS {math.sqrt(self.sq_err / self.tel):.2f} cm")
+        return "\n".join(lines)
+
+
+class TrajectoryStreamer:
+    """
+    Wysyła TARGET(profil(t)) co 1/rate sekundy przez duration sekund.
+
+    Parametry:
+        x        : otwarty SerialTransport,
+        profile  : funkcja czasu -> punkt zadany,
+        rate     : częstotliwość wysyłania (Hz),
+        duration : czas trwania (s),
+        decimals : liczba miejsc po przecinku w TARGET(...),
+        spin     : patrz PeriodicScheduler,
+        on_line  : wywoływane z każdą odebraną linią (np. recorder.add_line).
+    """
+
+    def __init__(self, x: SerialTransport, profile: Profile, rate: float, duration: float,
+                 decimals: int = 2, spin: float = 0.001,
+                 on_line: Optional[Callable[[str], None]] = None) -> None:
+        if rate <= 0 or duration <= 0:
+            raise ValueError("rate and duration must be > 0")
+        self.x = x
+        self.profile = profile
+        self.rate = rate
+        self.duration = duration
+        self.decimals = decimals
+        self.spin = spin
+        self.on_line = on_line
+        self.stats = TrajectoryStats()
+        self.dispatcher = Dispatcher()
+        self.dispatcher.subscribe(TEL, self._on_tel)
+        self.dispatcher.subscribe(None, self._on_message)
+
+    def run(self) -> TrajectoryStats:
+        x, stats = self.x, self.stats
+        sched = PeriodicScheduler(1.0 / self.rate, self.spin)
+        t_start = sched.t0
+        while True:
+            deadline = sched.wait()
+            t = deadline - t_start
+            if t > self.duration:
+                break
+            frame = to_frame(f"TARGET({self.profile(t):.{self.decimals}f})")
+            x.write_line(frame)
+            stats.lateness.record(time.monotonic() - deadline)
+            stats.sent += 1
+            self._drain()
+        stats.coalesced = sched.coalesced
+        stats.duration = time.monotonic() - t_start
+        # ostatnie odpowiedzi
+        end = time.monotonic() + 0.5
+        while time.monotonic() < end and stats.acks + stats.nacks < stats.sent:
+            line = x.read_line(timeout=0.1)
+            if line is not None:
+                self._feed(line)
+        return stats
+
+    def _drain(self) -> None:
+        """Odbiera bez czekania wszystko, co już przyszło."""
+        x = self.x
+        if x.reader_thread:
+            while True:
+                line = x.read_line(timeout=0.0)
+                if line is None:
+                    return
+                self._feed(line)
+        for line in x.poll_lines():
+            self._feed(line)
+
+    def _feed(self, line: str) -> None:
+        self.dispatcher.feed(line)
+        if self.on_line is not None:
+            self.on_line(line)
+
+    def _on_message(self, msg: Message) -> None:
+        if msg.is_reply:
+            if msg.kind == NACK:
+                self.stats.nacks += 1
+                if DEBUG:
+                    print(f"[TRAJ] {msg.line}")
+            else:
+                self.stats.acks += 1
+
+    def _on_tel(self, msg: Message) -> None:
+        values = parse_telemetry(msg.line)
+        if values is None:
+            return
+        err = values[2]
+        self.stats.tel += 1
+        self.stats.abs_err += abs(err)
+        self.stats.sq_err += err * err
+
+
+def make_profile(args: argparse.Namespace) -> Tuple[Profile, Optional[float]]:
+    """Profil z argumentów linii poleceń; zwraca (profil, naturalny czas trwania)."""
+    if args.shape == "ramp":
+        return ramp(args.start, args.end, args.ramp_time), args.ramp_time
+    if args.shape == "sine":
+        return sine(args.center, args.amplitude, args.period), None
+    if args.shape == "square":
+        return square(args.center - args.amplitude, args.center + args.amplitude,
+                      args.period, args.duty), None
+    if not args.file:
+        raise SystemExit("profil csv wymaga --file")
+    return load_profile(args.file)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(prog="trajectory",
+                                 description="strumień TARGET(x) według trajektorii")
+    ap.add_argument("port")
+    ap.add_argument("shape", choices=SHAPES)
+    ap.add_argument("--baud", type=int, default=9600)
+    ap.add_argument("--rate", type=float, default=10.0, help="ramki TARGET na sekundę")
+    ap.add_argument("--duration", type=float, default=None,
+                    help="czas trwania (s); domyślnie: rampa / CSV – do końca, inne – 20 s")
+    ap.add_argument("--center", type=float, default=26.5, help="sine/square: środek (cm)")
+    ap.add_argument("--amplitude", type=float, default=5.0, help="sine/square: amplituda (cm)")
+    ap.add_argument("--period", type=float, default=4.0, help="sine/square: okres (s)")
+    ap.add_argument("--duty", type=float, default=0.5, help="square: wypełnienie")
+    ap.add_argument("--start", type=float, default=20.0, help="ramp: wartość początkowa")
+    ap.add_argument("--end", type=float, default=30.0, help="ramp: wartość końcowa")
+    ap.add_argument("--ramp-time", type=float, default=10.0, help="ramp: czas narastania (s)")
+    ap.add_argument("--file", help="csv: plik z kolumnami t,value")
+    ap.add_argument("--mode", choices=("test", "none"), default="test",
+                    help="test: TEST przed strumieniem i STOP po nim (błąd nadążania z TEL); "
+                         "none: same ramki TARGET")
+    args = ap.parse_args(argv)
+
+    profile, natural = make_profile(args)
+    duration = args.duration or natural or 20.0
+
+    x = SerialTransport(args.port, args.baud, timeout=1.0)
+    x.open()
+    try:
+        if args.mode == "test":
+            for cmd in (f"TARGET({profile(0.0):.2f})", "TEST"):
+                x.write_line(to_frame(cmd))
+                ack = read_reply(x, 2.0)
+                if ack is None or ack.kind == NACK:
+                    raise SystemExit(f"{cmd}: {ack.line if ack is not None else 'brak odpowiedzi'}")
+        print(f"Strumień {args.shape} @ {args.rate:g} Hz przez {duration:g} s "
+              f"({args.port}, {args.baud} baud)...")
+        stats = TrajectoryStreamer(x, profile, args.rate, duration).run()
+        print(stats.format())
+    finally:
+        # także po Ctrl+C / błędzie – regulator nie może zostać w trybie TEST
+        try:
+            if args.mode == "test":
+                print(send_stop(x).format())
+        finally:
+            x.close()
+
+
+if __name__ == "__main__":
+    main()
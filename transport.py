@@ -7,18 +7,57 @@ Warstwa transportowa nad portem szeregowym (pyserial).
 Klasa SerialTransport:
 - opakowanie nad serial.Serial,
   operowania na bajtach,
-- czyszczenie buforów przy otwarciu portu,
+- czyszczenie buforów przy otwarciu portu i czekanie na READY
+  (zamiast stałego opóźnienia na reset Arduino),
 - debugowe logowanie TX/RX w trybie DEBUG.
 
+Klasa LineFramer:
+- składanie linii tekstu z surowego strumienia bajtów
+  (te same zasady ramkowania co po stronie Arduino).
+
+Klasa LineQueue:
+- ograniczona kolejka linii dla opcjonalnego wątku czytającego
+  (SerialTransport(reader_thread=True)).
+
+Klasa RxBudgetPacer:
+- tempo wysyłania dopasowane do 64-bajtowego bufora odbiorczego
+  Arduino (zamiast stałego opóźnienia po każdej ramce).
+
+Klasa OutboundQueue:
+- kolejka wysyłania dla SerialTransport(write_queue=True): niewysłana
+  ramka TARGET / PID / ZERO jest zastępowana nowszą (przeciąganie
+  suwaka nie zapycha łącza 9600 bodów starymi wartościami), a kolejność
+  pozostałych komend (STOP, START, ...) jest zachowana.
+
+Ramki STOP / B idą ścieżką priorytetową (SerialTransport.write_priority()):
+od razu do portu, bez czekania na RxBudgetPacer; wszystko, co jeszcze
+czeka w kolejce wysyłania (TEST, START, TARGET, ...), jest porzucane,
+żeby nie uruchomiło regulatora z powrotem po STOP. Powtarzanie do
+potwierdzenia – priority.send_stop().
+
+Opcjonalnie (SerialTransport(record_latency=True)) transport mierzy
+czas od wysłania ramki do odpowiedzi – patrz latency.py.
+
+SerialTransport(capture="sesja.cap") zapisuje wszystkie odebrane
+i wysłane bajty ze znacznikami czasu (capture.py) – do odtworzenia
+przez replay.ReplayTransport.
+
 Dodatkowo:
 - funkcja available_ports() zwracająca listę dostępnych portów COM.
 """
 
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Optional
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+import threading
 import time
 
+from capture import CaptureWriter, CapturingSerial
+from latency import LatencyTracker
+from dispatch import classify
+from protocol import READY_LINE, command_kind
+
 try:
     import serial
     from serial.tools import list_ports
@@ -28,6 +67,338 @@ except Exception:
 
 DEBUG = False
 
+# bufor odbiorczy HardwareSerial w Arduino UNO (SERIAL_RX_BUFFER_SIZE)
+RX_BUFFER = 64
+
+# ramka bez odpowiedzi dłużej niż tyle sekund nie jest liczona do in_flight
+REPLY_MAX_AGE = 5.0
+
+
+class LineFramer:
+    """
+    Składa pełne linie tekstu z kolejnych porcji bajtów.
+
+    Zasady ramkowania:
+    - terminator linii: '\n',
+    - jeśli przed '\n' jest '\r', jest usuwany (standard CRLF),
+    - linia dekodowana jako ASCII (znaki spoza zakresu są ignorowane).
+
+    Niepełna końcówka (bez '\n') zostaje w buforze i jest
+    doklejana do danych z następnego wywołania feed().
+    """
+
+    __slots__ = ("_buf",)
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """
+        Dokłada bajty do bufora i zwraca listę wszystkich pełnych linii.
+
+        Cały fragment do ostatniego '\n' jest dekodowany i dzielony
+        jednym wywołaniem, zamiast analizować dane bajt po bajcie.
+        """
+        buf = self._buf
+        buf += data
+        end = buf.rfind(b"\n")
+        if end < 0:
+            return []
+
+        chunk = buf[:end].decode("ascii", errors="ignore")
+        del buf[:end + 1]
+        return [ln[:-1] if ln.endswith("\r") else ln for ln in chunk.split("\n")]
+
+    def pending(self) -> int:
+        """Liczba bajtów niepełnej linii czekających w buforze."""
+        return len(self._buf)
+
+    def clear(self) -> None:
+        """Porzuca niepełną linię z bufora."""
+        self._buf.clear()
+
+
+OVERFLOW_POLICIES = ("drop_oldest", "block")
+
+
+class LineQueue:
+    """
+    Ograniczona kolejka linii pomiędzy wątkiem czytającym a konsumentem.
+
+    Oparta na collections.deque, którego append()/popleft() są atomowe,
+    więc producent i konsument nie dzielą żadnej blokady na ścieżce danych.
+    Obiekty threading.Event służą wyłącznie do usypiania czekającej strony.
+
+    Polityka przepełnienia (policy):
+    - "drop_oldest": najstarsza linia wypada, rośnie licznik dropped,
+    - "block": producent czeka, aż konsument zrobi miejsce
+      (licznik blocked mówi, ile razy musiał czekać).
+    """
+
+    def __init__(self, maxsize: int = 1024, policy: str = "drop_oldest") -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy: {policy!r}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.blocked = 0
+        self._q: deque = deque()
+        self._ready = threading.Event()
+        self._space = threading.Event()
+        self._space.set()
+
+    def __len__(self) -> int:
+        return len(self._q)
+
+    def put(self, line: str, stop: Optional[threading.Event] = None) -> None:
+        """
+        Dokłada linię na koniec kolejki (wywołuje tylko wątek czytający).
+
+        Przy polityce "block" czeka na miejsce; jeśli w tym czasie
+        zostanie ustawione zdarzenie stop, linia jest porzucana.
+        """
+        q = self._q
+        if len(q) >= self.maxsize:
+            if self.policy == "drop_oldest":
+                try:
+                    q.popleft()
+                    self.dropped += 1
+                except IndexError:
+                    pass
+            else:
+                self.blocked += 1
+                while len(q) >= self.maxsize:
+                    self._space.clear()
+                    # ponowne sprawdzenie po clear() – konsument mógł
+                    # zwolnić miejsce między while a clear()
+                    if len(q) < self.maxsize:
+                        break
+                    self._space.wait(0.1)
+                    if stop is not None and stop.is_set():
+                        return
+
+        q.append(line)
+        if not self._ready.is_set():
+            self._ready.set()
+
+    def get(self, timeout: float) -> Optional[str]:
+        """
+        Zdejmuje najstarszą linię; czeka na nią maksymalnie timeout sekund.
+
+        Zwraca None, jeśli w tym czasie nic nie przyszło.
+        """
+        q = self._q
+        try:
+            line = q.popleft()
+        except IndexError:
+            end = time.monotonic() + timeout
+            while True:
+                self._ready.clear()
+                # ponowne sprawdzenie po clear() – producent mógł
+                # dołożyć linię między popleft() a clear()
+                try:
+                    line = q.popleft()
+                    break
+                except IndexError:
+                    pass
+                remaining = end - time.monotonic()
+                if remaining <= 0 or not self._ready.wait(remaining):
+                    try:
+                        line = q.popleft()
+                        break
+                    except IndexError:
+                        return None
+
+        if self.policy == "block" and not self._space.is_set():
+            self._space.set()
+        return line
+
+    def clear(self) -> None:
+        """Porzuca wszystkie linie czekające w kolejce."""
+        self._q.clear()
+        self._space.set()
+
+
+class RxBudgetPacer:
+    """
+    Ograniczanie tempa zapisu do budżetu bufora odbiorczego urządzenia.
+
+    Model "wiaderka z żetonami": w buforze Arduino mieści się capacity
+    bajtów, a firmware opróżnia go mniej więcej w tempie łącza
+    (rate = baud / 10 bajtów/s przy 8N1). Zapis, który przepełniłby
+    bufor, czeka dokładnie tyle, ile trzeba na zwolnienie miejsca;
+    pojedyncze komendy z klawiatury nie czekają wcale.
+
+    Ramka dłuższa niż capacity jest wysyłana, gdy bufor jest pusty.
+
+    Bajty wysłane z pominięciem wait() (SerialTransport.write_priority())
+    są odliczane przez charge(). Obie metody można wołać z różnych wątków;
+    wait() rezerwuje budżet pod blokadą, a śpi już bez niej.
+    """
+
+    __slots__ = ("capacity", "rate", "waited", "_tokens", "_t", "_lock")
+
+    def __init__(self, capacity: int = RX_BUFFER, rate: float = 960.0) -> None:
+        if capacity < 1 or rate <= 0:
+            raise ValueError("capacity and rate must be positive")
+        self.capacity = capacity
+        self.rate = rate
+        self.waited = 0.0
+        self._tokens = float(capacity)
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self, n: int) -> float:
+        """
+        Rezerwuje n bajtów budżetu; w razie potrzeby czeka.
+
+        Zwraca czas oczekiwania (s).
+        """
+        with self._lock:
+            now = time.monotonic()
+            # _t może być w przyszłości: poprzednie wait() jeszcze śpi
+            tokens = min(self.capacity, self._tokens + max(0.0, now - self._t) * self.rate)
+            delay = 0.0
+            need = min(n, self.capacity) - tokens
+            if need > 0:
+                delay = need / self.rate
+                self.waited += delay
+                tokens += need
+                now += delay
+            self._tokens = tokens - n
+            self._t = max(now, self._t)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def charge(self, n: int) -> None:
+        """Odlicza n bajtów wysłanych bez wait() – bez czekania."""
+        with self._lock:
+            now = time.monotonic()
+            if now > self._t:
+                self._tokens = min(self.capacity, self._tokens + (now - self._t) * self.rate)
+                self._t = now
+            self._tokens -= n
+
+
+# komendy ustawiające jeden parametr regulatora: w kolejce wysyłania
+# nowsza wartość zastępuje starszą, która jeszcze nie wyszła do portu
+COALESCE_KINDS = ("TARGET", "PID", "ZERO")
+
+# komendy zatrzymujące regulator – zawsze ścieżką priorytetową
+PRIORITY_KINDS = ("STOP", "B")
+
+
+class OutboundQueue:
+    """
+    Kolejka ramek do wysłania z łączeniem nieaktualnych wartości
+    (last-writer-wins).
+
+    Ramka komendy z coalesce (np. TARGET) zastępuje – na jej miejscu
+    w kolejce – niewysłaną ramkę tej samej komendy, o ile nie dzieli ich
+    żadna inna komenda (STOP, START, TEST, ...). Taka komenda jest barierą:
+    kolejność względem niej zostaje zachowana, więc np. TARGET wpisany po
+    STOP nigdy nie wyprzedzi STOP. Zastąpiona ramka nie jest wysyłana
+    i nie dostaje odpowiedzi.
+
+    clear() porzuca też ramkę, którą wątek piszący już zdjął, ale jeszcze
+    nie zapisał (sprawdza to pod blokadą zapisu przez current_dropped()).
+
+    Kolejkę opróżnia wątek piszący SerialTransport(write_queue=True).
+
+    Atrybuty:
+        coalesce  : typy komend, które wolno łączyć,
+        coalesced : liczba ramek zastąpionych nowszą wartością,
+        sent      : liczba ramek zdjętych z kolejki do wysłania.
+    """
+
+    def __init__(self, coalesce=COALESCE_KINDS) -> None:
+        self.coalesce = frozenset(k.upper() for k in coalesce)
+        self.coalesced = 0
+        self.sent = 0
+        # elementy: [typ komendy albo None (bariera), ramka]
+        self._items: deque = deque()
+        self._busy = False
+        self._current: Optional[str] = None
+        self._cancelled = False
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, frame: str, coalesce: bool = True) -> Optional[str]:
+        """
+        Dokłada ramkę na koniec kolejki albo podmienia niewysłaną ramkę
+        tej samej komendy. Zwraca zastąpioną ramkę (albo None).
+
+        coalesce=False: ramka jest zwykłą barierą (np. ramki okna pipeline,
+        które czekają na odpowiedź każda z osobna).
+        """
+        kind = command_kind(frame) if coalesce else None
+        if kind not in self.coalesce:
+            kind = None
+        with self._cond:
+            if kind is not None:
+                # szukamy od końca do najbliższej bariery
+                for item in reversed(self._items):
+                    if item[0] is None:
+                        break
+                    if item[0] == kind:
+                        old, item[1] = item[1], frame
+                        self.coalesced += 1
+                        return old
+            self._items.append([kind, frame])
+            self._cond.notify()
+        return None
+
+    def get(self, timeout: float) -> Optional[str]:
+        """
+        Zdejmuje najstarszą ramkę (czeka maks. timeout sekund).
+
+        Po wysłaniu ramki wątek piszący wywołuje task_done().
+        """
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            self._busy = True
+            self._cancelled = False
+            self.sent += 1
+            self._current = self._items.popleft()[1]
+            return self._current
+
+    def current_dropped(self) -> bool:
+        """Czy ramka zdjęta ostatnim get() została porzucona przez clear()."""
+        with self._cond:
+            return self._cancelled
+
+    def task_done(self) -> None:
+        """Zgłasza, że ostatnio zdjęta ramka została zapisana do portu."""
+        with self._cond:
+            self._busy = False
+            self._current = None
+            self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Czeka, aż kolejka się opróżni; False po upływie timeoutu."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._items and not self._busy, timeout)
+
+    def clear(self) -> list:
+        """
+        Porzuca niewysłane ramki (także zdjętą, ale jeszcze niezapisaną)
+        i zwraca ich listę w kolejności wysyłania.
+        """
+        with self._cond:
+            dropped = [item[1] for item in self._items]
+            if self._busy and not self._cancelled:
+                dropped.insert(0, self._current)
+                self._cancelled = True
+            self._items.clear()
+            self._cond.notify_all()
+        return dropped
+
 
 @dataclass
 class SerialTransport:
@@ -38,12 +409,76 @@ class SerialTransport:
         port    : nazwa portu (np. 'COM16'),
         baud    : prędkość transmisji (domyślnie 9600),
         timeout : bazowy timeout (sekundy) dla odczytu,
-        _ser    : wewnętrzny obiekt serial.Serial (ustawiany w open()).
+        reader_thread : jeśli True, open() uruchamia wątek, który na bieżąco
+                        składa linie do ograniczonej kolejki (LineQueue),
+                        a read_line() tylko z niej pobiera,
+        queue_size    : pojemność kolejki linii (tryb reader_thread),
+        overflow      : polityka przepełnienia kolejki: "drop_oldest" / "block",
+        start_timeout : timeout read_line() bez parametru po komendzie START
+                        (RUN 10 s + HOLD 3 s + zapas),
+        record_latency : jeśli True, open() włącza pomiar czasu odpowiedzi
+                         (histogramy per typ komendy dostępne przez .latency),
+        ready_timeout : maks. czas czekania w open() na komunikat READY
+                        po resecie Arduino (0 = nie czekaj),
+        pace          : ograniczanie tempa zapisu do bufora RX urządzenia
+                        (RxBudgetPacer); False = zapis bez żadnych opóźnień,
+        reset_on_open : False = otwieranie portu bez ustawiania DTR/RTS,
+                        czyli bez resetu Arduino (szybkie ponowne połączenie;
+                        open() nie czeka wtedy na READY),
+        capture       : ścieżka pliku, do którego zapisywane są wszystkie
+                        bajty RX/TX (capture.py); plik jest otwierany przy
+                        pierwszym open() i zamykany w close() – istniejący
+                        plik jest dopisywany jako nowy segment,
+        write_queue   : jeśli True, write_line() / write_lines() tylko
+                        dokładają ramki do kolejki OutboundQueue, a zapisuje
+                        je do portu osobny wątek (w tempie RxBudgetPacer);
+                        błąd zapisu jest zgłaszany przy kolejnym write_line(),
+        coalesce      : typy komend łączonych w kolejce (tylko write_queue),
+        on_coalesced  : wywoływane (stara_ramka, nowa_ramka), gdy write_line()
+                        zastąpi niewysłaną ramkę – zastąpiona nie dostanie
+                        odpowiedzi,
+        on_dropped    : wywoływane z każdą ramką porzuconą z kolejki przez
+                        write_priority() (STOP / B) – nie zostanie wysłana,
+        priority      : typy komend, które write_line() wysyła ścieżką
+                        priorytetową (write_priority()); () = wyłączone,
+        _ser    : wewnętrzny obiekt serial.Serial (ustawiany w open()),
+        _framer : składanie linii z odebranych bajtów,
+        _lines  : pełne linie odebrane "na zapas" (czekające na read_line()).
     """
     port: str
     baud: int = 9600
     timeout: float = 1.0
+    reader_thread: bool = False
+    queue_size: int = 1024
+    overflow: str = "drop_oldest"
+    start_timeout: float = 17.0
+    record_latency: bool = False
+    ready_timeout: float = 2.0
+    pace: bool = True
+    reset_on_open: bool = True
+    capture: Optional[str] = None
+    write_queue: bool = False
+    coalesce: tuple = COALESCE_KINDS
+    on_coalesced: Optional[Callable[[str, str], None]] = field(default=None, repr=False)
+    on_dropped: Optional[Callable[[str], None]] = field(default=None, repr=False)
+    priority: tuple = PRIORITY_KINDS
     _ser: Optional[object] = None
+    _framer: LineFramer = field(default_factory=LineFramer, repr=False)
+    _lines: deque = field(default_factory=deque, repr=False)
+    _queue: Optional[LineQueue] = field(default=None, repr=False)
+    _reader: Optional[threading.Thread] = field(default=None, repr=False)
+    _stop: threading.Event = field(default_factory=threading.Event, repr=False)
+    _reader_error: Optional[BaseException] = field(default=None, repr=False)
+    _latency: Optional[LatencyTracker] = field(default=None, repr=False)
+    _pacer: Optional[RxBudgetPacer] = field(default=None, repr=False)
+    _ready: bool = field(default=False, repr=False)
+    _capture: Optional[CaptureWriter] = field(default=None, repr=False)
+    _outbox: Optional[OutboundQueue] = field(default=None, repr=False)
+    _writer: Optional[threading.Thread] = field(default=None, repr=False)
+    _wstop: threading.Event = field(default_factory=threading.Event, repr=False)
+    _writer_error: Optional[BaseException] = field(default=None, repr=False)
+    _wlock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _owed: deque = field(default_factory=deque, repr=False)
 
     def open(self) -> None:
         """
@@ -56,13 +491,25 @@ class SerialTransport:
 
         Dodatkowo:
         - czyści bufor wejściowy i wyjściowy,
-        - robi krótkie opóźnienie, żeby Arduino zdążyło się zresetować.
+        - czeka (maks. ready_timeout) na READY wypisywane przez setup()
+          po resecie Arduino – zwykle ok. 0.5 s zamiast stałego opóźnienia;
+          wynik dostępny jako .ready,
+        - w trybie reader_thread uruchamia wątek czytający,
+        - w trybie write_queue uruchamia wątek piszący (ramki niewysłane
+          przed ponownym open() zostają w kolejce).
+
+        reset_on_open=False: linie DTR i RTS są ustawiane na nieaktywne
+        przed otwarciem, więc Arduino się nie resetuje i port jest gotowy
+        od razu. Uwaga: na Linuksie sterownik sam podnosi DTR przy open(),
+        jeśli port ma włączone HUPCL – żeby reset na pewno nie wystąpił,
+        trzeba raz wyłączyć HUPCL (stty -F /dev/ttyACM0 -hupcl).
         """
         if serial is None:
             raise RuntimeError("pyserial not available")
 
-        self._ser = serial.Serial(
-            self.port,
+        # obiekt tworzony bez portu, żeby przed otwarciem ustawić DTR/RTS
+        ser = serial.Serial(
+            None,
             self.baud,
             timeout=self.timeout,
             write_timeout=1,
@@ -71,6 +518,16 @@ class SerialTransport:
             xonxoff=False,
             inter_byte_timeout=0.05,
         )
+        ser.port = self.port
+        if not self.reset_on_open:
+            ser.dtr = False
+            ser.rts = False
+        ser.open()
+        if self.capture:
+            if self._capture is None:
+                self._capture = CaptureWriter(self.capture)
+            ser = CapturingSerial(ser, self._capture)
+        self._ser = ser
 
         try:
             # czyścimy zalegające dane
@@ -79,10 +536,25 @@ class SerialTransport:
         except Exception:
             # jeśli nie ma tych metod / błąd portu – po prostu ignorujemy
             pass
+        self._framer.clear()
+        self._lines.clear()
+        self._owed.clear()
+        if self.record_latency and self._latency is None:
+            self._latency = LatencyTracker()
+        elif self._latency is not None:
+            self._latency.clear()
 
-        # krótkie opóźnienie – typowe przy komunikacji z Arduino,
-        # które potrafi się zresetować przy otwarciu portu
-        time.sleep(1.2)
+        self._pacer = RxBudgetPacer(RX_BUFFER, self.baud / 10.0) if self.pace else None
+
+        # Arduino resetuje się przy otwarciu portu – zamiast stałego
+        # opóźnienia czekamy na komunikat READY z setup()
+        wait = self.reset_on_open and self.ready_timeout > 0
+        self._ready = self.wait_ready(self.ready_timeout) if wait else False
+
+        if self.reader_thread:
+            self._start_reader()
+        if self.write_queue:
+            self._start_writer()
 
         if DEBUG:
             print(f"[DEBUG] Opened {self.port} @ {self.baud} baud")
@@ -93,7 +565,29 @@ class SerialTransport:
 
         Po zamknięciu:
         - _ser ustawiany na None, żeby kolejne operacje wywaliły czytelny błąd.
+
+        Wątek czytający (jeśli działa) jest zatrzymywany przed zamknięciem portu.
+        Wątek piszący dostaje chwilę (maks. 1 s) na wysłanie kolejki,
+        reszta ramek jest porzucana.
+        Zamykany jest też plik capture (jeśli włączony).
         """
+        try:
+            if self._writer is not None:
+                self._outbox.join(timeout=1.0)
+            self._close_port()
+        finally:
+            self._outbox = None
+            if self._capture is not None:
+                self._capture.close()
+                self._capture = None
+
+    def _close_port(self) -> None:
+        """
+        Zamyka sam port (plik capture i kolejka wysyłania zostają –
+        ponowne open()).
+        """
+        self._stop_writer()
+        self._stop_reader()
         if self._ser:
             try:
                 self._ser.close()
@@ -101,6 +595,8 @@ class SerialTransport:
                     print("[DEBUG] Port closed")
             finally:
                 self._ser = None
+                if self._capture is not None:
+                    self._capture.flush()
 
     def write_line(self, line: str) -> None:
         """
@@ -112,6 +608,10 @@ class SerialTransport:
         - koduje tekst jako ASCII (ignoruje znaki spoza zakresu),
         - wysyła dane i flushuje bufor wyjściowy.
 
+        W trybie write_queue ramka trafia tylko do kolejki (OutboundQueue),
+        gdzie może zastąpić niewysłaną ramkę tej samej komendy.
+        Komendy z priority (STOP, B) idą przez write_priority().
+
         Uwaga:
         - format ramki (payload|CRC) jest przygotowany wyżej (w protocol.py),
           tutaj dodajemy tylko znak nowej linii.
@@ -119,6 +619,19 @@ class SerialTransport:
         if not self._ser:
             raise RuntimeError("not open")
 
+        if self.priority and command_kind(line) in self.priority:
+            self.write_priority(line)
+            return
+
+        if self._outbox is not None:
+            self._check_writer()
+            old = self._outbox.put(line)
+            if old is not None:
+                if DEBUG:
+                    print(f"[TX] {line.strip()} (zastępuje {old.strip()})")
+                self._coalesced(old, line)
+            return
+
         # dopilnowujemy, że na końcu będzie dokładnie '\n'
         data = (line.rstrip("\r\n") + "\n").encode("ascii", errors="ignore")
 
@@ -127,11 +640,179 @@ class SerialTransport:
             hex_data = " ".join(f"{b:02X}" for b in data)
             print(f"[TX] {line.strip()}  ({hex_data})")
 
-        self._ser.write(data)
-        self._ser.flush()
+        # tempo zapisu pilnuje budżet bufora RX Arduino, a nie stałe opóźnienie
+        if self._pacer is not None:
+            self._pacer.wait(len(data))
+        with self._wlock:
+            if self._latency is not None:
+                self._latency.on_tx((line,))
+            self._ser.write(data)
+            self._ser.flush()
+            self._owed.append(time.monotonic())
+
+    def write_priority(self, line: str,
+                       before: Optional[Callable[[], None]] = None) -> list:
+        """
+        Wysyła ramkę od razu (ścieżka priorytetowa dla STOP / B).
 
-        # krótkie opóźnienie, żeby nie "zasypać" Arduino zbyt szybkimi komendami
-        time.sleep(0.002)
+        Ramka nie czeka na RxBudgetPacer (jej bajty są tylko odliczane
+        z budżetu). Wszystkie ramki czekające w OutboundQueue (także ta,
+        którą wątek piszący już zdjął, a jeszcze nie zapisał) są porzucane
+        – TEST albo START z kolejki nie może ponownie uruchomić regulatora
+        po STOP; każda trafia do on_dropped. Zapis trwający w chwili
+        wywołania jest kończony; ramka nie wchodzi w środek innej.
+
+        Zwraca listę porzuconych ramek. before(), jeśli podane, jest
+        wywoływane pod blokadą zapisu tuż przed wysłaniem – np. żeby
+        zarejestrować oczekiwanie na odpowiedź (Dispatcher.expect()).
+        """
+        if not self._ser:
+            raise RuntimeError("not open")
+
+        data = (line.rstrip("\r\n") + "\n").encode("ascii", errors="ignore")
+        with self._wlock:
+            dropped = self._outbox.clear() if self._outbox is not None else []
+            if self.on_dropped is not None:
+                for frame in dropped:
+                    self.on_dropped(frame)
+            if before is not None:
+                before()
+            if DEBUG:
+                print(f"[TX!] {line.strip()}  (porzucono z kolejki: {len(dropped)})")
+            if self._latency is not None:
+                self._latency.on_tx((line,))
+            self._ser.write(data)
+            self._ser.flush()
+            self._owed.append(time.monotonic())
+        if self._pacer is not None:
+            self._pacer.charge(len(data))
+        return dropped
+
+    def write_lines(self, lines) -> None:
+        """
+        Wysyła kilka linii jednym zapisem, bez opóźnienia między ramkami.
+
+        Każda linia jest przygotowana jak w write_line(). Wywołujący musi
+        sam pilnować, żeby nie przepełnić bufora odbiorczego Arduino
+        (tak robi pipeline.CommandPipeline).
+
+        W trybie write_queue ramki trafiają do kolejki bez łączenia –
+        każda czeka na własną odpowiedź.
+        """
+        if not self._ser:
+            raise RuntimeError("not open")
+
+        lines = list(lines)
+        if self._outbox is not None:
+            self._check_writer()
+            for line in lines:
+                self._outbox.put(line, coalesce=False)
+            return
+
+        data = b"".join(
+            (line.rstrip("\r\n") + "\n").encode("ascii", errors="ignore") for line in lines
+        )
+        if not data:
+            return
+
+        if DEBUG:
+            for line in lines:
+                print(f"[TX] {line.strip()}")
+
+        if self._pacer is not None:
+            self._pacer.wait(len(data))
+        with self._wlock:
+            if self._latency is not None:
+                self._latency.on_tx(lines)
+            self._ser.write(data)
+            self._ser.flush()
+            now = time.monotonic()
+            self._owed.extend(now for _ in lines)
+
+    def reset_input(self) -> None:
+        """
+        Porzuca wszystkie nieodczytane dane wejściowe.
+
+        Czyści bufor wejściowy portu oraz linie i niepełny ogon
+        trzymane już po stronie SerialTransport.
+        """
+        if not self._ser:
+            raise RuntimeError("not open")
+        self._ser.reset_input_buffer()
+        self._lines.clear()
+        self._owed.clear()
+        if self._latency is not None:
+            self._latency.clear()
+        if self._queue is not None:
+            # framer należy wtedy do wątku czytającego – nie ruszamy go
+            self._queue.clear()
+        else:
+            self._framer.clear()
+
+    @property
+    def dropped(self) -> int:
+        """Liczba linii utraconych przez przepełnienie kolejki (tryb reader_thread)."""
+        return self._queue.dropped if self._queue is not None else 0
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Liczba wysłanych ramek, których odpowiedzi nie zostały jeszcze
+        odczytane (read_line() / poll_lines()) – tyle odpowiedzi przyjdzie
+        przed odpowiedzią na następną wysłaną ramkę. Ramki czekające
+        dłużej niż REPLY_MAX_AGE uznawane są za bez odpowiedzi.
+        """
+        owed = self._owed
+        limit = time.monotonic() - REPLY_MAX_AGE
+        while owed and owed[0] < limit:
+            try:
+                owed.popleft()
+            except IndexError:
+                break
+        return len(owed)
+
+    @property
+    def outbox(self) -> Optional[OutboundQueue]:
+        """Kolejka wysyłania (None, jeśli write_queue=False)."""
+        return self._outbox
+
+    def flush_writes(self, timeout: Optional[float] = None) -> bool:
+        """
+        Czeka, aż wątek piszący wyśle całą kolejkę (tryb write_queue);
+        False po upływie timeoutu. Bez kolejki zwraca od razu True.
+        """
+        if self._outbox is None:
+            return True
+        self._check_writer()
+        return self._outbox.join(timeout)
+
+    @property
+    def ready(self) -> bool:
+        """Czy przy ostatnim open() / wait_ready() odebrano READY."""
+        return self._ready
+
+    def wait_ready(self, timeout: float) -> bool:
+        """
+        Czeka (maks. timeout sekund) na linię READY od firmware'u.
+
+        Linie sprzed READY (śmieci z czasu resetu) są porzucane, linie
+        odebrane po nim czekają na read_line(). Zwraca True, jeśli READY
+        przyszło; False oznacza, że urządzenie się nie zresetowało
+        (albo nie wypisuje READY) – port jest wtedy i tak gotowy.
+        """
+        end = time.monotonic() + timeout
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return False
+            line = self.read_line(timeout=remaining)
+            if line is not None and line.startswith(READY_LINE):
+                return True
+
+    @property
+    def latency(self) -> Optional[LatencyTracker]:
+        """Pomiar czasów odpowiedzi (None, jeśli record_latency=False)."""
+        return self._latency
 
     def read_line(self, timeout: Optional[float] = None) -> Optional[str]:
         """
@@ -140,7 +821,7 @@ class SerialTransport:
         Parametry:
             timeout:
                 - jeśli None, używamy:
-                    * dłuższego timeoutu (ok. 17 s) dla ostatniej komendy START,
+                    * self.start_timeout (domyślnie 17 s) dla ostatniej komendy START,
                     * w pozostałych przypadkach self.timeout (domyślnie 1 s),
                 - jeśli przekazany timeout w sekundach, używamy go wprost.
 
@@ -149,55 +830,276 @@ class SerialTransport:
             - None, jeśli minął timeout i nie udało się złożyć pełnej linii.
 
         Implementacja:
-        - czytamy po 1 bajcie,
-        - budujemy bufor aż trafimy na '\n',
-        - jeśli przed '\n' jest '\r', usuwamy go (standard CRLF).
+        - w trybie reader_thread linia pobierana jest z kolejki LineQueue,
+        - jeśli w _lines czeka gotowa linia, zwracamy ją od razu,
+        - w przeciwnym razie czytamy naraz wszystko, co leży w buforze
+          systemowym (in_waiting), a gdy jest pusty – czekamy na 1 bajt,
+        - LineFramer wydziela wszystkie pełne linie, nadmiarowe trafiają
+          do _lines, a niepełny ogon czeka na kolejne wywołanie.
         """
         if not self._ser:
             raise RuntimeError("not open")
 
+        if self._queue is not None:
+            return self._get_queued(self._resolve_timeout(timeout))
+
+        if self._lines:
+            return self._pop_line()
+
+        timeout = self._resolve_timeout(timeout)
+
+        ser = self._ser
+        # timeout portu ograniczamy do timeoutu wywołania, żeby pojedynczy
+        # read() nie blokował dłużej niż całe read_line(); ustawiamy go
+        # tylko przy zmianie wartości (na POSIX to osobne wywołanie systemowe)
+        port_timeout = min(timeout, self.timeout or timeout)
+        if ser.timeout != port_timeout:
+            ser.timeout = port_timeout
+
+        end = time.monotonic() + timeout
+        while True:
+            # bierzemy wszystko, co już jest w buforze systemowym,
+            # a jeśli nic nie ma – czekamy (do timeoutu portu) na 1 bajt
+            n = ser.in_waiting
+            data = ser.read(n if n > 0 else 1)
+
+            if data:
+                lines = self._framer.feed(data)
+                if lines:
+                    if self._latency is not None:
+                        self._latency.on_rx(lines)
+                    self._lines.extend(lines)
+                    return self._pop_line()
+
+            if time.monotonic() >= end:
+                break
+
+        # jeśli wyszliśmy z pętli, to znaczy, że minął timeout
+        if DEBUG:
+            print("[RX TIMEOUT] Brak danych z portu")
+        return None
+
+    def fileno(self) -> int:
+        """
+        Deskryptor pliku portu (tylko POSIX) – np. do multipleksowania
+        wielu portów przez moduł selectors.
+        """
+        if not self._ser:
+            raise RuntimeError("not open")
+        return self._ser.fileno()
+
+    @property
+    def in_waiting(self) -> int:
+        """Liczba bajtów czekających w buforze systemowym portu."""
+        if not self._ser:
+            raise RuntimeError("not open")
+        return self._ser.in_waiting
+
+    def poll_lines(self) -> list:
+        """
+        Nieblokujący odczyt: pobiera wszystko, co leży w buforze systemowym,
+        i zwraca listę wszystkich pełnych linii (może być pusta).
+
+        Przeznaczone dla pętli typu select/epoll, które same czekają
+        na gotowość deskryptora; niedostępne w trybie reader_thread.
+        """
+        if not self._ser:
+            raise RuntimeError("not open")
+        if self._queue is not None:
+            raise RuntimeError("poll_lines() not available in reader_thread mode")
+
+        n = self._ser.in_waiting
+        lines = self._framer.feed(self._ser.read(n)) if n > 0 else []
+        if lines and self._latency is not None:
+            self._latency.on_rx(lines)
+        if self._lines:
+            lines[:0] = self._lines
+            self._lines.clear()
+        if DEBUG:
+            for line in lines:
+                print(f"[RX] {line}")
+        if self._owed:
+            for line in lines:
+                self._consumed(line)
+        return lines
+
+    def iter_lines(self, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Generator kolejnych odebranych linii.
+
+        Parametry:
+            timeout:
+                - None: czeka bez końca (kończy się dopiero po close()),
+                - liczba sekund: kończy się, gdy przez tyle czasu
+                  nie przyszła żadna linia.
+        """
+        while self._ser:
+            line = self.read_line(timeout=timeout if timeout is not None else self.timeout)
+            if line is not None:
+                yield line
+            elif timeout is not None:
+                return
+
+    def _start_reader(self) -> None:
+        """
+        Uruchamia wątek czytający (tryb reader_thread).
+
+        Timeout portu jest skracany, żeby wątek szybko zauważył close().
+        """
+        self._queue = LineQueue(self.queue_size, self.overflow)
+        self._reader_error = None
+        self._stop.clear()
+        self._ser.timeout = min(self.timeout or 0.1, 0.1)
+        self._reader = threading.Thread(
+            target=self._reader_loop, name=f"serial-reader-{self.port}", daemon=True
+        )
+        self._reader.start()
+
+    def _stop_reader(self) -> None:
+        """Zatrzymuje wątek czytający i czeka na jego zakończenie."""
+        if self._reader is None:
+            return
+        self._stop.set()
+        self._reader.join(timeout=2.0)
+        self._reader = None
+        self._queue = None
+
+    def _reader_loop(self) -> None:
+        """
+        Pętla wątku czytającego: ciągłe ramkowanie linii do kolejki.
+
+        Błąd portu kończy wątek; wyjątek jest zapamiętywany
+        i zgłaszany konsumentowi przy najbliższym read_line().
+        """
+        ser, framer, queue, stop = self._ser, self._framer, self._queue, self._stop
+        while not stop.is_set():
+            try:
+                n = ser.in_waiting
+                data = ser.read(n if n > 0 else 1)
+            except Exception as e:
+                self._reader_error = e
+                break
+            if data:
+                lines = framer.feed(data)
+                if lines and self._latency is not None:
+                    self._latency.on_rx(lines)
+                for line in lines:
+                    queue.put(line, stop)
+
+    def _start_writer(self) -> None:
+        """Uruchamia wątek piszący (tryb write_queue)."""
+        if self._outbox is None:
+            self._outbox = OutboundQueue(self.coalesce)
+        self._writer_error = None
+        self._wstop.clear()
+        self._writer = threading.Thread(
+            target=self._writer_loop, name=f"serial-writer-{self.port}", daemon=True
+        )
+        self._writer.start()
+
+    def _stop_writer(self) -> None:
+        """Zatrzymuje wątek piszący; niewysłane ramki zostają w kolejce."""
+        if self._writer is None:
+            return
+        self._wstop.set()
+        self._writer.join(timeout=2.0)
+        self._writer = None
+
+    def _writer_loop(self) -> None:
+        """
+        Pętla wątku piszącego: ramki z kolejki zapisywane po jednej,
+        w tempie bufora RX urządzenia. Dopiero tutaj, przy faktycznym
+        zapisie, ramka trafia do pomiaru czasu odpowiedzi.
+
+        Błąd portu kończy wątek; wyjątek jest zgłaszany przy najbliższym
+        write_line() / write_lines().
+        """
+        ser, outbox, stop = self._ser, self._outbox, self._wstop
+        while not stop.is_set():
+            line = outbox.get(0.1)
+            if line is None:
+                continue
+            data = (line.rstrip("\r\n") + "\n").encode("ascii", errors="ignore")
+            try:
+                if self._pacer is not None:
+                    self._pacer.wait(len(data))
+                # task_done() pod blokadą: write_priority() widzi zdjętą
+                # ramkę jako niewysłaną (i może ją porzucić), dopóki nie
+                # wyjdzie do portu
+                with self._wlock:
+                    if outbox.current_dropped():
+                        outbox.task_done()
+                        continue
+                    if self._latency is not None:
+                        self._latency.on_tx((line,))
+                    if DEBUG:
+                        print(f"[TX] {line.strip()}")
+                    ser.write(data)
+                    ser.flush()
+                    self._owed.append(time.monotonic())
+                    outbox.task_done()
+            except Exception as e:
+                outbox.task_done()
+                self._writer_error = e
+                break
+
+    def _check_writer(self) -> None:
+        """Zgłasza (raz) błąd, na którym zakończył się wątek piszący."""
+        e, self._writer_error = self._writer_error, None
+        if e is not None:
+            raise e
+
+    def _get_queued(self, timeout: float) -> Optional[str]:
+        """read_line() w trybie reader_thread: pobranie linii z kolejki."""
+        line = self._queue.get(0.0)
+        if line is None:
+            if self._reader_error is not None:
+                raise RuntimeError(f"reader thread failed: {self._reader_error}")
+            line = self._queue.get(timeout)
+        if line is None:
+            if DEBUG:
+                print("[RX TIMEOUT] Brak danych z portu")
+            return None
+        if DEBUG:
+            print(f"[RX] {line}")
+        self._consumed(line)
+        return line
+
+    def _resolve_timeout(self, timeout: Optional[float]) -> float:
+        """
+        Dobiera timeout dla read_line(), gdy wywołujący go nie podał.
+        """
         # logika wyboru timeoutu:
         # - brak parametru timeout => sprawdzamy, czy ostatnią komendą był START
         if timeout is None:
             if hasattr(self, "_last_cmd") and self._last_cmd and self._last_cmd.startswith("START"):
-                # START może trwać dłużej (np. 15 s pomiaru MAE + zapas)
-                timeout = 17.0
+                # START może trwać dłużej (np. 13 s pomiaru MAE + zapas)
+                timeout = self.start_timeout
             else:
                 # w pozostałych przypadkach bazujemy na timeout obiektu
                 timeout = self.timeout or 1.0
+        return timeout
 
-        end = time.time() + timeout
-        buf = bytearray()
-
-        while time.time() < end:
-            # próbujemy odczytać pojedynczy bajt
-            b = self._ser.read(1)
+    def _pop_line(self) -> str:
+        """Zwraca najstarszą gotową linię z _lines."""
+        line = self._lines.popleft()
+        if DEBUG:
+            print(f"[RX] {line}")
+        self._consumed(line)
+        return line
 
-            if not b:
-                # brak danych – wracamy na początek pętli (czekamy dalej)
-                continue
+    def _coalesced(self, old: str, new: str) -> None:
+        """Ramka old w kolejce została zastąpiona przez new (nie dostanie odpowiedzi)."""
+        if self.on_coalesced is not None:
+            self.on_coalesced(old, new)
 
-            if b == b"\n":
-                # koniec linii – ewentualnie usuwamy '\r' na końcu
-                if buf.endswith(b"\r"):
-                    buf.pop()
-                try:
-                    # dekodujemy całą linię jako ASCII
-                    line = buf.decode("ascii", errors="ignore")
-                    if DEBUG:
-                        print(f"[RX] {line}")
-                    return line
-                finally:
-                    # czyścimy bufor, na wszelki wypadek
-                    buf.clear()
-            else:
-                # zwykły znak – dokładamy do bufora
-                buf.extend(b)
-
-        # jeśli wyszliśmy z pętli, to znaczy, że minął timeout
-        if DEBUG:
-            print("[RX TIMEOUT] Brak danych z portu")
-        return None
+    def _consumed(self, line: str) -> None:
+        """Odczytana odpowiedź zmniejsza in_flight."""
+        if self._owed and classify(line).is_reply:
+            try:
+                self._owed.popleft()
+            except IndexError:
+                pass
 
 
 def available_ports():
@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Automatyczne przebiegi START na stanowisku (jednym lub kilku naraz).
+
+Zamiast ręcznego wpisywania ZERO / TARGET / PID / START w REPL
+i czekania na stały timeout, TrialRunner dla każdej konfiguracji:
+- wysyła ZERO, TARGET i PID potokowo (CommandPipeline) i sprawdza ACK,
+- dopiero gdy wszystkie nastawy są przyjęte, wysyła osobno START,
+  czeka na jego ACK i czyta linie do chwili nadejścia MAE=... – kolejny
+  przebieg rusza od razu po wyniku (opcjonalnie po przerwie settle),
+- przy NACK, braku odpowiedzi albo resecie urządzenia (READY w trakcie)
+  wysyła STOP i powtarza przebieg (do retries razy).
+
+run_parallel() rozdziela listę konfiguracji między kilka stanowisk:
+każde stanowisko ma własny wątek i pobiera kolejną konfigurację
+ze wspólnej kolejki, gdy skończy poprzednią.
+
+Plik konfiguracji (CSV z nagłówkiem; brakujące kolumny – wartości domyślne):
+    kp,ki,kd,target,zero
+    3,2,1.5,26.5,90
+
+Użycie:
+    python trials.py konfiguracje.csv COM3 [COM4 ...] [--out wyniki.csv]
+"""
+
+from __future__ import annotations
+import argparse
+import csv
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Callable, List, Optional
+
+from transport import SerialTransport
+from dispatch import NACK, READY, classify, read_reply
+from pipeline import CommandPipeline
+from protocol import parse_mae, to_frame
+
+DEBUG = False
+
+# statusy przebiegu w tabeli wyników
+STATUS_OK = "ok"
+STATUS_NACK = "nack"
+STATUS_TIMEOUT = "timeout"
+STATUS_RESET = "reset"
+# konfiguracja nie została wykonana – żadne stanowisko nie działało
+STATUS_NO_RIG = "no_rig"
+
+
+@dataclass
+class TrialConfig:
+    """Jedna konfiguracja do sprawdzenia na stanowisku."""
+    kp: float = 3.0
+    ki: float = 2.0
+    kd: float = 1.5
+    target: float = 26.5
+    zero: int = 90
+
+    def commands(self) -> List[str]:
+        """Komendy ustawiające stanowisko przed START."""
+        return [f"ZERO({self.zero})", f"TARGET({self.target:g})",
+                f"PID({self.kp:g},{self.ki:g},{self.kd:g})"]
+
+
+@dataclass
+class TrialResult:
+    """
+    Wiersz tabeli wyników.
+
+    Atrybuty:
+        rig      : stanowisko (nazwa portu),
+        index    : numer konfiguracji na liście wejściowej,
+        kp .. zero : konfiguracja,
+        mae      : wynik MAE=... (nan, jeśli przebieg się nie udał),
+        status   : ok / nack / timeout / reset (ostatniej próby),
+                   no_rig – nie wykonano (run_parallel bez działającego stanowiska),
+        attempts : liczba prób,
+        detail   : odpowiedź NACK(...) albo opis błędu,
+        started  : czas ścienny rozpoczęcia (epoch),
+        duration : czas od pierwszej ramki do wyniku (s).
+    """
+    rig: str
+    index: int
+    kp: float
+    ki: float
+    kd: float
+    target: float
+    zero: int
+    mae: float
+    status: str
+    attempts: int
+    detail: str
+    started: float
+    duration: float
+
+
+class TrialError(Exception):
+    """Nieudana próba przebiegu (status jak w TrialResult)."""
+
+    def __init__(self, status: str, detail: str = "") -> None:
+        super().__init__(f"{status}: {detail}" if detail else status)
+        self.status = status
+        self.detail = detail
+
+
+class TrialRunner:
+    """
+    Sekwencyjne przebiegi START na jednym stanowisku.
+
+    Atrybuty:
+        transport     : otwarty SerialTransport,
+        retries       : ile razy powtórzyć nieudany przebieg,
+        setup_timeout : timeout odpowiedzi na ZERO/TARGET/PID/START,
+        run_timeout   : maks. czas od START do MAE=... (None =
+                        transport.start_timeout),
+        settle        : przerwa po każdym przebiegu (s), np. na powrót kulki.
+    """
+
+    def __init__(self, transport: SerialTransport, retries: int = 2,
+                 setup_timeout: float = 2.0, run_timeout: Optional[float] = None,
+                 settle: float = 0.0) -> None:
+        self.transport = transport
+        self.retries = retries
+        self.setup_timeout = setup_timeout
+        self.run_timeout = transport.start_timeout if run_timeout is None else run_timeout
+        self.settle = settle
+        self.rig_id = transport.port
+
+    def run(self, config: TrialConfig, index: int = 0) -> TrialResult:
+        """Wykonuje jeden przebieg (z powtórzeniami) i zwraca wiersz wyników."""
+        started = time.time()
+        t0 = time.monotonic()
+        mae, status, detail = float("nan"), STATUS_TIMEOUT, ""
+        attempts = 0
+        while attempts <= self.retries:
+            attempts += 1
+            try:
+                mae = self._attempt(config)
+                status, detail = STATUS_OK, ""
+                break
+            except TrialError as e:
+                status, detail = e.status, e.detail
+                if DEBUG:
+                    print(f"[TRIAL {self.rig_id}] attempt {attempts} failed: {e}")
+                self._abort()
+        result = TrialResult(self.rig_id, index, config.kp, config.ki, config.kd,
+                             config.target, config.zero, mae, status, attempts, detail,
+                             started, time.monotonic() - t0)
+        if self.settle > 0:
+            time.sleep(self.settle)
+        return result
+
+    def run_all(self, configs: List[TrialConfig],
+                on_result: Optional[Callable[[TrialResult], None]] = None) -> List[TrialResult]:
+        """Wykonuje wszystkie konfiguracje po kolei."""
+        results = []
+        for i, cfg in enumerate(configs):
+            r = self.run(cfg, i)
+            results.append(r)
+            if on_result is not None:
+                on_result(r)
+        return results
+
+    def _attempt(self, config: TrialConfig) -> float:
+        """Jedna próba: ustawienie nastaw, START, oczekiwanie na MAE."""
+        x = self.transport
+        # stare linie (np. MAE z poprzedniego przebiegu) nie mogą pomylić wyników
+        x.reset_input()
+
+        reset_seen = []
+        pipe = CommandPipeline(x, timeout=self.setup_timeout,
+                               on_unsolicited=lambda line: reset_seen.append(line))
+        # START dopiero po przyjęciu wszystkich nastaw – NACK na PID
+        # nie może uruchomić przebiegu ze starymi nastawami
+        futures = pipe.run(config.commands())
+        for fut in futures:
+            try:
+                reply = fut.result()
+            except TimeoutError as e:
+                raise TrialError(STATUS_TIMEOUT, str(e))
+            if classify(reply).kind == NACK:
+                raise TrialError(STATUS_NACK, reply)
+        if any(line.startswith("READY") for line in reset_seen):
+            raise TrialError(STATUS_RESET, "READY during setup")
+
+        x.write_line(to_frame("START"))
+        other = []
+        ack = read_reply(x, self.setup_timeout, on_other=other.append)
+        if any(m.kind == READY for m in other):
+            raise TrialError(STATUS_RESET, "READY after START")
+        if ack is None:
+            raise TrialError(STATUS_TIMEOUT, "no reply to START")
+        if ack.kind == NACK:
+            raise TrialError(STATUS_NACK, ack.line)
+
+        end = time.monotonic() + self.run_timeout
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise TrialError(STATUS_TIMEOUT, "no MAE")
+            line = x.read_line(timeout=remaining)
+            if line is None:
+                continue
+            mae = parse_mae(line)
+            if mae is not None:
+                return mae
+            if line.startswith("READY"):
+                raise TrialError(STATUS_RESET, "READY during run")
+
+    def _abort(self) -> None:
+        """Po nieudanej próbie: STOP (bez czekania na wynik) i czyszczenie wejścia."""
+        try:
+            self.transport.write_line(to_frame("STOP"))
+            self.transport.read_line(timeout=self.setup_timeout)
+            self.transport.reset_input()
+        except Exception:
+            pass
+
+
+def run_parallel(ports: List[str], configs: List[TrialConfig], baud: int = 9600,
+                 on_result: Optional[Callable[[TrialResult], None]] = None,
+                 **runner_kwargs) -> List[TrialResult]:
+    """
+    Wykonuje konfiguracje na kilku stanowiskach naraz.
+
+    Każde stanowisko pobiera następną konfigurację ze wspólnej kolejki,
+    więc szybsze (albo mające mniej powtórzeń) stanowiska wykonują więcej
+    przebiegów. Błąd portu kończy pracę tego stanowiska, a jego bieżąca
+    konfiguracja wraca do kolejki dla pozostałych – stanowiska bez pracy
+    czekają więc na kolejkę, dopóki wszystkie konfiguracje nie mają wyniku.
+
+    Zwraca wyniki posortowane wg numeru konfiguracji, po jednym dla każdej
+    konfiguracji: te, których nie wykonało żadne stanowisko (wszystkie
+    wyłączone błędem portu), mają status no_rig i opis ostatniego błędu.
+    """
+    work: queue.Queue = queue.Queue()
+    for item in enumerate(configs):
+        work.put(item)
+    results: List[TrialResult] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def add(r: TrialResult) -> None:
+        with lock:
+            results.append(r)
+            if on_result is not None:
+                on_result(r)
+
+    def worker(port: str) -> None:
+        x = SerialTransport(port, baud)
+        try:
+            x.open()
+        except Exception as e:
+            print(f"[{port}] nie udało się otworzyć portu: {e}")
+            errors.append(f"{port}: {e}")
+            return
+        runner = TrialRunner(x, **runner_kwargs)
+        try:
+            while True:
+                try:
+                    index, cfg = work.get(timeout=0.1)
+                except queue.Empty:
+                    # inne stanowisko może jeszcze oddać konfigurację do kolejki
+                    with lock:
+                        if len(results) >= len(configs):
+                            return
+                    continue
+                try:
+                    r = runner.run(cfg, index)
+                except Exception as e:
+                    print(f"[{port}] błąd portu, stanowisko wyłączone: {e}")
+                    errors.append(f"{port}: {e}")
+                    work.put((index, cfg))
+                    return
+                add(r)
+        finally:
+            x.close()
+
+    threads = [threading.Thread(target=worker, args=(p,), name=f"trials-{p}", daemon=True)
+               for p in ports]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # żadne stanowisko już nie działa, a w kolejce zostały konfiguracje
+    detail = errors[-1] if errors else "no rig"
+    while True:
+        try:
+            index, cfg = work.get_nowait()
+        except queue.Empty:
+            break
+        add(TrialResult("", index, cfg.kp, cfg.ki, cfg.kd, cfg.target, cfg.zero,
+                        float("nan"), STATUS_NO_RIG, 0, detail, time.time(), 0.0))
+    return sorted(results, key=lambda r: r.index)
+
+
+def load_configs(path: str) -> List[TrialConfig]:
+    """Wczytuje konfiguracje z pliku CSV (nagłówek: kp,ki,kd,target,zero)."""
+    types = {f.name: f.type for f in fields(TrialConfig)}
+    configs = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            kwargs = {}
+            for key, val in row.items():
+                key = (key or "").strip().lower()
+                if key in types and val and val.strip():
+                    kwargs[key] = int(val) if types[key] in (int, "int") else float(val)
+            configs.append(TrialConfig(**kwargs))
+    return configs
+
+
+def write_results(path: str, results: List[TrialResult]) -> None:
+    """Zapisuje tabelę wyników do pliku CSV."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=[f.name for f in fields(TrialResult)])
+        w.writeheader()
+        for r in results:
+            w.writerow(asdict(r))
+
+
+def print_result(r: TrialResult) -> None:
+    """Jedna linia postępu na konsolę."""
+    mae = f"MAE={r.mae:.2f}" if r.status == STATUS_OK else f"{r.status} {r.detail}".strip()
+    print(f"[{r.rig}] #{r.index + 1} PID({r.kp:g},{r.ki:g},{r.kd:g}) "
+          f"TARGET({r.target:g}) ZERO({r.zero}) -> {mae}  "
+          f"(prób: {r.attempts}, {r.duration:.1f} s)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="seria przebiegów START na stanowisku")
+    ap.add_argument("configs", help="plik CSV z konfiguracjami (kp,ki,kd,target,zero)")
+    ap.add_argument("ports", nargs="+", help="port(y) stanowisk, np. COM3 COM4")
+    ap.add_argument("--baud", type=int, default=9600)
+    ap.add_argument("--out", help="plik CSV z tabelą wyników")
+    ap.add_argument("--retries", type=int, default=2, help="powtórzenia nieudanego przebiegu")
+    ap.add_argument("--run-timeout", type=float, default=None,
+                    help="maks. czas od START do MAE (domyślnie start_timeout transportu)")
+    ap.add_argument("--settle", type=float, default=0.0, help="przerwa po przebiegu (s)")
+    args = ap.parse_args()
+
+    configs = load_configs(args.configs)
+    t0 = time.monotonic()
+    results = run_parallel(args.ports, configs, args.baud, on_result=print_result,
+                           retries=args.retries, run_timeout=args.run_timeout,
+                           settle=args.settle)
+    ok = sum(r.status == STATUS_OK for r in results)
+    print(f"\nPrzebiegi: {len(results)}/{len(configs)}, udane: {ok}, "
+          f"czas: {time.monotonic() - t0:.1f} s")
+    if args.out:
+        write_results(args.out, results)
+        print(f"Wyniki zapisane do {args.out}")
+
+
+if __name__ == "__main__":
+    main()
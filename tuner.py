@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Przeszukiwanie nastaw PID (kp, ki, kd) na symulatorze stanowiska (plant.py).
+
+Dostępne metody:
+- grid   : siatka równomierna (points punktów na każdą oś),
+- random : losowanie jednostajne w zakresach,
+- cem    : metoda entropii krzyżowej (cross-entropy) – kolejne rundy
+           losują zestawy z rozkładu normalnego dopasowanego do
+           najlepszych wyników poprzedniej rundy; prosty odpowiednik
+           optymalizacji "bayesowskiej", bez dodatkowych bibliotek.
+
+Obliczenia dzielone są na porcje (chunk zestawów) wykonywane
+w ProcessPoolExecutor na wszystkich rdzeniach; każda porcja to jedno
+wywołanie plant.simulate() na tablicach NumPy. Przebiegi wyraźnie
+rozbieżne (kulka leży na ograniczniku belki) są przerywane wcześnie.
+
+Z linii poleceń: python cli.py tune --method cem --budget 20000
+(opcjonalnie --apply COM3 wysyła najlepsze nastawy jako PID(...)).
+
+Wymaga biblioteki numpy.
+"""
+
+from __future__ import annotations
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from plant import PlantParams, simulate
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+DEBUG = False
+
+METHODS = ("grid", "random", "cem")
+
+Range = Tuple[float, float]
+
+
+@dataclass
+class SearchSpace:
+    """Zakresy przeszukiwania nastaw (włącznie z końcami)."""
+    kp: Range = (0.0, 10.0)
+    ki: Range = (0.0, 5.0)
+    kd: Range = (0.0, 5.0)
+
+    def bounds(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Dolne i górne granice jako tablice [kp, ki, kd]."""
+        lo = np.array([self.kp[0], self.ki[0], self.kd[0]], dtype=np.float64)
+        hi = np.array([self.kp[1], self.ki[1], self.kd[1]], dtype=np.float64)
+        return lo, hi
+
+
+@dataclass
+class Candidate:
+    """
+    Oceniony zestaw nastaw.
+
+    Atrybuty:
+        kp, ki, kd : nastawy,
+        mae        : MAE z symulowanej fazy HOLD (inf dla przerwanych),
+        aborted    : przebieg przerwany jako rozbieżny.
+    """
+    kp: float
+    ki: float
+    kd: float
+    mae: float
+    aborted: bool = False
+
+    def command(self) -> str:
+        """Komenda PID(...) dla firmware'u."""
+        return f"PID({self.kp:.3f},{self.ki:.3f},{self.kd:.3f})"
+
+
+@dataclass
+class TuneResult:
+    """
+    Wynik przeszukiwania.
+
+    Atrybuty:
+        ranking   : najlepsze zestawy, rosnąco wg MAE,
+        evaluated : liczba ocenionych zestawów,
+        aborted   : ile z nich przerwano jako rozbieżne,
+        elapsed   : czas obliczeń (s).
+    """
+    ranking: List[Candidate]
+    evaluated: int
+    aborted: int
+    elapsed: float
+
+    @property
+    def best(self) -> Optional[Candidate]:
+        return self.ranking[0] if self.ranking else None
+
+
+def _evaluate_chunk(gains: "np.ndarray", params: PlantParams, seed: Optional[int],
+                    abort_after: Optional[float]) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Jedna porcja pracy (wykonywana w procesie roboczym)."""
+    res = simulate(gains[:, 0], gains[:, 1], gains[:, 2], params,
+                   seed=seed, abort_after=abort_after)
+    return res.mae, res.aborted
+
+
+def evaluate(gains: "np.ndarray", params: PlantParams, pool: Optional[Executor] = None,
+             chunk: int = 2000, seed: Optional[int] = None,
+             abort_after: Optional[float] = 2.0) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Ocena tablicy nastaw o kształcie (n, 3) porcjami po chunk zestawów.
+
+    pool=None – obliczenia w bieżącym procesie.
+    Zwraca (mae, aborted) o długości n.
+    """
+    parts = [gains[a:a + chunk] for a in range(0, len(gains), chunk)]
+    seeds = [None if seed is None else seed + i for i in range(len(parts))]
+    if pool is None:
+        results = [_evaluate_chunk(g, params, s, abort_after) for g, s in zip(parts, seeds)]
+    else:
+        futures = [pool.submit(_evaluate_chunk, g, params, s, abort_after)
+                   for g, s in zip(parts, seeds)]
+        results = [f.result() for f in futures]
+    if not results:
+        return np.empty(0), np.empty(0, dtype=bool)
+    return (np.concatenate([r[0] for r in results]),
+            np.concatenate([r[1] for r in results]))
+
+
+def grid_gains(space: SearchSpace, points: int) -> "np.ndarray":
+    """Siatka points x points x points zestawów, kształt (points**3, 3)."""
+    lo, hi = space.bounds()
+    axes = [np.linspace(lo[i], hi[i], points) for i in range(3)]
+    return np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+
+
+def random_gains(space: SearchSpace, n: int, rng: "np.random.Generator") -> "np.ndarray":
+    """n zestawów losowanych jednostajnie, kształt (n, 3)."""
+    lo, hi = space.bounds()
+    return rng.uniform(lo, hi, size=(n, 3))
+
+
+def tune(method: str = "cem", budget: int = 10000, space: Optional[SearchSpace] = None,
+         params: Optional[PlantParams] = None, workers: Optional[int] = None,
+         chunk: int = 2000, seed: Optional[int] = None, rounds: int = 5,
+         elite: float = 0.05, abort_after: Optional[float] = 2.0,
+         top: int = 10) -> TuneResult:
+    """
+    Przeszukuje nastawy wybraną metodą.
+
+    Parametry:
+        method      : "grid", "random" albo "cem",
+        budget      : łączna liczba symulowanych zestawów (dla grid –
+                      siatka o największej liczbie punktów, która się mieści),
+        workers     : liczba procesów (None = liczba rdzeni, 1 = bez puli),
+        chunk       : zestawy w jednej porcji pracy,
+        seed        : ziarno losowania i szumu pomiaru,
+        rounds      : liczba rund metody cem,
+        elite       : frakcja najlepszych zestawów, do których cem dopasowuje rozkład,
+        abort_after : próg wczesnego przerywania (patrz plant.simulate),
+        top         : długość zwracanego rankingu.
+    """
+    if np is None:
+        raise RuntimeError("numpy not available")
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    space = space or SearchSpace()
+    params = params or PlantParams()
+    rng = np.random.default_rng(seed)
+    workers = workers or os.cpu_count() or 1
+
+    t0 = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        def run(g: "np.ndarray", k: int) -> Tuple["np.ndarray", "np.ndarray"]:
+            s = None if seed is None else seed + 1000 * k
+            return evaluate(g, params, pool, chunk, s, abort_after)
+
+        if method == "grid":
+            points = max(2, int(round(budget ** (1.0 / 3.0))))
+            while points > 2 and points ** 3 > budget:
+                points -= 1
+            gains = grid_gains(space, points)
+            mae, aborted = run(gains, 0)
+        elif method == "random":
+            gains = random_gains(space, budget, rng)
+            mae, aborted = run(gains, 0)
+        else:
+            gains, mae, aborted = _cem(space, budget, rounds, elite, rng, run)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    elapsed = time.perf_counter() - t0
+
+    order = np.argsort(mae, kind="stable")[:top]
+    ranking = [Candidate(float(gains[i, 0]), float(gains[i, 1]), float(gains[i, 2]),
+                         float(mae[i]), bool(aborted[i])) for i in order]
+    if DEBUG:
+        print(f"[TUNE] {method}: {len(gains)} sets in {elapsed:.2f} s")
+    return TuneResult(ranking, len(gains), int(aborted.sum()), elapsed)
+
+
+def _cem(space: SearchSpace, budget: int, rounds: int, elite: float,
+         rng: "np.random.Generator", run) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    Metoda entropii krzyżowej: pierwsza runda jednostajnie, kolejne
+    z rozkładu normalnego (obciętego do zakresów) wokół najlepszych.
+    """
+    lo, hi = space.bounds()
+    rounds = max(1, rounds)
+    per_round = max(1, budget // rounds)
+    all_g, all_m, all_a = [], [], []
+
+    gains = random_gains(space, per_round, rng)
+    for k in range(rounds):
+        mae, aborted = run(gains, k)
+        all_g.append(gains)
+        all_m.append(mae)
+        all_a.append(aborted)
+
+        g = np.concatenate(all_g)
+        m = np.concatenate(all_m)
+        best = g[np.argsort(m, kind="stable")[:max(2, int(len(g) * elite))]]
+        mean = best.mean(axis=0)
+        # dolne ograniczenie rozrzutu, żeby rozkład nie zapadł się do punktu
+        std = np.maximum(best.std(axis=0), (hi - lo) * 1e-3)
+        if DEBUG:
+            print(f"[TUNE] cem round {k + 1}: best MAE {m.min():.4f}, mean {mean}, std {std}")
+        gains = np.clip(rng.normal(mean, std, size=(per_round, 3)), lo, hi)
+
+    return np.concatenate(all_g), np.concatenate(all_m), np.concatenate(all_a)
+
+
+def format_ranking(result: TuneResult) -> str:
+    """Tabela rankingu do wypisania na konsolę."""
+    lines = [f"{'#':>3}  {'kp':>8}  {'ki':>8}  {'kd':>8}  {'MAE':>8}"]
+    for i, c in enumerate(result.ranking, 1):
+        mae = "przerw." if c.aborted else f"{c.mae:.3f}"
+        lines.append(f"{i:>3}  {c.kp:8.3f}  {c.ki:8.3f}  {c.kd:8.3f}  {mae:>8}")
+    lines.append(f"ocenionych: {result.evaluated}, przerwanych: {result.aborted}, "
+                 f"czas: {result.elapsed:.2f} s")
+    return "\n".join(lines)